@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the TPA integration client
+Runs TPAClaimsProcessor against a local aiohttp stub of the Lexicon AI
+Service (fixed per-request latency) and reports claims per second
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import os
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+# tpa-integration.py is a script name, not an importable module name
+_spec = importlib.util.spec_from_file_location(
+    "tpa_integration", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tpa-integration.py"))
+tpa = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(tpa)
+
+ICD10_CODES = [f"{letter}{n:02d}" for letter in "ABIJK" for n in range(0, 100, 5)]
+
+
+def make_stub_app(latency: float) -> web.Application:
+    """Stub service: every endpoint sleeps `latency` seconds; Z-codes are unmapped"""
+    calls = Counter()
+
+    def concept(concept_id: int) -> dict:
+        return {"concept_id": concept_id, "canonical_name": f"Concept {concept_id}",
+                "indonesian_name": f"Konsep {concept_id}", "concept_type": "DIAGNOSIS"}
+
+    def map_code(code: str):
+        if code.startswith("Z"):
+            return None
+        return {"concept": concept(sum(map(ord, code))), "mapping_confidence": 0.95}
+
+    async def mapping(request):
+        calls["mapping"] += 1
+        await asyncio.sleep(latency)
+        result = map_code(request.match_info["code"])
+        if result is None:
+            return web.json_response({"detail": "No mapping"}, status=404)
+        return web.json_response(result)
+
+    async def mapping_batch(request):
+        calls["mapping_batch"] += 1
+        await asyncio.sleep(latency)
+        body = await request.json()
+        return web.json_response({"results": [map_code(ref["code"]) for ref in body["codes"]]})
+
+    async def concept_details(request):
+        calls["concept"] += 1
+        await asyncio.sleep(latency)
+        return web.json_response(concept(int(request.match_info["concept_id"])))
+
+    async def recommendations(request):
+        calls["recommendations"] += 1
+        await asyncio.sleep(latency)
+        body = await request.json()
+        return web.json_response({"diagnosis": concept(body["diagnosis_concept_id"]),
+                                  "recommendations": [{"concept": concept(2), "priority_score": 0.98}]})
+
+    async def validate(request):
+        calls["validate"] += 1
+        await asyncio.sleep(latency)
+        return web.json_response({"is_valid": True, "confidence": 0.9})
+
+    app = web.Application()
+    app["calls"] = calls
+    app.router.add_post("/api/v1/mapping/batch", mapping_batch)
+    app.router.add_get("/api/v1/mapping/{system}/{code}", mapping)
+    app.router.add_get("/api/v1/concepts/{concept_id}", concept_details)
+    app.router.add_post("/api/v1/cds/recommendations", recommendations)
+    app.router.add_post("/api/v1/cds/validate", validate)
+    return app
+
+
+def make_claims(n: int, seed: int = 29) -> list:
+    """Claims with 1-8 diagnoses (some unmapped) and a procedure, like a TPA batch"""
+    rng = random.Random(seed)
+    return [{
+        "claim_id": f"CLM-{i:06d}",
+        "patient_city": rng.choice(["Manado", "Jakarta", "Surabaya"]),
+        "diagnoses": [{"code": rng.choice(ICD10_CODES + ["Z99"])} for _ in range(rng.randint(1, 8))],
+        "procedures": [{"concept_id": 2}],
+        "medications": [{"concept_id": 3}],
+    } for i in range(n)]
+
+
+async def run_mode(base_url: str, claims: list, concurrent: bool, concurrency: int,
+                   use_cache: bool, batch_mappings: bool) -> float:
+    async with tpa.LexiconAIClient(base_url, "bench-key", pool_size=max(concurrency * 2, 10),
+                                   use_cache=use_cache, batch_mappings=batch_mappings) as lexicon:
+        processor = tpa.TPAClaimsProcessor(lexicon, concurrent=concurrent)
+        t0 = time.perf_counter()
+        results = await processor.process_claims(claims, concurrency=concurrency)
+        elapsed = time.perf_counter() - t0
+    errors = sum(1 for r in results if r.get("processing_status") == "ERROR")
+    assert not errors, f"{errors} claims failed"
+    return len(claims) / elapsed
+
+
+async def main_async(args) -> None:
+    app = make_stub_app(args.latency_ms / 1000)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}"
+
+    claims = make_claims(args.claims)
+    distinct_codes = len({d["code"] for claim in claims for d in claim["diagnoses"]})
+    # (name, gather per claim, claims in flight, client cache, mapping micro-batches)
+    modes = [("sequential calls", False, 1, False, False), ("gathered calls", True, 1, False, False),
+             ("+ batching", True, 1, False, True)]
+    for n in map(int, args.concurrency.split(",")):
+        modes += [(f"gathered x{n} claims", True, n, False, False),
+                  (f"+ cache x{n} claims", True, n, True, False),
+                  (f"+ batching x{n} claims", True, n, True, True)]
+    print(f"{len(claims)} claims, {distinct_codes} distinct diagnosis codes")
+    try:
+        for name, concurrent, concurrency, use_cache, batch_mappings in modes:
+            app["calls"].clear()
+            throughput = await run_mode(base_url, claims, concurrent, concurrency, use_cache, batch_mappings)
+            calls = sum(app["calls"].values())
+            mapping_calls = app["calls"]["mapping"] + app["calls"]["mapping_batch"]
+            print(f"{name:>24} | {throughput:8.1f} claims/s | {calls / len(claims):5.2f} HTTP calls/claim "
+                  f"| mapping requests {mapping_calls:>5}")
+    finally:
+        await runner.cleanup()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--claims", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Stub server latency per request")
+    parser.add_argument("--concurrency", default="8,32,64", help="Comma separated claims in flight")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -7,19 +7,192 @@ Demonstrates how TPA system integrates with Lexicon AI Service APIs
 import asyncio
 import aiohttp
 import json
-from typing import Dict, List, Optional
+from aiohttp import TCPConnector
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
 from datetime import datetime
 
+class LexiconAPIError(Exception):
+    """Error response other than 404 (transient, never cached)"""
+
+class _LoadAbandoned(Exception):
+    """The caller running a load was cancelled; callers waiting on it load again"""
+
+class AsyncTTLCache:
+    """Async-aware TTL cache with single-flight coalescing
+    
+    Concurrent lookups of a key that is not cached share one in-flight load
+    instead of each going over the wire. `None` results (unmapped codes,
+    unknown concepts) are cached for `negative_ttl`; errors are not cached.
+    Cached values are shared between callers and must not be mutated.
+    """
+    
+    def __init__(self, ttl: float = 300.0, negative_ttl: float = 60.0, max_size: int = 10000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+    
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        while True:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if loop.time() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self.negative_hits += value is None
+                    return value
+                del self._entries[key]
+            
+            # Someone is already loading this key: wait for their result
+            pending = self._in_flight.get(key)
+            if pending is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except _LoadAbandoned:
+                continue  # Its caller was cancelled, not us: look again (and load if nobody is)
+        
+        self.misses += 1
+        future = loop.create_future()
+        self._in_flight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            # Only this caller was cancelled: waiters retry instead of inheriting the cancellation
+            future.set_exception(_LoadAbandoned())
+            future.exception()  # Mark retrieved when nobody was waiting
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody was waiting
+            raise
+        finally:
+            del self._in_flight[key]
+        
+        future.set_result(value)
+        self._entries[key] = (loop.time() + (self.ttl if value is not None else self.negative_ttl), value)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return value
+    
+    def clear(self) -> None:
+        self._entries.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced
+        }
+
+class MappingBatcher:
+    """Micro-batches individual code lookups into one batch request
+    
+    Calls to `submit` are collected for up to `window` seconds or until
+    `max_items` are pending, then sent together through `send_batch` and the
+    results fanned back out to each caller in order.
+    """
+    
+    def __init__(self, send_batch: Callable[[List[Tuple[str, str]]], Awaitable[List[Optional[Dict]]]],
+                 window: float = 0.002, max_items: int = 64):
+        self.send_batch = send_batch
+        self.window = window
+        self.max_items = max_items
+        self._pending: List[Tuple[Tuple[str, str], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._sending = set()  # Keeps flush tasks referenced until they finish
+        self.batches = 0
+        self.items = 0
+    
+    async def submit(self, system: str, code: str) -> Optional[Dict]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(((system, code), future))
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+    
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+    
+    async def _send(self, batch: List[Tuple[Tuple[str, str], asyncio.Future]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = await self.send_batch([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise LexiconAPIError(f"Batch mapping returned {len(results)} results for {len(batch)} codes")
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+    
+    def stats(self) -> Dict[str, float]:
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0
+        }
+
 class LexiconAIClient:
     """Client for Lexicon AI Service APIs"""
     
-    def __init__(self, base_url: str, api_key: str):
+    def __init__(self, base_url: str, api_key: str, pool_size: int = 100,
+                 keepalive_timeout: float = 30.0, timeout: float = 30.0, use_cache: bool = True,
+                 cache_ttl: float = 300.0, negative_ttl: float = 60.0, cache_size: int = 10000,
+                 batch_mappings: bool = False, batch_window: float = 0.002, batch_max_items: int = 64):
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
         self.session = None
+        # Mappings and concept details repeat thousands of times per claims batch
+        self.cache = AsyncTTLCache(cache_ttl, negative_ttl, cache_size) if use_cache else None
+        # Individual map_external_code calls ride one /mapping/batch request per window
+        self.batcher = (MappingBatcher(self.map_external_codes, batch_window, batch_max_items)
+                        if batch_mappings else None)
     
     async def __aenter__(self):
+        # One pooled session for every call: keep-alive connections are reused
+        # across concurrent claims instead of reconnecting per request
+        connector = TCPConnector(
+            limit=self.pool_size,  # Total connection pool size
+            limit_per_host=self.pool_size,  # All traffic goes to one host
+            ttl_dns_cache=300,  # DNS cache TTL
+            keepalive_timeout=self.keepalive_timeout
+        )
         self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
             headers={
                 'Authorization': f'Bearer {self.api_key}',
                 'Content-Type': 'application/json'
@@ -45,19 +218,48 @@ class LexiconAIClient:
             data = await resp.json()
             return data.get('data', [])
     
-    async def map_external_code(self, system: str, code: str) -> Optional[Dict]:
-        """Map external code (ICD-10, SNOMED) to internal concept"""
-        async with self.session.get(f'{self.base_url}/api/v1/mapping/{system}/{code}') as resp:
+    async def _get_optional(self, url: str) -> Optional[Dict]:
+        """GET a resource; None when it does not exist (404), LexiconAPIError otherwise"""
+        async with self.session.get(url) as resp:
             if resp.status == 200:
                 return await resp.json()
+            if resp.status == 404:
+                return None
+            raise LexiconAPIError(f"GET {url} returned HTTP {resp.status}")
+    
+    async def _cached(self, key: Hashable, load: Callable[[], Awaitable[Optional[Dict]]]) -> Optional[Dict]:
+        try:
+            if self.cache is None:
+                return await load()
+            return await self.cache.get_or_load(key, load)
+        except LexiconAPIError:
             return None
     
+    async def _cached_get(self, key: Hashable, url: str) -> Optional[Dict]:
+        return await self._cached(key, lambda: self._get_optional(url))
+    
+    async def map_external_code(self, system: str, code: str) -> Optional[Dict]:
+        """Map external code (ICD-10, SNOMED) to internal concept"""
+        if self.batcher is not None:
+            return await self._cached(('mapping', system, code), lambda: self.batcher.submit(system, code))
+        return await self._cached_get(('mapping', system, code),
+                                      f'{self.base_url}/api/v1/mapping/{system}/{code}')
+    
+    async def map_external_codes(self, codes: List[Tuple[str, str]]) -> List[Optional[Dict]]:
+        """Map many (system, code) pairs in one request; None for unmapped codes"""
+        async with self.session.post(
+            f'{self.base_url}/api/v1/mapping/batch',
+            json={'codes': [{'system': system, 'code': code} for system, code in codes]}
+        ) as resp:
+            if resp.status != 200:
+                raise LexiconAPIError(f"POST /api/v1/mapping/batch returned HTTP {resp.status}")
+            data = await resp.json()
+            return data['results']
+    
     async def get_concept_details(self, concept_id: int) -> Optional[Dict]:
         """Get detailed concept information"""
-        async with self.session.get(f'{self.base_url}/api/v1/concepts/{concept_id}') as resp:
-            if resp.status == 200:
-                return await resp.json()
-            return None
+        return await self._cached_get(('concept', concept_id),
+                                      f'{self.base_url}/api/v1/concepts/{concept_id}')
     
     # ===================================================================
     # MODULE 2: FHIR PROCESSING INTEGRATION
@@ -124,18 +326,35 @@ class LexiconAIClient:
             return await resp.json()
 
 class TPAClaimsProcessor:
-    """TPA Claims Processor with Lexicon AI integration"""
+    """TPA Claims Processor with Lexicon AI integration
+    
+    With `concurrent=True` independent calls of a claim go out together:
+    all diagnosis mappings at once, then recommendations and validation at
+    once, so claim latency is two round trips instead of the sum of all.
+    """
     
-    def __init__(self, lexicon_client: LexiconAIClient):
+    def __init__(self, lexicon_client: LexiconAIClient, concurrent: bool = True):
         self.lexicon = lexicon_client
+        self.concurrent = concurrent
+    
+    async def _run_all(self, *calls):
+        """Await independent calls together (concurrent mode) or one after another"""
+        if self.concurrent:
+            return await asyncio.gather(*calls)
+        return [await call for call in calls]
+    
+    async def _no_result(self):
+        return None
     
     async def process_claim_with_ai(self, claim_data: Dict) -> Dict:
         """Enhanced claims processing with AI validation"""
         
         # 1. Map claim codes to internal concepts
+        diagnoses = claim_data.get('diagnoses', [])
+        mappings = await self._run_all(*(self.lexicon.map_external_code('ICD-10', diagnosis['code'])
+                                         for diagnosis in diagnoses))
         mapped_concepts = []
-        for diagnosis in claim_data.get('diagnoses', []):
-            concept = await self.lexicon.map_external_code('ICD-10', diagnosis['code'])
+        for diagnosis, concept in zip(diagnoses, mappings):
             if concept:
                 mapped_concepts.append({
                     'original_code': diagnosis['code'],
@@ -153,14 +372,14 @@ class TPAClaimsProcessor:
                 'season': self._get_current_season()
             }
             
-            recommendations = await self.lexicon.get_clinical_recommendations(
+            recommendations_call = self.lexicon.get_clinical_recommendations(
                 primary_diagnosis['concept_id'],
                 patient_context
             )
         else:
-            recommendations = None
+            recommendations_call = self._no_result()
         
-        # 3. Validate treatment plan
+        # 3. Validate treatment plan (independent of the recommendations)
         if claim_data.get('procedures'):
             treatment_plan = {
                 'diagnosis_concept_id': mapped_concepts[0]['concept']['concept_id'] if mapped_concepts else None,
@@ -168,9 +387,11 @@ class TPAClaimsProcessor:
                 'medications': [m['concept_id'] for m in claim_data.get('medications', [])]
             }
             
-            validation = await self.lexicon.validate_treatment_plan(treatment_plan)
+            validation_call = self.lexicon.validate_treatment_plan(treatment_plan)
         else:
-            validation = None
+            validation_call = self._no_result()
+        
+        recommendations, validation = await self._run_all(recommendations_call, validation_call)
         
         # 4. Generate processing result
         return {
@@ -183,6 +404,29 @@ class TPAClaimsProcessor:
             'processed_at': datetime.now().isoformat()
         }
     
+    async def process_claims(self, claims: List[Dict], concurrency: int = 32) -> List[Dict]:
+        """Process many claims with at most `concurrency` in flight; results keep input order
+        
+        A claim that fails (timeout, HTTP error) yields an ERROR result for
+        manual review instead of aborting the batch.
+        """
+        semaphore = asyncio.BoundedSemaphore(concurrency)
+        
+        async def process_one(claim_data: Dict) -> Dict:
+            async with semaphore:
+                try:
+                    return await self.process_claim_with_ai(claim_data)
+                except (aiohttp.ClientError, asyncio.TimeoutError, KeyError) as e:
+                    return {
+                        'claim_id': claim_data.get('claim_id'),
+                        'processing_decision': 'MANUAL_REVIEW',
+                        'processing_status': 'ERROR',
+                        'error': f"{type(e).__name__}: {e}",
+                        'processed_at': datetime.now().isoformat()
+                    }
+        
+        return await asyncio.gather(*(process_one(claim) for claim in claims))
+    
     def _get_current_season(self) -> str:
         """Determine current season (simplified)"""
         month = datetime.now().month
@@ -277,6 +521,15 @@ async def demo_tpa_integration():
         print(f"   - Confidence: {result['confidence_score']:.2f}")
         print(f"   - Mapped concepts: {len(result['mapped_concepts'])}")
         
+        # 4b. Process a batch of claims concurrently over the pooled session
+        print("\n4b. Processing a batch of 50 claims (16 in flight):")
+        batch = [dict(sample_claim, claim_id=f'CLM-2025-{i:03d}') for i in range(1, 51)]
+        started = asyncio.get_running_loop().time()
+        results = await tpa_processor.process_claims(batch, concurrency=16)
+        elapsed = asyncio.get_running_loop().time() - started
+        print(f"   - Processed: {len(results)} claims in {elapsed:.2f}s ({len(results) / elapsed:.0f} claims/s)")
+        print(f"   - Client cache: {lexicon.cache.stats()}")
+        
         # 5. GraphQL query example
         print("\n5. GraphQL clinical pathway query:")
         graphql_query = """
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the prefix autocomplete index
+Reports lookup latency (microseconds) and memory per million indexed terms
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from concept_store import ConceptStore
+from search_index import PrefixIndex
+from synthetic_data import generate_concepts, sample_queries
+
+
+def run(size: int, lookups: int, limit: int) -> None:
+    concepts = generate_concepts(size)
+    rng = random.Random(11)
+    popularity = {c['concept_id']: rng.random() for c in concepts}
+
+    start = time.perf_counter()
+    index = PrefixIndex.from_concepts(ConceptStore(concepts).records, popularity)
+    build_time = time.perf_counter() - start
+
+    terms = len(index.rows)
+    mb_per_million = index.nbytes / terms * 1_000_000 / 2 ** 20
+    print(f"{size:>9,} concepts | {terms:>10,} terms | build {build_time:6.1f}s | "
+          f"{index.nbytes / 2 ** 20:7.1f} MiB ({mb_per_million:5.1f} MiB per 1M terms)")
+
+    # Keystroke-style prefixes of realistic queries
+    queries = sample_queries(concepts, lookups)
+    for length in (1, 2, 3, 4, 6):
+        prefixes = [q.lower()[:length] for q in queries]
+        samples = []
+        for prefix in prefixes:
+            t0 = time.perf_counter()
+            index.top_k(prefix, limit)
+            samples.append(time.perf_counter() - t0)
+        micros = np.array(samples) * 1e6
+        print(f"    prefix len {length}: p50 {np.percentile(micros, 50):8.1f}us  p99 {np.percentile(micros, 99):8.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma separated lexicon sizes")
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        run(size, args.lookups, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the result cache
+Replays skewed (Zipf-like) search traffic against the search engine with
+different cache sizes and eviction policies and reports hit rate and latency
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from concept_store import ConceptStore
+from main import ConceptSearchEngine
+from result_cache import ResultCache
+from synthetic_data import generate_concepts, sample_queries
+
+
+def zipf_traffic(queries: list, n: int, exponent: float = 1.1, seed: int = 23) -> list:
+    """A few terms ("DBD", "CBC") dominate, with a long tail"""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** exponent for rank in range(len(queries))]
+    return rng.choices(queries, weights=weights, k=n)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concepts", type=int, default=100000)
+    parser.add_argument("--distinct-queries", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sizes", default="0,1000,10000")
+    args = parser.parse_args()
+
+    concepts = generate_concepts(args.concepts)
+    engine = ConceptSearchEngine(ConceptStore(concepts))
+    traffic = zipf_traffic(list(dict.fromkeys(sample_queries(concepts, args.distinct_queries))), args.requests)
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        for policy in ("lru", "fifo"):
+            cache = ResultCache(max_size=size, ttl=300, policy=policy)
+            samples = []
+            for query in traffic:
+                t0 = time.perf_counter()
+                cache.get_or_compute((query, 10, True), engine.search, query, 10, True)
+                samples.append(time.perf_counter() - t0)
+            ms = np.array(samples) * 1000
+            stats = cache.stats()
+            print(f"size {size:>6} {policy:>4} | hit rate {stats['hit_rate'] or 0:6.1%} | evictions {stats['evictions']:>6} "
+                  f"| mean {ms.mean():6.3f}ms p50 {np.percentile(ms, 50):6.3f}ms p99 {np.percentile(ms, 99):6.3f}ms")
+            if size == 0:
+                break
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark for clinical recommendations
+Compares the original per-request scoring loop with the precomputed context
+score tables over a full national location x season grid
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from cds_tables import ContextScoreTables
+from concept_store import ConceptStore
+from synthetic_data import SEASONS, generate_concepts, generate_locations, generate_relationships
+
+
+def legacy_recommendations(store: ConceptStore, relationships: Dict[int, List[Dict]],
+                           diagnosis_id: int, context: Dict) -> List[Dict]:
+    """Original implementation: string keys, dict probes, reasoning and sort per request"""
+    if diagnosis_id not in relationships:
+        return []
+    recommendations = []
+    for rel in relationships[diagnosis_id]:
+        target_concept = store.get(rel['target_id'])
+        priority = rel['priority']
+        context_key = f"{context.get('location', '')}_{context.get('season', '')}"
+        if context_key in rel.get('context_boost', {}):
+            priority += rel['context_boost'][context_key]
+        elif context.get('season') in rel.get('context_boost', {}):
+            priority += rel['context_boost'][context.get('season')]
+        priority = min(priority, 1.0)
+
+        location = context.get('location', 'Indonesia')
+        season = context.get('season', '')
+        templates = {
+            'HAS_DIAGNOSTIC_TEST': f"{target_concept.indonesian_name} penting untuk monitoring kondisi pasien",
+            'HAS_TREATMENT': f"{target_concept.indonesian_name} efektif untuk penanganan simptomatik"
+        }
+        reason = templates.get(rel['type'], f"{target_concept.indonesian_name} direkomendasikan")
+        if location == "Manado" and season == "WET":
+            reason += f" - tinggi di {location} saat musim hujan"
+        elif season == "WET":
+            reason += " - penting saat musim hujan"
+
+        recommendations.append({'concept': target_concept.to_dict(), 'priority_score': priority,
+                                'confidence': 0.9, 'reason': reason})
+    return sorted(recommendations, key=lambda x: x['priority_score'], reverse=True)
+
+
+def percentiles_us(samples: List[float]) -> str:
+    values = np.array(samples) * 1e6
+    return f"p50 {np.percentile(values, 50):7.1f}us p99 {np.percentile(values, 99):7.1f}us"
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concepts", type=int, default=20000)
+    parser.add_argument("--locations", type=int, default=514)
+    parser.add_argument("--per-diagnosis", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    concepts = generate_concepts(args.concepts)
+    store = ConceptStore(concepts)
+    locations = generate_locations(args.locations)
+    relationships = generate_relationships(concepts, locations, args.per_diagnosis)
+
+    t0 = time.perf_counter()
+    tables = ContextScoreTables(store, relationships, locations, SEASONS)
+    build_seconds = time.perf_counter() - t0
+    print(f"{len(relationships)} diagnoses x {len(tables.locations)} locations x {len(tables.seasons)} seasons "
+          f"x {args.per_diagnosis} relationships | build {build_seconds:.2f}s | {tables.nbytes / 2**20:.1f} MiB")
+
+    # Every (location, season) of the national grid, plus unknown/missing context
+    rng = random.Random(5)
+    grid = [{"location": loc, "season": season} for loc in locations for season in SEASONS] + [{}]
+    diagnoses = list(relationships)
+    requests = [(rng.choice(diagnoses), rng.choice(grid)) for _ in range(args.requests)]
+
+    legacy, precomputed = [], []
+    for diagnosis_id, context in requests:
+        t0 = time.perf_counter()
+        expected = legacy_recommendations(store, relationships, diagnosis_id, context)
+        legacy.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        result = tables.recommend(diagnosis_id, context.get('location', ''), context.get('season', ''))
+        precomputed.append(time.perf_counter() - t0)
+        assert result == expected, (diagnosis_id, context)
+
+    print(f"legacy loop    : {percentiles_us(legacy)}")
+    print(f"score tables   : {percentiles_us(precomputed)}  (results identical on {len(requests)} requests)")
+
+    rebuilds = []
+    for diagnosis_id in rng.sample(diagnoses, min(200, len(diagnoses))):
+        relationships[diagnosis_id][0]["context_boost"][f"{rng.choice(locations)}_WET"] = 0.25
+        t0 = time.perf_counter()
+        tables.rebuild_diagnosis(diagnosis_id)
+        rebuilds.append(time.perf_counter() - t0)
+    print(f"incremental rebuild of one diagnosis: {percentiles_us(rebuilds)}")
+
+
+if __name__ == "__main__":
+    main_cli()
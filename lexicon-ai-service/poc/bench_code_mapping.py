@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the code mapping index
+Compares startup cost of parsing a CSV export against mapping the compiled
+binary file, and reports lookup latency for exact and fallback matches
+"""
+
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from code_mapping import CodeMappingIndex, read_mapping_csv
+from synthetic_data import generate_code_mappings
+
+FIELDS = ["concept_id", "coding_system_name", "code_value", "code_description", "mapping_confidence"]
+
+
+def percentiles_us(samples: list) -> str:
+    arr = np.array(samples) * 1e6
+    return f"p50 {np.percentile(arr, 50):6.1f}us p99 {np.percentile(arr, 99):6.1f}us"
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concepts", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="lexicon-mapping-")
+    csv_path = os.path.join(workdir, "code_mappings.csv")
+    index_path = os.path.join(workdir, "code_mappings.lxcm")
+
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writeheader()
+        writer.writerows(generate_code_mappings(args.concepts))
+
+    t0 = time.perf_counter()
+    table = {(row["coding_system_name"], row["code_value"]): row for row in read_mapping_csv(csv_path)}
+    csv_seconds = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    CodeMappingIndex.build(read_mapping_csv(csv_path), index_path)
+    build_seconds = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    index = CodeMappingIndex.open(index_path)
+    open_seconds = time.perf_counter() - t0
+
+    print(f"{len(index)} mappings | csv {os.path.getsize(csv_path) / 2**20:.1f} MiB, "
+          f"index {os.path.getsize(index_path) / 2**20:.1f} MiB")
+    print(f"startup: parse csv {csv_seconds * 1000:8.1f}ms | open mmap index {open_seconds * 1000:6.2f}ms "
+          f"| one-off compile {build_seconds:.1f}s")
+
+    rng = random.Random(3)
+    keys = rng.sample(list(table), min(args.lookups, len(table)))
+    del table
+    # Fallback: unmapped 5th-character extensions of mapped ICD-10 codes
+    icd = [code for system, code in keys if system == "ICD-10"] or ["A00"]
+    cases = {
+        "exact": keys,
+        "fallback": [("ICD-10", rng.choice(icd).split(".")[0] + ".99") for _ in range(len(keys))],
+        "icd-9-cm alias": [("icd9cm", code) for system, code in keys if system == "ICD-9-CM"],
+    }
+    for name, queries in cases.items():
+        samples = []
+        for system, code in queries:
+            t0 = time.perf_counter()
+            index.lookup(system, code)
+            samples.append(time.perf_counter() - t0)
+        print(f"lookup {name:>14}: {percentiles_us(samples)} over {len(queries)} codes")
+
+    os.remove(csv_path)
+    os.remove(index_path)
+    os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark for search engine cold start
+Starts N worker processes per mode (fit TF-IDF/trigram/prefix indexes at
+startup vs memory-map a prebuilt artifact) and reports engine startup time,
+first-query latency and per-worker resident / proportional memory
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from typing import Dict
+
+import main
+from concept_store import ConceptStore
+from index_artifact import build_artifact
+from synthetic_data import generate_concepts, sample_queries
+
+
+def memory_mib() -> Dict[str, float]:
+    """Rss and Pss (shared pages split between the processes mapping them), Linux only"""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if line[0].isupper())
+    except OSError:
+        return {"rss": float("nan"), "pss": float("nan")}
+    return {key.lower(): int(fields[key].split()[0]) / 1024 for key in ("Rss", "Pss")}
+
+
+def worker(size: int, index_path: str, barrier, results) -> None:
+    concepts = generate_concepts(size)
+    store = ConceptStore(concepts)
+    before = memory_mib()
+    t0 = time.perf_counter()
+    engine = main.ConceptSearchEngine(store, index_path)
+    startup = time.perf_counter() - t0
+
+    queries = sample_queries(concepts, 200)
+    t0 = time.perf_counter()
+    engine.search(queries[0])
+    first_query = time.perf_counter() - t0
+    for query in queries:
+        engine.search(query)
+        engine.autocomplete(query[:2])
+
+    # Measure while every worker is alive, so shared pages are split N ways
+    barrier.wait()
+    after = memory_mib()
+    results.put({"startup": startup, "first_query": first_query,
+                 "rss": after["rss"] - before["rss"], "pss": after["pss"] - before["pss"]})
+    barrier.wait()
+
+
+def run_mode(size: int, workers: int, index_path) -> Dict[str, float]:
+    context = multiprocessing.get_context("spawn")  # fresh interpreters, like uvicorn --workers
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(size, index_path, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000", help="Comma separated lexicon sizes")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes per mode")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="lexicon-index-")
+    for size in map(int, args.sizes.split(",")):
+        path = os.path.join(workdir, f"search-{size}.lxsi")
+        store = ConceptStore(generate_concepts(size))
+        t0 = time.perf_counter()
+        artifact_bytes = build_artifact(store.records, main.CONCEPT_POPULARITY, path)
+        build_seconds = time.perf_counter() - t0
+        del store
+
+        print(f"{size} concepts | artifact {artifact_bytes / 2**20:.1f} MiB, one-off build {build_seconds:.1f}s "
+              f"| {args.workers} workers")
+        for name, index_path in (("fit at startup", None), ("mmap artifact", path)):
+            r = run_mode(size, args.workers, index_path)
+            print(f"  {name:>15}: startup {r['startup'] * 1000:9.1f}ms | first query "
+                  f"{r['first_query'] * 1000:6.2f}ms | per worker rss {r['rss']:7.1f} MiB, "
+                  f"pss {r['pss']:7.1f} MiB")
+        os.remove(path)
+    os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    main_cli()
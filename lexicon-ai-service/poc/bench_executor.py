@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Load test for the engine execution layer
+Drives concurrent searches through EngineExecutor in each mode and reports
+throughput plus event-loop responsiveness (what /api/v1/health would see)
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+import main
+from executor import EngineExecutor, ExecutorSaturated
+from synthetic_data import generate_concepts, sample_queries
+
+
+async def probe_loop_lag(stop: asyncio.Event, samples: list, interval: float = 0.005) -> None:
+    """Measure how late a trivial coroutine gets scheduled while engines run"""
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - t0 - interval)
+
+
+async def drive(executor: EngineExecutor, queries: list, concurrency: int) -> dict:
+    pending = iter(queries)
+    rejected = 0
+
+    async def client():
+        nonlocal rejected
+        for query in pending:
+            try:
+                await executor.run(main._search_task, query, 10, True)
+            except ExecutorSaturated:
+                rejected += 1
+
+    stop = asyncio.Event()
+    lag = []
+    probe = asyncio.create_task(probe_loop_lag(stop, lag))
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await probe
+
+    lag_ms = np.array(lag or [0.0]) * 1000
+    return {
+        "throughput": (len(queries) - rejected) / elapsed,
+        "rejected": rejected,
+        "loop_lag_p99_ms": float(np.percentile(lag_ms, 99)),
+        "loop_lag_max_ms": float(lag_ms.max()),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concepts", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma separated pool sizes")
+    args = parser.parse_args()
+
+    # Replace the sample lexicon before any pool exists so forked workers inherit it
+    concepts = generate_concepts(args.concepts)
+    main.lexicon.swap(main.build_snapshot(2, concepts, main.CLINICAL_RELATIONSHIPS))
+    queries = sample_queries(concepts, args.requests)
+
+    configs = [("inline", 1)] + [(mode, int(w)) for mode in ("threads", "processes")
+                                 for w in args.workers.split(",")]
+    for mode, workers in configs:
+        # Queue sized to the client concurrency so nothing is shed in this run
+        executor = EngineExecutor(mode, max_workers=workers, max_queue=args.concurrency)
+        result = asyncio.run(drive(executor, queries, args.concurrency))
+        executor.shutdown()
+        print(f"{mode:>9} x{workers:<2} | {result['throughput']:8.1f} req/s | rejected {result['rejected']:>4} | "
+              f"loop lag p99 {result['loop_lag_p99_ms']:7.2f}ms max {result['loop_lag_max_ms']:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark for bulk FHIR claim processing
+Streams synthetic NDJSON claims through the bulk pipeline and reports claims
+per second plus peak Python heap, which should not grow with the claim count
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+import main
+from fhir_stream import iter_ndjson_claims, stream_results
+from synthetic_data import generate_claims
+
+
+async def ndjson_chunks(n: int, lines_per_chunk: int = 512):
+    """Lazily encode claims as NDJSON byte chunks, like a client upload"""
+    lines = []
+    for claim in generate_claims(n):
+        lines.append(json.dumps(claim).encode())
+        if len(lines) == lines_per_chunk:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines)
+
+
+async def run_bulk(n: int, batch_size: int) -> dict:
+    async def process_batch(batch):
+        return main.lexicon.current.fhir_processor.process_claims(batch)
+
+    output_bytes = 0
+    summary = None
+    started = time.perf_counter()
+    async for line in stream_results(iter_ndjson_claims(ndjson_chunks(n)), process_batch, batch_size):
+        output_bytes += len(line)
+        summary = line
+    elapsed = time.perf_counter() - started
+    return {"elapsed": elapsed, "output_bytes": output_bytes, "summary": json.loads(summary)["summary"]}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000", help="Comma separated claim counts")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    for n in (int(s) for s in args.sizes.split(",")):
+        tracemalloc.start()
+        result = asyncio.run(run_bulk(n, args.batch_size))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        summary = result["summary"]
+        print(f"{n:>9} claims | {n / result['elapsed']:9.1f} claims/s | errors {summary['errors']:>5} | "
+              f"output {result['output_bytes'] / 2**20:7.1f} MiB | peak heap {peak / 2**20:6.2f} MiB")
+
+
+if __name__ == "__main__":
+    main_cli()
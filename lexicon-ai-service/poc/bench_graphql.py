@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the GraphQL endpoint's batched concept resolution
+Runs getClinicalPathway queries (the TPA example and a full pathway tree
+with a concept at every step) against a synthetic multi-hop lexicon, once
+with the per-request DataLoader and once resolving every concept field with
+its own lookup (N+1), and reports concept resolver calls, backend lookups
+and latency, in memory and with a simulated round trip per lookup over a
+connection pool (storage.py's default of 10).
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from concept_store import ConceptStore
+from graphql_api import DataLoader, GraphQLContext, GraphQLService, concept_payloads
+from pathway import PathwayEngine, PathwayGraph
+from synthetic_data import RELATIONSHIP_TYPES, generate_concepts, generate_locations, generate_relationships
+
+TPA_QUERY = """
+query getClinicalPathway($diagnosisId: Int!, $context: ClinicalContextInput) {
+    getClinicalPathway(diagnosisId: $diagnosisId, context: $context) {
+        diagnosis { canonical_name }
+        treatments { concept { canonical_name } priority_score }
+    }
+}
+"""
+
+TREE_QUERY = """
+query tree($diagnosisId: Int!, $context: ClinicalContextInput) {
+    getClinicalPathway(diagnosisId: $diagnosisId, context: $context, maxDepth: 3, maxBranch: 5) {
+        diagnosis { canonical_name }
+        diagnosticTests { concept { canonical_name concept_type } priority_score }
+        treatments { concept { canonical_name concept_type } priority_score }
+        related { concept { canonical_name concept_type } priority_score }
+        pathway {
+            type path_score concept { canonical_name synonyms }
+            next {
+                type path_score concept { canonical_name synonyms }
+                next { type path_score concept { canonical_name synonyms } }
+            }
+        }
+    }
+}
+"""
+
+
+class Backend:
+    """Bulk concept lookup counting calls and keys, optionally with a round trip per call
+
+    Round trips hold one of `pool_size` connections, so concurrent lookups
+    beyond the pool queue as they would on a database pool.
+    """
+
+    def __init__(self, store: ConceptStore, latency: float, pool_size: int):
+        self.store = store
+        self.latency = latency
+        self.pool = asyncio.Semaphore(pool_size)
+        self.calls = self.keys = 0
+
+    def lookup(self, concept_ids: List[int]):
+        self.calls += 1
+        self.keys += len(concept_ids)
+        if not self.latency:
+            return concept_payloads(self.store, concept_ids)
+        return self._lookup_later(concept_ids)
+
+    async def _lookup_later(self, concept_ids: List[int]) -> List[Optional[Dict]]:
+        async with self.pool:
+            await asyncio.sleep(self.latency)
+        return concept_payloads(self.store, concept_ids)
+
+
+class UnbatchedLoader:
+    """One lookup per concept field and no per-request cache: the N+1 pattern"""
+
+    def __init__(self, backend: Backend):
+        self.backend = backend
+
+    def load(self, concept_id: int):
+        values = self.backend.lookup([concept_id])
+        return values[0] if isinstance(values, list) else self._first(values)
+
+    @staticmethod
+    async def _first(values) -> Optional[Dict]:
+        return (await values)[0]
+
+    async def prime(self, concept_ids) -> None:
+        """Nothing to warm without a cache"""
+
+
+class ResolverCounter:
+    """graphql-core middleware counting resolver calls per field name"""
+
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+
+    def resolve(self, next_, root, info, **args):
+        self.calls[info.field_name] = self.calls.get(info.field_name, 0) + 1
+        return next_(root, info, **args)
+
+
+def synthetic_lexicon(concepts: int, follow_ups: int, rng: random.Random):
+    """Diagnoses -> tests / treatments (generate_relationships) -> follow-up concepts"""
+    records = generate_concepts(concepts, seed=3)
+    relationships = generate_relationships(records, generate_locations(), boosts_per_relationship=1)
+    targets = [c["concept_id"] for c in records if c["concept_type"] != "DIAGNOSIS"]
+    for target_id in targets:
+        relationships[target_id] = [{"target_id": rng.choice(targets), "type": rng.choice(RELATIONSHIP_TYPES),
+                                     "priority": round(rng.uniform(0.5, 0.99), 2)} for _ in range(follow_ups)]
+    diagnoses = [c["concept_id"] for c in records if c["concept_type"] == "DIAGNOSIS"]
+    return ConceptStore(records), relationships, diagnoses
+
+
+async def run(service: GraphQLService, engine: PathwayEngine, query: str, calls: List[Dict],
+              backend: Backend, batched: bool) -> Dict:
+    async def pathway(diagnosis_id: int, context: Dict, max_depth: int, max_branch: int) -> Optional[Dict]:
+        return engine.pathway(diagnosis_id, context['location'], context['season'], max_depth, max_branch,
+                              with_concepts=False)
+
+    async def recommendations(diagnosis_id: int, context: Dict) -> List[Dict]:
+        return []
+
+    counter, samples = ResolverCounter(), []
+    backend.calls = backend.keys = 0
+    for variables in calls:
+        loader = DataLoader(backend.lookup) if batched else UnbatchedLoader(backend)
+        context = GraphQLContext(engine.store, None, pathway, recommendations, loader)
+        t0 = time.perf_counter()
+        status, payload = await service.execute(query, variables, None, context, [counter])
+        samples.append(time.perf_counter() - t0)
+        assert status == 200 and "errors" not in payload, payload
+    resolvers = counter.calls.get("concept", 0) + counter.calls.get("diagnosis", 0)
+    return {"p50_ms": float(np.median(samples)) * 1e3, "p99_ms": float(np.percentile(samples, 99)) * 1e3,
+            "concept_resolvers": resolvers / len(calls),
+            "lookups": backend.calls / len(calls), "keys": backend.keys / len(calls), "payload": payload}
+
+
+async def main(args) -> None:
+    rng = random.Random(3)
+    store, relationships, diagnoses = synthetic_lexicon(args.concepts, args.follow_ups, rng)
+    engine = PathwayEngine(store, PathwayGraph.from_relationships(relationships))
+    service = GraphQLService()
+    locations = generate_locations()
+    calls = [{"diagnosisId": rng.choice(diagnoses),
+              "context": {"location": rng.choice(locations), "season": rng.choice(["WET", "DRY"])}}
+             for _ in range(args.queries)]
+    print(f"{len(store)} concepts, {engine.graph.num_edges} relationships, {args.queries} queries per run")
+
+    for name, query in (("TPA example query", TPA_QUERY), ("pathway tree, depth 3 x branch 5", TREE_QUERY)):
+        print(name)
+        for latency_ms in (0.0, args.lookup_latency_ms):
+            label = "in memory" if not latency_ms else f"{latency_ms:g}ms per lookup, pool {args.pool_size}"
+            queries = calls if not latency_ms else calls[:args.queries // 10]
+            results = {}
+            for batched in (False, True):
+                backend = Backend(store, latency_ms / 1e3, args.pool_size)
+                results[batched] = await run(service, engine, query, queries, backend, batched)
+            assert results[False]["payload"] == results[True]["payload"], "batched response differs"
+            for batched, result in results.items():
+                print(f"  {label:>26} {'DataLoader' if batched else 'per field':>10}: "
+                      f"{result['concept_resolvers']:.0f} concept resolvers, {result['lookups']:.1f} lookups "
+                      f"({result['keys']:.0f} keys), p50 {result['p50_ms']:.2f}ms p99 {result['p99_ms']:.2f}ms")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concepts", type=int, default=50000)
+    parser.add_argument("--follow-ups", type=int, default=4, help="Relationships per test / treatment concept")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--lookup-latency-ms", type=float, default=1.0)
+    parser.add_argument("--pool-size", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
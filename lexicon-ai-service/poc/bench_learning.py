@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark for relationship score learning
+Streams synthetic encounters through RelationshipLearner in batches and
+reports ingest throughput and rescoring time, then checks the counts of a
+small run against a plain per-encounter dict count.
+"""
+
+import argparse
+import time
+from collections import Counter
+from itertools import product
+
+import numpy as np
+
+from relationship_learning import DIAGNOSIS, EncounterBatch, RelationshipLearner
+from synthetic_data import SEASONS, generate_locations
+
+
+def synthetic_batch(rng: np.random.Generator, encounters: int, diagnoses: int, targets: int,
+                    locations: int, per_encounter: int = 4) -> EncounterBatch:
+    """One diagnosis and `per_encounter` lab test / medication rows per encounter
+
+    Targets are drawn near the diagnosis (Zipf-like offsets), so each
+    diagnosis has a few strongly associated concepts and a long tail.
+    """
+    diagnosis = rng.zipf(1.3, encounters) % diagnoses
+    offsets = rng.zipf(1.5, (encounters, per_encounter)) % targets
+    target = (diagnosis[:, None] * 7 + offsets) % targets
+    encounter = np.repeat(np.arange(encounters), per_encounter + 1)
+    concept = np.column_stack([diagnosis, 1_000_000 + target]).ravel()
+    role = np.column_stack([np.full(encounters, DIAGNOSIS),
+                            1 + (target % 2)]).ravel().astype(np.int8)
+    return EncounterBatch(encounter, concept, role,
+                          rng.integers(-1, locations, encounters).astype(np.int32),
+                          rng.integers(0, len(SEASONS), encounters).astype(np.int32))
+
+
+def naive_counts(batch: EncounterBatch) -> Counter:
+    """Per-encounter set products, counted in a dict"""
+    pairs = Counter()
+    rows = {}
+    for e, c, r in zip(batch.encounter.tolist(), batch.concept.tolist(), batch.role.tolist()):
+        rows.setdefault(e, ([], []))[r != DIAGNOSIS].append(c)
+    for diagnoses, targets in rows.values():
+        pairs.update(product(set(diagnoses), set(targets)))
+    return pairs
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--encounters", type=int, default=2_000_000)
+    parser.add_argument("--batch-size", type=int, default=250_000)
+    parser.add_argument("--diagnoses", type=int, default=15_000)
+    parser.add_argument("--targets", type=int, default=30_000)
+    parser.add_argument("--locations", type=int, default=514)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    learner = RelationshipLearner(generate_locations(args.locations))
+
+    # Correctness: sparse products against a dict count of the same batch
+    check = synthetic_batch(rng, 20_000, args.diagnoses, args.targets, args.locations)
+    reference = naive_counts(check)
+    learner.add_batch(check)
+    counts = learner.pair_counts.tocoo()
+    learned = Counter({(learner.diagnosis_ids[d], learner.target_ids[t]): n
+                       for d, t, n in zip(counts.row.tolist(), counts.col.tolist(), counts.data.tolist())})
+    assert learned == reference, "sparse counts differ from the dict count"
+    print(f"{check.num_encounters} encounters: sparse counts match a per-encounter dict count")
+
+    ingest_seconds = 0.0
+    remaining = args.encounters
+    while remaining > 0:
+        batch = synthetic_batch(rng, min(args.batch_size, remaining), args.diagnoses, args.targets,
+                                args.locations)
+        t0 = time.perf_counter()
+        changed = learner.add_batch(batch)
+        ingest_seconds += time.perf_counter() - t0
+        remaining -= batch.num_encounters
+    total = args.encounters
+    print(f"{total} encounters in batches of {args.batch_size}: {ingest_seconds:.1f}s "
+          f"({total / ingest_seconds:,.0f} encounters/s, overall and both context levels)")
+    t0 = time.perf_counter()
+    naive_counts(batch)
+    naive_seconds = time.perf_counter() - t0
+    print(f"  last batch: dict count {batch.num_encounters / naive_seconds:,.0f} encounters/s "
+          f"(overall counts only)")
+    stats = learner.stats()
+    print(f"  {stats['diagnoses']} diagnoses x {stats['targets']} targets, {stats['pairings']} pairings, "
+          f"{stats['context_pairings']} context pairings")
+
+    t0 = time.perf_counter()
+    rescored = learner.relationships(changed)
+    print(f"  rescoring the {len(changed)} diagnoses of the last batch: {time.perf_counter() - t0:.2f}s "
+          f"({sum(map(len, rescored.values()))} relationships)")
+    t0 = time.perf_counter()
+    everything = learner.relationships()
+    print(f"  rescoring everything: {time.perf_counter() - t0:.2f}s "
+          f"({sum(map(len, everything.values()))} relationships)")
+
+
+if __name__ == "__main__":
+    main_cli()
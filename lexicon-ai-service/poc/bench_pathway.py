@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark for clinical pathways
+Builds a CSR relationship graph with millions of typed, weighted edges and
+national context boosts, then compares pathway latency (cold, memoized)
+with a dict-of-lists walk that scores every edge per request, and the
+graph's footprint with the dict-of-lists form
+"""
+
+import argparse
+import random
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from cds_tables import context_priority
+from concept_store import ConceptStore
+from pathway import PathwayEngine, PathwayGraph
+from synthetic_data import RELATIONSHIP_TYPES, SEASONS, generate_concepts, generate_locations
+
+
+def synthetic_graph(concept_ids: np.ndarray, edges: int, locations: List[str], boosted_share: float,
+                    rng: np.random.Generator) -> PathwayGraph:
+    """Power-law out-degrees; a share of the edges boosted in one location_season and one season"""
+    weights = 1.0 / np.arange(1, len(concept_ids) + 1) ** 0.8
+    sources = rng.choice(concept_ids, edges, p=weights / weights.sum())
+    targets = rng.choice(concept_ids, edges)
+    types = rng.integers(0, len(RELATIONSHIP_TYPES), edges)
+    priority = np.round(rng.uniform(0.5, 0.99, edges), 2)
+
+    boosted = np.flatnonzero(rng.random(edges) < boosted_share)
+    keys = [f"{loc}_{season}" for loc in locations for season in SEASONS]
+    boosts = {}
+    for names in (keys, list(SEASONS)):
+        assigned = rng.integers(0, len(names), len(boosted))
+        values = np.round(rng.uniform(0.05, 0.2, len(boosted)), 2)
+        for k in np.unique(assigned).tolist():
+            boosts[names[k]] = (boosted[assigned == k], values[assigned == k])
+    return PathwayGraph.from_arrays(sources, targets, types, priority, list(RELATIONSHIP_TYPES), boosts)
+
+
+class DictOfLists(dict):
+    """CLINICAL_RELATIONSHIPS-shaped adjacency, converted from the graph per concept on first access"""
+
+    def __init__(self, graph: PathwayGraph):
+        super().__init__()
+        self.graph = graph
+        keys = list(graph.boosts)
+        edges = np.concatenate([graph.boosts[key][0] for key in keys])
+        order = np.argsort(edges, kind='stable')
+        self.boost_edges = edges[order]
+        self.boost_keys = np.repeat(np.arange(len(keys)), [len(graph.boosts[key][0]) for key in keys])[order]
+        self.boost_values = np.concatenate([graph.boosts[key][1] for key in keys])[order]
+        self.key_names = keys
+
+    def __missing__(self, concept_id: int) -> List[Dict]:
+        graph = self.graph
+        node = graph.index(concept_id)
+        rels = []
+        if node is not None:
+            start, end = int(graph.indptr[node]), int(graph.indptr[node + 1])
+            lo, hi = np.searchsorted(self.boost_edges, (start, end))
+            boosts: Dict[int, Dict[str, float]] = {}
+            for edge, key, value in zip(self.boost_edges[lo:hi].tolist(), self.boost_keys[lo:hi].tolist(),
+                                        self.boost_values[lo:hi].tolist()):
+                boosts.setdefault(edge, {})[self.key_names[key]] = value
+            rels = [{"target_id": int(graph.nodes[graph.targets[e]]), "type": graph.type_names[graph.types[e]],
+                     "priority": float(graph.priority[e]), "context_boost": boosts.get(e, {})}
+                    for e in range(start, end)]
+        self[concept_id] = rels
+        return rels
+
+
+def dict_walk(adjacency: Dict[int, List[Dict]], store: ConceptStore, concept_id: int, location: str,
+              season: str, depth: int, branch: int) -> List:
+    """Per-request walk: score, sort and recurse over dicts, nothing reused"""
+    rels = [rel for rel in adjacency[concept_id] if rel['target_id'] in store]
+    scored = sorted(((context_priority(rel, location, season), i, rel) for i, rel in enumerate(rels)),
+                    key=lambda item: (-item[0], item[1]))[:branch]
+    return [(rel['target_id'], score,
+             dict_walk(adjacency, store, rel['target_id'], location, season, depth - 1, branch) if depth > 1 else [])
+            for score, _, rel in scored]
+
+
+def timed(fn, calls) -> float:
+    """Median microseconds per call"""
+    samples = []
+    for args in calls:
+        t0 = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - t0)
+    return float(np.median(samples)) * 1e6
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concepts", type=int, default=200000)
+    parser.add_argument("--edges", default="1000000,5000000", help="Comma separated edge counts")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--branch", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--boosted-share", type=float, default=0.3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    pick = random.Random(11)
+    store = ConceptStore(generate_concepts(args.concepts, seed=11))
+    concept_ids = np.array([record.concept_id for record in store], dtype=np.int64)
+    locations = generate_locations()
+
+    for edges in map(int, args.edges.split(",")):
+        t0 = time.perf_counter()
+        graph = synthetic_graph(concept_ids, edges, locations, args.boosted_share, rng)
+        build_seconds = time.perf_counter() - t0
+        print(f"{graph.num_edges} edges, {len(graph.nodes)} concepts, {len(graph.boosts)} context keys: "
+              f"CSR built in {build_seconds:.1f}s, {graph.nbytes / 2 ** 20:.0f} MiB")
+
+        roots = [int(graph.nodes[i]) for i in rng.choice(len(graph.nodes), args.queries)]
+        calls = [(root, pick.choice(locations), pick.choice(SEASONS)) for root in roots]
+        adjacency = DictOfLists(graph)
+        walk = lambda root, loc, season: dict_walk(adjacency, store, root, loc, season, args.depth, args.branch)
+        timed(walk, calls)  # converts the concepts the walks reach
+        sample = list(adjacency.values())[:2000]
+        per_edge = sum(sys.getsizeof(rel) + sys.getsizeof(rel["context_boost"]) for rels in sample for rel in rels) \
+            / max(1, sum(map(len, sample)))
+        print(f"  dict-of-lists form: ~{per_edge * graph.num_edges / 2 ** 20:.0f} MiB "
+              f"(~{per_edge:.0f} bytes per edge before keys and values)")
+
+        walk_us = timed(walk, calls)
+        engine = PathwayEngine(store, graph)
+        steps = lambda root, loc, season: engine.steps(root, loc, season, args.depth, args.branch)
+        cold_us, warm_us = timed(steps, calls), timed(steps, calls)
+        payload_us = timed(lambda root, loc, season: engine.pathway(root, loc, season, args.depth, args.branch),
+                           calls)
+        print(f"  depth {args.depth} x branch {args.branch} walk, p50: dict-of-lists {walk_us:.0f}us | "
+              f"CSR cold {cold_us:.0f}us | CSR memoized {warm_us:.0f}us "
+              f"(memo {engine.memo.stats()['size']} subtrees)")
+        print(f"  full /cds/pathway payload from the memo: {payload_us:.0f}us")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark for outbreak risk scoring
+Scores a national diagnosis x 514-location x season grid with the original
+per-pair dict lookups and with one RiskModel broadcast, and times single
+predictions served from the precomputed grid
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from risk_model import SEASONS, RiskModel
+from synthetic_data import generate_locations
+
+
+def scalar_grid(seasonal_risk, location_multiplier, diagnoses, locations, seasons):
+    """The original per-request computation, once per combination"""
+    scores = {}
+    for diagnosis in diagnoses:
+        for location in locations:
+            for season in seasons:
+                base = seasonal_risk.get(diagnosis, {"WET": 0.5, "DRY": 0.5})[season]
+                scores[diagnosis, location, season] = min(base * location_multiplier.get(location, 1.0), 1.0)
+    return scores
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--diagnoses", type=int, default=2000)
+    parser.add_argument("--locations", type=int, default=514)
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    diagnoses = [f"DX{i:05d}" for i in range(args.diagnoses)]
+    locations = generate_locations(args.locations)
+    seasonal_risk = {d: {season: round(rng.uniform(0.1, 0.9), 2) for season in SEASONS} for d in diagnoses}
+    multipliers = {location: round(rng.uniform(0.7, 1.3), 2) for location in locations}
+    combinations = len(diagnoses) * len(locations) * len(SEASONS)
+
+    t0 = time.perf_counter()
+    reference = scalar_grid(seasonal_risk, multipliers, diagnoses, locations, SEASONS)
+    scalar_seconds = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    model = RiskModel(seasonal_risk, multipliers)
+    tables_seconds = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    grid = model.grid()
+    grid_seconds = time.perf_counter() - t0
+
+    sample = rng.sample(list(reference), 1000)
+    assert np.allclose([reference[key] for key in sample], [grid.get(*key)[0] for key in sample])
+
+    print(f"{combinations} combinations ({len(diagnoses)} diagnoses x {len(locations)} locations x "
+          f"{len(SEASONS)} seasons)")
+    print(f"  per-pair dict lookups: {scalar_seconds * 1000:9.1f}ms")
+    print(f"  RiskModel grid:        {grid_seconds * 1000:9.1f}ms "
+          f"({scalar_seconds / grid_seconds:.0f}x, tables built once in {tables_seconds * 1000:.1f}ms)")
+
+    keys = [(rng.choice(diagnoses), rng.choice(locations), rng.choice(SEASONS)) for _ in range(args.lookups)]
+    t0 = time.perf_counter()
+    for key in keys:
+        grid.get(*key)
+    lookup_us = (time.perf_counter() - t0) / len(keys) * 1e6
+    t0 = time.perf_counter()
+    for key in keys[:10000]:
+        model.predict(*key)
+    predict_us = (time.perf_counter() - t0) / min(len(keys), 10000) * 1e6
+    print(f"  single prediction: grid lookup {lookup_us:.2f}us vs scoring on demand {predict_us:.1f}us")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark for ConceptSearchEngine retrieval
+Compares the original dense cosine scan with the sparse top-k index and
+measures trigram (typo-tolerant) lookups and batched (per-claim) scoring
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from concept_store import ConceptStore
+from search_index import SparseTopKIndex, TrigramIndex
+from synthetic_data import generate_concepts, sample_queries
+
+
+def legacy_search(vectorizer, matrix, concepts: List[Dict], query: str, limit: int) -> List[Dict]:
+    """Original implementation: dense similarity row, Python loop, copy, full sort"""
+    query_vector = vectorizer.transform([query.lower()])
+    similarities = cosine_similarity(query_vector, matrix)[0]
+    results = []
+    for i, score in enumerate(similarities):
+        if score > 0.1:
+            concept = concepts[i].copy()
+            concept['match_score'] = float(score)
+            results.append(concept)
+    return sorted(results, key=lambda x: x['match_score'], reverse=True)[:limit]
+
+
+def topk_search(vectorizer, index: SparseTopKIndex, query: str, limit: int):
+    """New implementation: inverted-index scoring + argpartition top-k"""
+    return index.top_k(vectorizer.transform([query.lower()]), limit)
+
+
+def with_typo(query: str, rng: random.Random) -> str:
+    """Drop, duplicate or swap one character to simulate a typing error"""
+    if len(query) < 4:
+        return query
+    i = rng.randrange(1, len(query) - 2)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return query[:i] + query[i + 1:]
+    if kind == 1:
+        return query[:i] + query[i] + query[i:]
+    return query[:i] + query[i + 1] + query[i] + query[i + 2:]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p99 in milliseconds"""
+    values = np.array(samples) * 1000
+    return {"p50": float(np.percentile(values, 50)), "p99": float(np.percentile(values, 99))}
+
+
+def run(size: int, queries: int, legacy_queries: int, limit: int, batch_size: int) -> None:
+    concepts = generate_concepts(size)
+    texts = [f"{c['canonical_name']} {c['indonesian_name']} {' '.join(c['synonyms'])}".lower()
+             for c in concepts]
+
+    start = time.perf_counter()
+    vectorizer = TfidfVectorizer()
+    matrix = vectorizer.fit_transform(texts)
+    index = SparseTopKIndex(matrix)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fuzzy_index = TrigramIndex.from_concepts(ConceptStore(concepts).records)
+    fuzzy_build_time = time.perf_counter() - start
+
+    query_set = sample_queries(concepts, queries)
+
+    topk_times = []
+    for query in query_set:
+        t0 = time.perf_counter()
+        topk_search(vectorizer, index, query, limit)
+        topk_times.append(time.perf_counter() - t0)
+
+    # One matrix product per batch (e.g. all free-text terms of a claim)
+    batch_times = []
+    for start in range(0, len(query_set) - batch_size + 1, batch_size):
+        batch = [q.lower() for q in query_set[start:start + batch_size]]
+        t0 = time.perf_counter()
+        index.top_k_many(vectorizer.transform(batch), limit)
+        batch_times.append(time.perf_counter() - t0)
+
+    rng = random.Random(3)
+    fuzzy_times = []
+    for query in query_set:
+        typo = with_typo(query, rng)
+        t0 = time.perf_counter()
+        fuzzy_index.top_k(typo, limit)
+        fuzzy_times.append(time.perf_counter() - t0)
+
+    legacy_times = []
+    for query in query_set[:legacy_queries]:
+        t0 = time.perf_counter()
+        legacy_search(vectorizer, matrix, concepts, query, limit)
+        legacy_times.append(time.perf_counter() - t0)
+
+    new = percentiles(topk_times)
+    fuzzy = percentiles(fuzzy_times)
+    line = (f"{size:>9,} concepts | build {build_time:6.1f}s | top-k p50 {new['p50']:7.3f}ms p99 {new['p99']:7.3f}ms"
+            f" | trigram build {fuzzy_build_time:6.1f}s p50 {fuzzy['p50']:7.3f}ms p99 {fuzzy['p99']:7.3f}ms")
+    if batch_times:
+        batched = percentiles(batch_times)
+        line += f" | batch of {batch_size} p50 {batched['p50']:7.3f}ms"
+    if legacy_times:
+        old = percentiles(legacy_times)
+        line += f" | legacy p50 {old['p50']:8.3f}ms p99 {old['p99']:8.3f}ms"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="Comma separated lexicon sizes")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--legacy-queries", type=int, default=50,
+                        help="Queries to run through the original scan (0 to skip)")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32, help="Queries per search_many call")
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        run(size, args.queries, args.legacy_queries, args.limit, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
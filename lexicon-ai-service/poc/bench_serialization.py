@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark for response serialization
+Renders search and recommendation response bodies the FastAPI default way
+(concept dicts copied per hit, jsonable_encoder, JSONResponse), with one
+fast-encoder pass over the same dicts, and as the endpoints do, splicing
+the pre-encoded concept payloads (serialization.ConceptJSON), and reports
+CPU per request and that all three decode to the same document. Also times
+the per-snapshot encoding, in full and reusing the previous snapshot's.
+"""
+
+import argparse
+import gc
+import json
+import random
+import time
+from typing import Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import serialization
+from cds_tables import ContextScoreTables
+from concept_store import ConceptStore
+from search_index import SearchHit
+from serialization import ConceptJSON, JSONBytesResponse, RawJSON, dumps, encode
+from synthetic_data import SEASONS, generate_concepts, generate_locations, generate_relationships
+
+
+def cpu_us(render: Callable[[object], bytes], requests: List) -> float:
+    """CPU microseconds per rendered body"""
+    gc.collect()
+    t0 = time.process_time()
+    for request in requests:
+        render(request)
+    return (time.process_time() - t0) * 1e6 / len(requests)
+
+
+def search_renderers(store: ConceptStore, concept_json: ConceptJSON) -> Dict[str, Callable]:
+    def default(request):
+        query, pairs = request
+        results = [SearchHit(store.get(concept_id), score).to_dict() for concept_id, score in pairs]
+        payload = {"query": query, "results": results, "total": len(results)}
+        return JSONResponse(jsonable_encoder(payload)).body
+
+    def one_pass(request):
+        query, pairs = request
+        results = [SearchHit(store.get(concept_id), score).to_dict() for concept_id, score in pairs]
+        return JSONBytesResponse(dumps({"query": query, "results": results, "total": len(results)})).body
+
+    def spliced(request):
+        query, pairs = request
+        return JSONBytesResponse(encode({"query": query, "results": concept_json.search_hits(pairs),
+                                         "total": len(pairs)})).body
+
+    return {"FastAPI default": default, "dicts, one encoder pass": one_pass, "pre-encoded, spliced": spliced}
+
+
+def recommendation_renderers(store: ConceptStore, concept_json: ConceptJSON) -> Dict[str, Callable]:
+    # As served: recommendations come from the engine or the result cache with
+    # their concept dicts shared from the score tables, so only the response
+    # around them is built per request
+    def default(request):
+        diagnosis_id, context, recommendations = request
+        payload = {"diagnosis": store.get(diagnosis_id).to_dict(), "recommendations": recommendations,
+                   "context": context, "total_recommendations": len(recommendations)}
+        return JSONResponse(jsonable_encoder(payload)).body
+
+    def one_pass(request):
+        diagnosis_id, context, recommendations = request
+        return JSONBytesResponse(dumps({"diagnosis": store.get(diagnosis_id).to_dict(),
+                                        "recommendations": recommendations, "context": context,
+                                        "total_recommendations": len(recommendations)})).body
+
+    def spliced(request):
+        diagnosis_id, context, recommendations = request
+        return JSONBytesResponse(encode({"diagnosis": concept_json.concept(diagnosis_id),
+                                         "recommendations": RawJSON(dumps(recommendations)),
+                                         "context": RawJSON(dumps(context)),
+                                         "total_recommendations": len(recommendations)})).body
+
+    return {"FastAPI default": default, "dicts, one encoder pass": one_pass, "pre-encoded, spliced": spliced}
+
+
+def report(name: str, renderers: Dict[str, Callable], requests: List) -> None:
+    bodies = {label: [json.loads(render(request)) for request in requests[:500]]
+              for label, render in renderers.items()}
+    reference = bodies["FastAPI default"]
+    assert all(decoded == reference for decoded in bodies.values()), f"{name}: bodies differ"
+    body_bytes = sum(len(renderers["FastAPI default"](request)) for request in requests[:500]) / 500
+    print(f"{name} (~{body_bytes:.0f} byte bodies, all renderings decode identically)")
+    baseline = None
+    for label, render in renderers.items():
+        us = cpu_us(render, requests)
+        baseline = baseline or us
+        print(f"  {label:>24}: {us:6.1f}us CPU per request ({baseline / us:4.1f}x)")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concepts", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=10, help="Hits per search response")
+    parser.add_argument("--per-diagnosis", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    concepts = generate_concepts(args.concepts, seed=7)
+    store = ConceptStore(concepts)
+    t0 = time.perf_counter()
+    concept_json = ConceptJSON(store)
+    full_seconds = time.perf_counter() - t0
+    changed = {record.concept_id for record in rng.sample(store.records, len(store) // 100)}
+    next_store = ConceptStore(concepts)
+    t0 = time.perf_counter()
+    ConceptJSON(next_store, concept_json, changed)
+    reuse_seconds = time.perf_counter() - t0
+    print(f"{len(store)} concepts pre-encoded ({serialization.orjson and 'orjson' or 'json'}): "
+          f"{full_seconds:.2f}s, {concept_json.nbytes / 2 ** 20:.1f} MiB; "
+          f"next snapshot with 1% changed: {reuse_seconds:.2f}s")
+
+    ids = [record.concept_id for record in store]
+    searches = [(f"query {i}", [(concept_id, rng.random()) for concept_id in rng.sample(ids, args.limit)])
+                for i in range(args.requests)]
+    report(f"search, {args.limit} hits", search_renderers(store, concept_json), searches)
+
+    locations = generate_locations()
+    relationships = generate_relationships(concepts, locations, args.per_diagnosis)
+    tables = ContextScoreTables(store, relationships, locations, SEASONS)
+    diagnoses = list(relationships)
+    recommendations = []
+    for _ in range(args.requests):
+        diagnosis_id, location, season = rng.choice(diagnoses), rng.choice(locations), rng.choice(SEASONS)
+        recommendations.append((diagnosis_id, {"location": location, "season": season},
+                                tables.recommend(diagnosis_id, location, season)))
+    report(f"recommendations, {args.per_diagnosis} per diagnosis",
+           recommendation_renderers(store, concept_json), recommendations)
+
+
+if __name__ == "__main__":
+    main_cli()
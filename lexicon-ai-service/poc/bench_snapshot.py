@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark for lexicon hot reload
+Times snapshot builds for a full load, a relationship delta and a concept
+edit, and measures search latency on the event loop while a reload builds
+in the background
+"""
+
+import argparse
+import asyncio
+import copy
+import random
+import time
+from typing import List
+
+import numpy as np
+
+import main
+from snapshot import SnapshotManager
+from synthetic_data import generate_concepts, generate_locations, generate_relationships, sample_queries
+
+
+def percentiles_ms(samples: List[float]) -> str:
+    values = np.array(samples) * 1000
+    return f"p50 {np.percentile(values, 50):6.2f}ms p99 {np.percentile(values, 99):7.2f}ms max {values.max():7.1f}ms"
+
+
+async def serve_during(lexicon: SnapshotManager, concepts, relationships, queries: List[str]) -> None:
+    """Search continuously (as requests would) while `lexicon` reloads"""
+    samples, versions = [], set()
+    reload = asyncio.ensure_future(lexicon.reload(concepts, relationships))
+    i = 0
+    while not reload.done():
+        snapshot = lexicon.current
+        t0 = time.perf_counter()
+        snapshot.search_engine.search(queries[i % len(queries)])
+        samples.append(time.perf_counter() - t0)
+        versions.add(snapshot.version)
+        i += 1
+        await asyncio.sleep(0)
+    snapshot = await reload
+    print(f"  served {len(samples)} searches during the reload from versions {sorted(versions)}: "
+          f"{percentiles_ms(samples)} -> now version {snapshot.version}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concepts", type=int, default=100000)
+    parser.add_argument("--changed", type=float, default=0.01, help="Fraction of diagnoses/concepts edited")
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    concepts = generate_concepts(args.concepts)
+    relationships = generate_relationships(concepts, generate_locations())
+    queries = sample_queries(concepts, 500)
+
+    t0 = time.perf_counter()
+    lexicon = SnapshotManager(main.build_snapshot, concepts, relationships)
+    print(f"{len(concepts)} concepts, {len(relationships)} diagnoses | full build {time.perf_counter() - t0:.1f}s")
+
+    # Relationship delta: re-weighted priorities for a sample of diagnoses
+    edited = dict(relationships)
+    for diagnosis_id in rng.sample(list(relationships), max(1, int(len(relationships) * args.changed))):
+        edited[diagnosis_id] = [dict(rel, priority=round(rng.random(), 2)) for rel in relationships[diagnosis_id]]
+    snapshot = asyncio.run(lexicon.reload(concepts, edited))
+    print(f"relationship delta: {snapshot.build_seconds:6.2f}s | {snapshot.changes.to_dict()} | rebuilt {snapshot.rebuilt}")
+
+    # Concept edit: new synonyms change the search texts
+    renamed = copy.deepcopy(concepts)
+    for concept in rng.sample(renamed, max(1, int(len(renamed) * args.changed))):
+        concept["synonyms"] = concept.get("synonyms", []) + [f"{concept['canonical_name']} baru"]
+    snapshot = asyncio.run(lexicon.reload(renamed, edited))
+    print(f"concept edit:       {snapshot.build_seconds:6.2f}s | {snapshot.changes.to_dict()} | rebuilt {snapshot.rebuilt}")
+
+    print("serving during a concept-edit reload:")
+    asyncio.run(serve_during(lexicon, concepts, relationships, queries))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the database-backed lexicon store
+Bulk loads a synthetic lexicon (about 4 synonyms per concept) and compares
+reading it back through streaming cursors against fetching every row at
+once: throughput and peak Python memory (tracemalloc)
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+from storage import ACTIVE_STATUS, CONCEPTS_SQL, RELATIONSHIP_COLUMNS, open_repository, relationship_rows
+from synthetic_data import generate_concepts, generate_locations, generate_relationships
+
+
+async def measure(label: str, rows_label: str, coro_fn) -> None:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    rows = await coro_fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:>28}: {elapsed:6.2f}s | {rows / elapsed:9.0f} {rows_label}/s | peak {peak / 2**20:7.1f} MiB")
+
+
+async def run(database_url: str, size: int, create_schema: bool) -> None:
+    repository = await open_repository(database_url)
+    try:
+        if create_schema:
+            await repository.create_schema()
+        concepts = generate_concepts(size)
+        relationships = generate_relationships(concepts, generate_locations())
+
+        t0 = time.perf_counter()
+        loaded, synonyms = await repository.copy_concepts(concepts)
+        rels = await repository.copy_rows("xaie_concept_relationships", RELATIONSHIP_COLUMNS,
+                                          relationship_rows(relationships))
+        elapsed = time.perf_counter() - t0
+        print(f"bulk load: {loaded} concepts, {synonyms} synonyms, {rels} relationships in {elapsed:.1f}s "
+              f"({(loaded + synonyms + rels) / elapsed:.0f} rows/s)")
+        del concepts, relationships
+
+        print("read back:")
+
+        async def stream_concepts():
+            count = 0
+            async for _ in repository.iter_concepts():
+                count += 1
+            return count
+
+        async def load_lexicon():
+            records, rels = await repository.load_lexicon()
+            return len(records)
+
+        async def fetch_all():
+            # What a naive loader does: every joined row materialized at once
+            rows = [dict(row) for row in await repository.fetch(CONCEPTS_SQL, ACTIVE_STATUS)]
+            return len({row["concept_id"] for row in rows})
+
+        await measure("stream (records discarded)", "concepts", stream_concepts)
+        await measure("load_lexicon (records kept)", "concepts", load_lexicon)
+        await measure("fetch all rows", "concepts", fetch_all)
+
+        t0 = time.perf_counter()
+        for concept_id in range(1, 1001):
+            await repository.relationships_for(concept_id)
+        print(f"relationships_for: {time.perf_counter() - t0:.3f} ms/query (1000 sources)")
+    finally:
+        await repository.close()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concepts", type=int, default=250000)
+    parser.add_argument("--database-url",
+                        help="Database with the tables created and empty (default: a temporary SQLite file)")
+    args = parser.parse_args()
+
+    path = None
+    if args.database_url is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="lexicon-db-"), "lexicon.db")
+        args.database_url = f"sqlite:///{path}"
+    try:
+        asyncio.run(run(args.database_url, args.concepts, create_schema=path is not None))
+    finally:
+        if path:
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark for treatment plan validation
+Validates synthetic claim plans (mostly indicated items, some unindicated,
+contraindicated or unknown ones) by scanning the diagnosis's relationship
+list per plan item and with the precomputed per-diagnosis sets behind
+/cds/validate and /cds/validate/batch, and checks that both agree.
+"""
+
+import argparse
+import gc
+import random
+import time
+from typing import Dict, List
+
+from concept_store import ConceptStore
+from synthetic_data import generate_concepts, generate_locations, generate_relationships
+from validation import (CONTRAINDICATED, EXPECTED_PRIORITY, NOT_INDICATED, UNKNOWN_CONCEPT, TreatmentValidator,
+                        _PlanFindings, _plan_items)
+
+
+def add_contraindications(relationships: Dict[int, List[Dict]], targets: List[int], per_diagnosis: int,
+                          rng: random.Random) -> None:
+    for rels in relationships.values():
+        related = {rel['target_id'] for rel in rels}
+        for target_id in rng.sample(targets, per_diagnosis):
+            if target_id not in related:
+                rels.append({"target_id": target_id, "type": "HAS_CONTRAINDICATION", "priority": 1.0})
+
+
+def synthetic_plans(relationships: Dict[int, List[Dict]], targets: List[int], n: int, items: int,
+                    rng: random.Random) -> List[Dict]:
+    """Claim plans: indicated items with a sprinkling of unindicated, contraindicated and unknown ones"""
+    diagnoses = list(relationships)
+    plans = []
+    for _ in range(n):
+        diagnosis_id = rng.choice(diagnoses)
+        indicated = [rel['target_id'] for rel in relationships[diagnosis_id] if rel['type'] != 'HAS_CONTRAINDICATION']
+        contraindicated = [rel['target_id'] for rel in relationships[diagnosis_id]
+                           if rel['type'] == 'HAS_CONTRAINDICATION']
+        chosen = []
+        for _ in range(rng.randint(1, items)):
+            roll = rng.random()
+            if roll < 0.9:
+                chosen.append(rng.choice(indicated))
+            elif roll < 0.98:
+                chosen.append(rng.choice(targets))
+            elif roll < 0.99 and contraindicated:
+                chosen.append(rng.choice(contraindicated))
+            else:
+                chosen.append(-rng.randint(1, 1000))  # not in the lexicon
+        split = rng.randint(0, len(chosen))
+        plans.append({"diagnosis_concept_id": diagnosis_id, "procedures": chosen[:split],
+                      "medications": chosen[split:]})
+    return plans
+
+
+def scan_validate(validator: TreatmentValidator, relationships: Dict[int, List[Dict]], plan: Dict) -> Dict:
+    """Per-request validation: scan the diagnosis's relationship list for every plan item"""
+    diagnosis_id = plan['diagnosis_concept_id']
+    rels = relationships[diagnosis_id]
+    items = _plan_items(plan)
+    problems = []
+    for concept_id in items:
+        matches = [rel for rel in rels if rel['target_id'] == concept_id]
+        if any(rel['type'] == 'HAS_CONTRAINDICATION' for rel in matches):
+            problems.append((concept_id, CONTRAINDICATED))
+        elif concept_id not in validator.store:
+            problems.append((concept_id, UNKNOWN_CONCEPT))
+        elif not matches:
+            problems.append((concept_id, NOT_INDICATED))
+    expected = sorted((rel for rel in rels
+                       if rel['type'] != 'HAS_CONTRAINDICATION' and rel['priority'] >= EXPECTED_PRIORITY),
+                      key=lambda rel: -rel['priority'])
+    missing = [rel['target_id'] for rel in expected if all(rel['target_id'] != c for c in items)]
+    return validator._result(diagnosis_id, _PlanFindings(problems, list(dict.fromkeys(missing)), len(items)))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concepts", type=int, default=100000)
+    parser.add_argument("--per-diagnosis", type=int, default=20)
+    parser.add_argument("--contraindications", type=int, default=3)
+    parser.add_argument("--plans", type=int, default=10000)
+    parser.add_argument("--items", type=int, default=8, help="Maximum procedures + medications per plan")
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    concepts = generate_concepts(args.concepts, seed=5)
+    store = ConceptStore(concepts)
+    targets = [c["concept_id"] for c in concepts if c["concept_type"] != "DIAGNOSIS"]
+    relationships = generate_relationships(concepts, generate_locations(), args.per_diagnosis, 0)
+    add_contraindications(relationships, targets, args.contraindications, rng)
+
+    t0 = time.perf_counter()
+    validator = TreatmentValidator(store, relationships)
+    stats = validator.stats()
+    print(f"{stats['diagnoses']} diagnoses: {stats['allowed_pairs']} allowed, {stats['contraindicated_pairs']} "
+          f"contraindicated, {stats['expected_pairs']} expected pairs, built in {time.perf_counter() - t0:.2f}s")
+
+    plans = synthetic_plans(relationships, targets, args.plans, args.items, rng)
+    gc.collect()
+    t0 = time.perf_counter()
+    scanned = [scan_validate(validator, relationships, plan) for plan in plans]
+    scan_seconds = time.perf_counter() - t0
+    validator.concepts.clear()  # Both start without memoized suggestion payloads
+    gc.collect()
+    t0 = time.perf_counter()
+    single = [validator.validate(plan) for plan in plans]
+    single_seconds = time.perf_counter() - t0
+
+    assert single == scanned, "set results differ from the relationship scan"
+    invalid = sum(not result['is_valid'] for result in single)
+    print(f"{len(plans)} plans ({invalid} invalid): both agree")
+    for name, seconds in (("relationship scan per item", scan_seconds),
+                          ("precomputed sets", single_seconds)):
+        print(f"  {name}: {seconds * 1e6 / len(plans):.1f}us per plan ({len(plans) / seconds:,.0f} plans/s)")
+
+
+if __name__ == "__main__":
+    main_cli()
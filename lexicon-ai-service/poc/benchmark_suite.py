@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmark suite for the search, CDS and FHIR paths
+Builds seeded synthetic lexicons and claims of each requested size,
+microbenchmarks the engines directly, then drives the FastAPI app in-process
+(no network) for throughput and latency percentiles. Results are written as
+JSON; a previous run passed as --baseline is compared metric by metric and
+the exit status is non-zero when anything regressed past --threshold. Every
+scenario is run --rounds times and the median round is kept, and a baseline
+recorded with a different workload configuration is refused.
+
+    python benchmark_suite.py --sizes 10000,100000 --output baseline.json
+    python benchmark_suite.py --sizes 10000,100000 --baseline baseline.json
+"""
+
+import os
+
+# Benchmarks run against the synthetic lexicon only, never a configured database or artifact
+for _name in ("DATABASE_URL", "SEARCH_INDEX_PATH", "CODE_MAPPING_PATH"):
+    os.environ.pop(_name, None)
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Sequence
+
+import httpx
+import numpy as np
+
+import main
+from code_mapping import CodeMappingIndex
+from synthetic_data import (SEASONS, generate_claims, generate_code_mappings, generate_concepts,
+                            generate_locations, generate_relationships, sample_queries)
+
+SCHEMA_VERSION = 2
+
+# Run settings that change what a scenario measures; a baseline must match them
+COMPARABLE_CONFIG = ("sizes", "seed", "iterations", "rounds", "requests", "concurrency")
+
+# Higher is better for these metrics; lower is better for every latency
+HIGHER_IS_BETTER = ("ops_per_sec",)
+
+# Metrics that can fail a comparison; tail percentiles of short runs are reported only
+GATED_METRICS = ("ops_per_sec", "p50_ms")
+
+
+def summarize(samples: Sequence[float], elapsed: float) -> Dict[str, float]:
+    """Throughput and latency percentiles (ms) of per-call samples (seconds)"""
+    values = np.asarray(samples) * 1000
+    return {
+        "calls": len(values),
+        "ops_per_sec": round(len(values) / elapsed, 1),
+        "mean_ms": round(float(values.mean()), 4),
+        "p50_ms": round(float(np.percentile(values, 50)), 4),
+        "p95_ms": round(float(np.percentile(values, 95)), 4),
+        "p99_ms": round(float(np.percentile(values, 99)), 4),
+    }
+
+
+def median_run(runs: Sequence[Dict[str, float]]) -> Dict[str, float]:
+    """The run with the median throughput"""
+    return sorted(runs, key=lambda run: run["ops_per_sec"])[len(runs) // 2]
+
+
+def microbenchmark(fn: Callable, inputs: Sequence, iterations: int, rounds: int = 3,
+                   warmup: int = 100) -> Dict[str, float]:
+    """Time `fn(*args)` per call, cycling through `inputs`; the median of `rounds` runs by throughput"""
+    for i in range(min(warmup, iterations)):
+        fn(*inputs[i % len(inputs)])
+    runs = []
+    for _ in range(rounds):
+        gc.collect()
+        samples = []
+        started = time.perf_counter()
+        for i in range(iterations):
+            t0 = time.perf_counter()
+            fn(*inputs[i % len(inputs)])
+            samples.append(time.perf_counter() - t0)
+        runs.append(summarize(samples, time.perf_counter() - started))
+    return median_run(runs)
+
+# ===================================================================
+# WORKLOAD
+# ===================================================================
+
+class Workload:
+    """Seeded lexicon, claims and request inputs of one size, loaded into `main`"""
+
+    def __init__(self, size: int, seed: int):
+        rng = random.Random(seed)
+        concepts = generate_concepts(size, seed=seed)
+        locations = generate_locations()
+        relationships = generate_relationships(concepts, locations)
+
+        # Engines of the snapshot resolve codes through main.code_index
+        main.code_index = CodeMappingIndex.from_records(generate_code_mappings(size))
+        main.lexicon.swap(main.build_snapshot(main.lexicon.current.version + 1, concepts, relationships))
+
+        self.queries = sample_queries(concepts, 1000, seed=seed)
+        diagnoses = sorted(relationships)
+        self.contexts = [(rng.choice(diagnoses),
+                          {"location": rng.choice(locations), "season": rng.choice(SEASONS)})
+                         for _ in range(1000)]
+        self.claims = list(generate_claims(1000, seed=seed))
+
+    def reset_caches(self) -> None:
+        """Each scenario starts cold, so repeated runs measure the same thing"""
+        main.search_cache.invalidate()
+        main.recommendation_cache.invalidate()
+
+
+def engine_benchmarks(workload: Workload, iterations: int, rounds: int) -> Dict[str, Dict]:
+    snapshot = main.lexicon.current
+    return {
+        "engine.search": microbenchmark(snapshot.search_engine.search, [(q,) for q in workload.queries],
+                                        iterations, rounds),
+        "engine.recommendations": microbenchmark(snapshot.cds_engine.get_recommendations, workload.contexts,
+                                                 iterations, rounds),
+        "engine.process_claim": microbenchmark(snapshot.fhir_processor.process_claim,
+                                               [(c,) for c in workload.claims], iterations, rounds),
+    }
+
+# ===================================================================
+# IN-PROCESS HTTP
+# ===================================================================
+
+async def drive_http(client: httpx.AsyncClient, make_request: Callable[[int], Dict], requests: int,
+                     concurrency: int) -> Dict[str, float]:
+    """Closed-loop load: `concurrency` clients each send their next request as soon as one returns"""
+    samples: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            t0 = time.perf_counter()
+            response = await client.request(**make_request(i))
+            samples.append(time.perf_counter() - t0)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(samples, time.perf_counter() - started)
+    result["errors"] = errors
+    return result
+
+
+async def http_benchmarks(workload: Workload, requests: int, concurrency: int, rounds: int) -> Dict[str, Dict]:
+    queries, contexts, claims = workload.queries, workload.contexts, workload.claims
+    scenarios = {
+        "http.search": lambda i: {"method": "GET", "url": "/api/v1/concepts/search",
+                                  "params": {"q": queries[i % len(queries)]}},
+        "http.recommendations": lambda i: {"method": "POST", "url": "/api/v1/cds/recommendations",
+                                           "json": {"diagnosis_id": contexts[i % len(contexts)][0],
+                                                    "context": contexts[i % len(contexts)][1]}},
+        "http.fhir_claim": lambda i: {"method": "POST", "url": "/api/v1/fhir/claims",
+                                      "json": claims[i % len(claims)]},
+    }
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for name, make_request in scenarios.items():
+            workload.reset_caches()
+            await drive_http(client, make_request, min(requests, 100), concurrency)  # warm up
+            runs = []
+            for _ in range(rounds):
+                workload.reset_caches()
+                runs.append(await drive_http(client, make_request, requests, concurrency))
+            results[name] = median_run(runs)
+    return results
+
+# ===================================================================
+# BASELINE COMPARISON
+# ===================================================================
+
+def config_mismatches(config: Dict, baseline_config: Dict) -> List[str]:
+    """Settings of COMPARABLE_CONFIG that differ between this run and the baseline"""
+    return [f"{key}={config.get(key)!r} (baseline {baseline_config.get(key)!r})"
+            for key in COMPARABLE_CONFIG if config.get(key) != baseline_config.get(key)]
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float,
+            min_delta_ms: float) -> List[str]:
+    """Print a per-metric comparison; return the regressions beyond `threshold` (a fraction)
+
+    Latency changes smaller than `min_delta_ms` are timer noise on
+    microsecond-scale calls and never count as regressions.
+    """
+    regressions = []
+    for key, metrics in results.items():
+        old = baseline.get(key)
+        if old is None:
+            print(f"  {key:<40} (not in baseline)")
+            continue
+        for metric in ("ops_per_sec", "p50_ms", "p95_ms", "p99_ms"):
+            if not old.get(metric):
+                continue
+            change = metrics[metric] / old[metric] - 1
+            if metric not in GATED_METRICS:
+                regressed = False
+            elif metric in HIGHER_IS_BETTER:
+                regressed = -change > threshold
+            else:
+                regressed = change > threshold and metrics[metric] - old[metric] > min_delta_ms
+            flag = "REGRESSION" if regressed else ""
+            print(f"  {key:<40} {metric:<12} {old[metric]:>11.4f} -> {metrics[metric]:>11.4f} "
+                  f"({change:+7.1%}) {flag}")
+            if flag:
+                regressions.append(f"{key} {metric} {change:+.1%}")
+    return regressions
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": str(os.cpu_count()),
+        "numpy": np.__version__,
+        "executor_mode": main.engine_executor.mode,
+        "cache_size": str(main.search_cache.max_size),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000", help="Comma separated lexicon sizes")
+    parser.add_argument("--iterations", type=int, default=2000, help="Calls per engine microbenchmark round")
+    parser.add_argument("--rounds", type=int, default=3, help="Rounds per scenario (median kept)")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per HTTP scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent in-process HTTP clients")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON (e.g. to become the next baseline)")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed regression (fraction)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.01,
+                        help="Latency increases below this are noise, whatever the percentage")
+    parser.add_argument("--skip-http", action="store_true", help="Engine microbenchmarks only")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        # Refuse up front: numbers from a different workload are not comparable
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("schema_version") != SCHEMA_VERSION:
+            parser.error(f"{args.baseline} has schema version {baseline.get('schema_version')}, "
+                         f"expected {SCHEMA_VERSION}; record a new baseline")
+        mismatches = config_mismatches(vars(args), baseline.get("config", {}))
+        if mismatches:
+            parser.error(f"{args.baseline} was recorded with different settings: " + ", ".join(mismatches))
+
+    results: Dict[str, Dict] = {}
+    for size in map(int, args.sizes.split(",")):
+        t0 = time.perf_counter()
+        workload = Workload(size, args.seed)
+        print(f"{size} concepts | workload built in {time.perf_counter() - t0:.1f}s")
+
+        scenarios = engine_benchmarks(workload, args.iterations, args.rounds)
+        if not args.skip_http:
+            scenarios.update(asyncio.run(http_benchmarks(workload, args.requests, args.concurrency, args.rounds)))
+        for name, metrics in scenarios.items():
+            results[f"{name}@{size}"] = metrics
+            print(f"  {name:<24} {metrics['ops_per_sec']:>10.1f} ops/s | p50 {metrics['p50_ms']:8.3f}ms "
+                  f"p95 {metrics['p95_ms']:8.3f}ms p99 {metrics['p99_ms']:8.3f}ms"
+                  + (f" | errors {metrics['errors']}" if metrics.get("errors") else ""))
+
+    report = {"schema_version": SCHEMA_VERSION, "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+              "environment": environment(), "config": vars(args), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if baseline is not None:
+        print(f"Compared with {args.baseline} ({baseline.get('created_at')}, threshold {args.threshold:.0%}):")
+        regressions = compare(results, baseline["results"], args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"{len(regressions)} regression(s): " + "; ".join(regressions))
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Precomputed contextual score tables for clinical recommendations
+In-memory counterpart of xaie_contextual_scores: final priority scores and
+their ordering materialized per (diagnosis, location, season, relationship)
+"""
+
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from concept_store import ConceptStore
+
+DEFAULT_SEASONS = ("WET", "DRY")
+
+RECOMMENDATION_CONFIDENCE = 0.9  # Simulated confidence
+
+REASONING_TEMPLATES = {
+    'HAS_DIAGNOSTIC_TEST': "{name} penting untuk monitoring kondisi pasien",
+    'HAS_TREATMENT': "{name} efektif untuk penanganan simptomatik"
+}
+DEFAULT_REASONING = "{name} direkomendasikan"
+
+# Relationship types that warn against a concept; never recommended
+CONTRAINDICATION_TYPES = frozenset({'HAS_CONTRAINDICATION'})
+
+def recommended_relationships(relationships: List[Dict]) -> List[Dict]:
+    """A source concept's relationships that may be recommended
+
+    Contraindications are dropped, and so is any other edge to a concept the
+    same source has a contraindication for (a learned or imported edge never
+    outranks a curated contraindication).
+    """
+    contraindicated = {rel['target_id'] for rel in relationships if rel['type'] in CONTRAINDICATION_TYPES}
+    return [rel for rel in relationships
+            if rel['type'] not in CONTRAINDICATION_TYPES and rel['target_id'] not in contraindicated]
+
+
+# Values the reasoning text singles out; always kept on the axes
+NOTED_LOCATIONS = ("Manado",)
+NOTED_SEASONS = ("WET",)
+
+
+def context_note(location: Optional[str], season: Optional[str]) -> str:
+    """Contextual suffix of the reasoning text (simulating Bedrock)"""
+    if location == "Manado" and season == "WET":
+        return f" - tinggi di {location} saat musim hujan"
+    if season == "WET":
+        return " - penting saat musim hujan"
+    return ""
+
+
+def boost_axis_values(relationships: Iterable[Dict]) -> Tuple[Set[str], Set[str]]:
+    """Locations and seasons a set of relationships can boost on
+
+    A context key "<location>_<season>" is split at every underscore, so
+    names that contain underscores themselves are covered too.
+    """
+    locations, seasons = set(), set()
+    for rel in relationships:
+        for key in rel.get('context_boost', {}):
+            parts = key.split('_')
+            if len(parts) == 1:
+                seasons.add(key)
+            for i in range(1, len(parts)):
+                locations.add('_'.join(parts[:i]))
+                seasons.add('_'.join(parts[i:]))
+    return locations, seasons
+
+
+def context_priority(rel: Dict, location: Optional[str], season: Optional[str]) -> float:
+    """Priority of one relationship in one context (the per-request rule)"""
+    boosts = rel.get('context_boost', {})
+    priority = rel['priority']
+    if location is not None and season is not None and f"{location}_{season}" in boosts:
+        priority += boosts[f"{location}_{season}"]
+    elif season is not None and season in boosts:
+        priority += boosts[season]
+    return min(priority, 1.0)  # Cap at 1.0
+
+
+class _DiagnosisTable:
+    """Scores and ordering for one diagnosis over the location x season grid"""
+
+    __slots__ = ('relationships', 'scores', 'order', 'concepts', 'reasons', 'boost_keys')
+
+    def __init__(self, relationships: List[Dict], scores: np.ndarray, order: np.ndarray,
+                 concepts: List[Dict], reasons: List[str], boost_keys: FrozenSet[str]):
+        self.relationships = relationships
+        self.scores = scores      # float64 (locations, seasons, relationships)
+        self.order = order        # relationship indexes, best first, same shape
+        self.concepts = concepts  # API payload per relationship target
+        self.reasons = reasons    # reasoning text before the context note
+        self.boost_keys = boost_keys
+
+
+class ContextScoreTables:
+    """Dense per-diagnosis score tables over a location x season grid
+
+    Slot 0 of each axis stands for any value not on the axis. Axes hold
+    every location/season the boost data can match (plus registered grid
+    values), so an unlisted value scores exactly like slot 0 and a
+    recommendation is an array slice plus a precomputed ordering. Scores,
+    capping and tie order match the per-request rule in `context_priority`.
+    Relationships whose target concept is not in the store are skipped.
+
+    When a diagnosis's relationships or boosts change, `rebuild_diagnosis`
+    recomputes only that diagnosis (and grows the axes if needed).
+    """
+
+    def __init__(self, store: ConceptStore, relationships: Dict[int, List[Dict]],
+                 locations: Iterable[str] = (), seasons: Iterable[str] = DEFAULT_SEASONS):
+        self.store = store
+        self.relationships = relationships
+        self.locations: List[Optional[str]] = [None]
+        self.seasons: List[Optional[str]] = [None]
+        self.location_index: Dict[str, int] = {}
+        self.season_index: Dict[str, int] = {}
+        self.tables: Dict[int, _DiagnosisTable] = {}
+        self._notes: List[List[str]] = [[""]]
+
+        all_locations, all_seasons = boost_axis_values(
+            rel for rels in relationships.values() for rel in rels)
+        self._extend_axes(sorted(all_locations | set(locations) | set(NOTED_LOCATIONS)),
+                          sorted(all_seasons | set(seasons) | set(NOTED_SEASONS)))
+        for diagnosis_id in relationships:
+            self.tables[diagnosis_id] = self._build_table(relationships[diagnosis_id])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(t.scores.nbytes + t.order.nbytes for t in self.tables.values())
+
+    def _extend_axes(self, locations: Iterable[str], seasons: Iterable[str]) -> None:
+        new_locations = [loc for loc in locations if loc not in self.location_index]
+        new_seasons = [season for season in seasons if season not in self.season_index]
+        if not new_locations and not new_seasons:
+            return
+        for loc in new_locations:
+            self.location_index[loc] = len(self.locations)
+            self.locations.append(loc)
+        for season in new_seasons:
+            self.season_index[season] = len(self.seasons)
+            self.seasons.append(season)
+        self._notes = [[context_note(loc, season) for season in self.seasons] for loc in self.locations]
+
+        # Existing tables gain the new slots as copies of slot 0: a value that
+        # no boost key of theirs mentions scores like any unlisted value.
+        # Tables are replaced, never modified, as other snapshots may share them.
+        for diagnosis_id, table in self.tables.items():
+            if table.boost_keys.intersection(new_seasons):
+                self.tables[diagnosis_id] = self._build_table(table.relationships)
+                continue
+            scores, order = table.scores, table.order
+            for axis, count in ((0, len(new_locations)), (1, len(new_seasons))):
+                if count:
+                    scores = np.concatenate((scores, np.repeat(scores.take([0], axis=axis), count, axis=axis)),
+                                            axis=axis)
+                    order = np.concatenate((order, np.repeat(order.take([0], axis=axis), count, axis=axis)),
+                                           axis=axis)
+            self.tables[diagnosis_id] = _DiagnosisTable(table.relationships, scores, order, table.concepts,
+                                                        table.reasons, table.boost_keys)
+
+    def _build_table(self, relationships: List[Dict]) -> _DiagnosisTable:
+        rels = [rel for rel in recommended_relationships(relationships) if rel['target_id'] in self.store]
+        scores = np.empty((len(self.locations), len(self.seasons), len(rels)))
+        boost_keys: Set[str] = set()
+
+        for r, rel in enumerate(rels):
+            boosts = rel.get('context_boost', {})
+            boost_keys.update(boosts)
+            grid = np.full((len(self.locations), len(self.seasons)), float(rel['priority']))
+            for season, s in self.season_index.items():
+                if season in boosts:
+                    grid[:, s] = rel['priority'] + boosts[season]
+            # "<location>_<season>" keys take precedence over season-only keys
+            for key, boost in boosts.items():
+                parts = key.split('_')
+                for i in range(1, len(parts)):
+                    l = self.location_index.get('_'.join(parts[:i]))
+                    s = self.season_index.get('_'.join(parts[i:]))
+                    if l is not None and s is not None:
+                        grid[l, s] = rel['priority'] + boost
+            scores[:, :, r] = np.minimum(grid, 1.0)
+
+        # Stable descending sort keeps relationship order among equal scores
+        order_dtype = np.uint8 if len(rels) <= 2 ** 8 else np.int32
+        order = np.argsort(-scores, axis=2, kind='stable').astype(order_dtype)
+
+        concepts, reasons = [], []
+        for rel in rels:
+            concept = self.store.get(rel['target_id'])
+            concepts.append(concept.to_dict())
+            template = REASONING_TEMPLATES.get(rel['type'], DEFAULT_REASONING)
+            reasons.append(template.format(name=concept.indonesian_name))
+        return _DiagnosisTable(rels, scores, order, concepts, reasons, frozenset(boost_keys))
+
+    def rebuild_diagnosis(self, diagnosis_id: int) -> None:
+        """Recompute one diagnosis after its relationships or boosts changed"""
+        rels = self.relationships.get(diagnosis_id)
+        if not rels:
+            self.tables.pop(diagnosis_id, None)
+            return
+        self._extend_axes(*(sorted(values) for values in boost_axis_values(rels)))
+        self.tables[diagnosis_id] = self._build_table(rels)
+
+    def updated(self, store: ConceptStore, relationships: Dict[int, List[Dict]],
+                diagnosis_ids: Iterable[int]) -> 'ContextScoreTables':
+        """Tables for a new lexicon snapshot, rebuilding only `diagnosis_ids`
+
+        Unchanged diagnoses share their tables with this instance, which is
+        left untouched (it may still be serving requests).
+        """
+        tables = ContextScoreTables.__new__(ContextScoreTables)
+        tables.store = store
+        tables.relationships = relationships
+        tables.locations = list(self.locations)
+        tables.seasons = list(self.seasons)
+        tables.location_index = dict(self.location_index)
+        tables.season_index = dict(self.season_index)
+        tables.tables = dict(self.tables)
+        tables._notes = self._notes
+        for diagnosis_id in diagnosis_ids:
+            tables.rebuild_diagnosis(diagnosis_id)
+        return tables
+
+    def recommend(self, diagnosis_id: int, location: str = '', season: str = '') -> List[Dict]:
+        """Recommendations for a diagnosis in a context, highest priority first"""
+        table = self.tables.get(diagnosis_id)
+        if table is None:
+            return []
+
+        l = self.location_index.get(location, 0)
+        s = self.season_index.get(season, 0)
+        if s == 0 and season in table.boost_keys:
+            # A season value spelled like a "<location>_<season>" key: score it directly
+            scores = np.array([context_priority(rel, location, season) for rel in table.relationships])
+            order = np.argsort(-scores, kind='stable')
+            note = context_note(location, season)
+        else:
+            scores, order, note = table.scores[l, s], table.order[l, s], self._notes[l][s]
+
+        scores = scores.tolist()
+        return [{
+            'concept': table.concepts[r],
+            'priority_score': scores[r],
+            'confidence': RECOMMENDATION_CONFIDENCE,
+            'reason': table.reasons[r] + note
+        } for r in order.tolist()]
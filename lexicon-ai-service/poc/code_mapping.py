@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+External code mapping index (ICD-10 / ICD-9-CM / SNOMED CT / LOINC / ATC -> concept)
+Compiled once from xaie_code_mappings rows into a memory-mapped binary file,
+so service startup maps the file instead of parsing CSV/SQL
+"""
+
+import argparse
+import bisect
+import csv
+import mmap
+import os
+import re
+import struct
+from collections.abc import Sequence
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# ===================================================================
+# CODING SYSTEMS
+# ===================================================================
+
+# Canonical system name -> accepted spellings (FHIR system URIs included)
+CODING_SYSTEMS = {
+    "ICD-10": ("ICD10", "http://hl7.org/fhir/sid/icd-10"),
+    "ICD-10-CM": ("ICD10CM", "http://hl7.org/fhir/sid/icd-10-cm"),
+    "ICD-9-CM": ("ICD9", "ICD9CM", "http://hl7.org/fhir/sid/icd-9-cm"),
+    "SNOMED CT": ("SNOMED", "SNOMED-CT", "SCT", "http://snomed.info/sct"),
+    "LOINC": ("http://loinc.org",),
+    "ATC": ("http://www.whocc.no/atc",),
+}
+
+# Systems whose codes nest by prefix (A91.2 -> A91 -> A9), enabling fallback
+HIERARCHICAL_SYSTEMS = {"ICD-10", "ICD-10-CM", "ICD-9-CM"}
+
+# Shortest ancestor tried during fallback (the "A9x" block level)
+MIN_ANCESTOR_LENGTH = 2
+
+# Confidence multiplier per hierarchy level climbed
+FALLBACK_DECAY = 0.9
+
+
+def _squash(system: str) -> str:
+    return re.sub(r"[^A-Z0-9]", "", system.upper())
+
+
+_SYSTEM_ALIASES = {_squash(alias): name
+                   for name, aliases in CODING_SYSTEMS.items()
+                   for alias in (name, *aliases)}
+
+
+def canonical_system(system: str) -> str:
+    """Canonical coding system name ("icd10", FHIR URIs, ... -> "ICD-10")"""
+    return _SYSTEM_ALIASES.get(_squash(system), system.strip().upper())
+
+
+def normalize_code(system: str, code: str) -> str:
+    """Lookup form of a code; hierarchical codes drop dots and trailing x placeholders"""
+    code = code.strip().upper()
+    if system in HIERARCHICAL_SYSTEMS:
+        code = code.replace(".", "").rstrip("X")
+    return code
+
+
+def code_ancestors(system: str, code: str) -> List[str]:
+    """Normalized code followed by its ancestors, most specific first"""
+    if system not in HIERARCHICAL_SYSTEMS:
+        return [code]
+    return [code[:n] for n in range(len(code), MIN_ANCESTOR_LENGTH - 1, -1)] or [code]
+
+# ===================================================================
+# BINARY FORMAT
+# ===================================================================
+#
+# header: magic "LXCM", version, entry count, key/label blob sizes
+# concept_ids    int64[n]
+# confidence     float32[n]
+# key_offsets    uint32[n + 1]   sorted keys b"<system>\0<normalized code>"
+# label_offsets  uint32[n + 1]   labels b"<original code>\x1f<description>"
+# key blob, label blob
+#
+# Entries sort by key, then by descending confidence, so the first match of a
+# key is the best mapping for it.
+
+MAGIC = b"LXCM"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sIIIQQ")
+_LABEL_SEP = b"\x1f"
+
+
+class CodeMapping(NamedTuple):
+    """Result of mapping one external code"""
+    concept_id: int
+    coding_system: str
+    requested_code: str
+    matched_code: str
+    code_description: str
+    mapping_confidence: float
+    fallback_depth: int  # 0 = exact match, n = matched n hierarchy levels up
+
+    @property
+    def match_type(self) -> str:
+        return "exact" if self.fallback_depth == 0 else "ancestor"
+
+
+class _BlobView(Sequence):
+    """Read-only sequence of byte strings packed in one buffer"""
+
+    def __init__(self, buffer, base: int, offsets: np.ndarray):
+        self.buffer = buffer
+        self.base = base
+        # memoryview indexing yields Python ints, much cheaper than NumPy scalars
+        self.offsets = memoryview(offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return self.buffer[self.base + self.offsets[i]:self.base + self.offsets[i + 1]]
+
+
+class MappingEncoder:
+    """Compiles mapping rows fed one at a time (e.g. straight off a database cursor)
+
+    Only each row's packed entry (key, confidence, concept id, label bytes)
+    is kept until `finish` sorts them, never the row itself.
+    """
+
+    def __init__(self):
+        self.entries: List[Tuple[bytes, float, int, bytes]] = []
+
+    def add(self, row: Dict) -> None:
+        system = canonical_system(row["coding_system_name"])
+        code = str(row["code_value"]).strip()
+        confidence = row.get("mapping_confidence")
+        self.entries.append((
+            f"{system}\0{normalize_code(system, code)}".encode(),
+            -float(confidence if confidence not in (None, "") else 1.0),
+            int(row["concept_id"]),
+            f"{code}\x1f{row.get('code_description') or ''}".encode(),
+        ))
+
+    def finish(self) -> bytes:
+        """The binary format for every row added"""
+        entries = self.entries
+        entries.sort()
+
+        def packed(values: List[bytes]) -> Tuple[np.ndarray, bytes]:
+            lengths = np.fromiter((len(v) for v in values), dtype=np.int64, count=len(values))
+            offsets = np.concatenate(([0], np.cumsum(lengths)))
+            if offsets[-1] >= 2 ** 32:
+                raise ValueError("Mapping table too large for 32-bit offsets")
+            return offsets.astype(np.uint32), b"".join(values)
+
+        concept_ids = np.array([e[2] for e in entries], dtype=np.int64)
+        confidence = np.array([-e[1] for e in entries], dtype=np.float32)
+        key_offsets, key_blob = packed([e[0] for e in entries])
+        label_offsets, label_blob = packed([e[3] for e in entries])
+
+        # Sections ordered widest dtype first so every array stays aligned
+        header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(entries), 0, len(key_blob), len(label_blob))
+        return b"".join((header, concept_ids.tobytes(), confidence.tobytes(),
+                         key_offsets.tobytes(), label_offsets.tobytes(), key_blob, label_blob))
+
+
+def encode_mappings(rows: Iterable[Dict]) -> bytes:
+    """Compile mapping rows (xaie_code_mappings columns) into the binary format"""
+    encoder = MappingEncoder()
+    for row in rows:
+        encoder.add(row)
+    return encoder.finish()
+
+
+def read_mapping_csv(path: str) -> Iterator[Dict]:
+    """Rows from a CSV export of xaie_code_mappings (mapping_confidence optional)"""
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+# ===================================================================
+# MAPPING INDEX
+# ===================================================================
+
+class CodeMappingIndex:
+    """(system, code) -> concept lookup over a compiled mapping table
+
+    Backed by a memory-mapped file (`open`) or an in-memory buffer
+    (`from_records`); either way there are no per-entry Python objects and
+    lookups are a bisect over the sorted keys. Codes in hierarchical systems
+    fall back to their nearest mapped ancestor (A91.23 -> A91.2 -> A91 -> A9)
+    with confidence decayed by FALLBACK_DECAY per level.
+    """
+
+    def __init__(self, buffer, source: str = "<memory>"):
+        magic, version, count, _, key_size, label_size = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{source} is not a code mapping index")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{source} has format version {version}, expected {FORMAT_VERSION}")
+
+        self.source = source
+        self._buffer = buffer
+        offset = _HEADER.size
+
+        def section(dtype, length):
+            nonlocal offset
+            array = np.frombuffer(buffer, dtype=dtype, count=length, offset=offset)
+            offset += array.nbytes
+            return array
+
+        self.concept_ids = section(np.int64, count)
+        self.confidence = section(np.float32, count)
+        key_offsets = section(np.uint32, count + 1)
+        label_offsets = section(np.uint32, count + 1)
+        self.keys = _BlobView(buffer, offset, key_offsets)
+        self.labels = _BlobView(buffer, offset + key_size, label_offsets)
+        self.nbytes = offset + key_size + label_size
+
+    @classmethod
+    def open(cls, path: str) -> 'CodeMappingIndex':
+        """Memory-map a file written by `build` (pages load lazily, shared across workers)"""
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, source=path)
+
+    @classmethod
+    def build(cls, rows: Iterable[Dict], path: str) -> 'CodeMappingIndex':
+        """Compile mapping rows to `path` and open the result
+
+        Written to a temporary file and renamed into place: truncating a file
+        that running workers have mapped would crash them.
+        """
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(encode_mappings(rows))
+        os.replace(f"{path}.tmp", path)
+        return cls.open(path)
+
+    @classmethod
+    def from_records(cls, rows: Iterable[Dict]) -> 'CodeMappingIndex':
+        """Compile mapping rows into an in-memory index (small tables, tests)"""
+        return cls(encode_mappings(rows))
+
+    @classmethod
+    async def from_stream(cls, rows: AsyncIterator[Dict]) -> 'CodeMappingIndex':
+        """Compile mapping rows as they stream in (a database cursor) into an in-memory index"""
+        encoder = MappingEncoder()
+        async for row in rows:
+            encoder.add(row)
+        return cls(encoder.finish())
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _find(self, key: bytes) -> Optional[int]:
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return i
+        return None
+
+    def _candidates(self, system: str, code: str) -> Tuple[str, List[bytes]]:
+        """Canonical system and the keys to try for a code, most specific first"""
+        system_name = canonical_system(system)
+        prefix = f"{system_name}\0".encode()
+        ancestors = code_ancestors(system_name, normalize_code(system_name, code))
+        return system_name, [prefix + candidate.encode() for candidate in ancestors]
+
+    def _mapping(self, i: int, system_name: str, code: str, depth: int) -> CodeMapping:
+        matched_code, _, description = self.labels[i].partition(_LABEL_SEP)
+        return CodeMapping(
+            concept_id=int(self.concept_ids[i]),
+            coding_system=system_name,
+            requested_code=code,
+            matched_code=matched_code.decode(),
+            code_description=description.decode(),
+            mapping_confidence=round(float(self.confidence[i]) * FALLBACK_DECAY ** depth, 4),
+            fallback_depth=depth,
+        )
+
+    def lookup(self, system: str, code: str) -> Optional[CodeMapping]:
+        """Best mapping for the code or, failing that, its nearest mapped ancestor"""
+        system_name, candidates = self._candidates(system, code)
+        for depth, key in enumerate(candidates):
+            i = self._find(key)
+            if i is not None:
+                return self._mapping(i, system_name, code, depth)
+        return None
+
+    def lookup_many(self, codes: Iterable[Tuple[str, str]]) -> List[Optional[CodeMapping]]:
+        """`lookup` for many (system, code) pairs in one pass over the sorted keys
+
+        Candidate keys of all codes (ancestors included) are deduplicated and
+        resolved in sorted order, each bisect starting where the previous one
+        ended.
+        """
+        requests = [(system, code, *self._candidates(system, code)) for system, code in codes]
+        found: Dict[bytes, Optional[int]] = {}
+        lo = 0
+        for key in sorted({key for *_, candidates in requests for key in candidates}):
+            lo = bisect.bisect_left(self.keys, key, lo)
+            found[key] = lo if lo < len(self.keys) and self.keys[lo] == key else None
+
+        results = []
+        for system, code, system_name, candidates in requests:
+            mapping = None
+            for depth, key in enumerate(candidates):
+                if found[key] is not None:
+                    mapping = self._mapping(found[key], system_name, code, depth)
+                    break
+            results.append(mapping)
+        return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Compile a xaie_code_mappings CSV export")
+    build.add_argument("csv_path")
+    build.add_argument("index_path")
+    lookup = commands.add_parser("lookup", help="Map one code using a compiled index")
+    lookup.add_argument("index_path")
+    lookup.add_argument("system")
+    lookup.add_argument("code")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = CodeMappingIndex.build(read_mapping_csv(args.csv_path), args.index_path)
+        print(f"{len(index)} mappings, {index.nbytes / 2**20:.1f} MiB -> {args.index_path}")
+    else:
+        print(CodeMappingIndex.open(args.index_path).lookup(args.system, args.code))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Shared concept store for the Lexicon AI Service POC
+Single in-memory copy of the lexicon with constant-time lookup indexes
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+class ConceptRecord:
+    """Compact, read-only concept record (no per-instance __dict__)"""
+
+    __slots__ = ('concept_id', 'human_readable_code', 'canonical_name',
+                 'indonesian_name', 'concept_type', 'synonyms')
+
+    def __init__(self, concept_id: int, human_readable_code: Optional[str], canonical_name: str,
+                 indonesian_name: str, concept_type: str, synonyms: Tuple[str, ...] = ()):
+        self.concept_id = concept_id
+        self.human_readable_code = human_readable_code
+        self.canonical_name = canonical_name
+        self.indonesian_name = indonesian_name
+        self.concept_type = concept_type
+        self.synonyms = tuple(synonyms)
+
+    @classmethod
+    def from_dict(cls, concept: Dict) -> 'ConceptRecord':
+        return cls(
+            concept_id=concept['concept_id'],
+            human_readable_code=concept.get('human_readable_code'),
+            canonical_name=concept['canonical_name'],
+            indonesian_name=concept['indonesian_name'],
+            concept_type=concept['concept_type'],
+            synonyms=concept.get('synonyms', ()),
+        )
+
+    def to_dict(self) -> Dict:
+        """API payload for this concept"""
+        return {
+            'concept_id': self.concept_id,
+            'human_readable_code': self.human_readable_code,
+            'canonical_name': self.canonical_name,
+            'indonesian_name': self.indonesian_name,
+            'concept_type': self.concept_type,
+            'synonyms': list(self.synonyms),
+        }
+
+    def __repr__(self) -> str:
+        return f"ConceptRecord({self.concept_id}, {self.canonical_name!r})"
+
+
+class ConceptStore:
+    """The one copy of the lexicon shared by every engine and endpoint
+
+    Records keep their load order (`records[row]`), which is also the row
+    order of the search indexes. Lookups by id, human-readable code and
+    concept type are dict probes.
+    """
+
+    def __init__(self, concepts: Iterable[Union[Dict, ConceptRecord]]):
+        # Records (e.g. streamed from the database) are immutable, so they are shared as is
+        self.records: List[ConceptRecord] = [c if isinstance(c, ConceptRecord) else ConceptRecord.from_dict(c)
+                                             for c in concepts]
+        self._by_id: Dict[int, ConceptRecord] = {}
+        self._row_by_id: Dict[int, int] = {}
+        self._by_code: Dict[str, ConceptRecord] = {}
+        self._by_type: Dict[str, List[ConceptRecord]] = {}
+
+        for row, record in enumerate(self.records):
+            if record.concept_id in self._by_id:
+                raise ValueError(f"Duplicate concept_id {record.concept_id}")
+            self._by_id[record.concept_id] = record
+            self._row_by_id[record.concept_id] = row
+            if record.human_readable_code:
+                self._by_code[record.human_readable_code] = record
+            self._by_type.setdefault(record.concept_type, []).append(record)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[ConceptRecord]:
+        return iter(self.records)
+
+    def __contains__(self, concept_id: int) -> bool:
+        return concept_id in self._by_id
+
+    def get(self, concept_id: int) -> Optional[ConceptRecord]:
+        return self._by_id.get(concept_id)
+
+    def get_by_code(self, human_readable_code: str) -> Optional[ConceptRecord]:
+        return self._by_code.get(human_readable_code)
+
+    def row_of(self, concept_id: int) -> Optional[int]:
+        """Position of the concept in `records` (and in the search indexes)"""
+        return self._row_by_id.get(concept_id)
+
+    def by_type(self, concept_type: str) -> List[ConceptRecord]:
+        return self._by_type.get(concept_type, [])
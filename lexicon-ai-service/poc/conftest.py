@@ -0,0 +1,2 @@
+# test_poc.py is a walkthrough against a running server (python test_poc.py), not a pytest module
+collect_ignore = ["test_poc.py"]
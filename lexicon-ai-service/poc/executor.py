@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Execution layer for CPU-bound engine work
+Runs engine calls inline, in a thread pool or in a process pool, with a
+bounded queue so the asyncio event loop stays responsive under load
+"""
+
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+EXECUTION_MODES = ("inline", "threads", "processes")
+
+
+class ExecutorSaturated(Exception):
+    """Raised when every worker is busy and the queue is full (backpressure)"""
+
+
+class EngineExecutor:
+    """Dispatches synchronous engine calls off the event loop
+
+    - inline:    call directly on the event loop (original behaviour)
+    - threads:   ThreadPoolExecutor; NumPy/SciPy release the GIL in their kernels
+    - processes: ProcessPoolExecutor; `fn` must be a picklable module-level
+                 function that reads engines from its worker's globals
+
+    At most `max_workers + max_queue` calls are admitted at once; beyond that
+    `run` raises ExecutorSaturated instead of queueing without bound.
+    """
+
+    def __init__(self, mode: str = "inline", max_workers: Optional[int] = None,
+                 max_queue: Optional[int] = None):
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode {mode!r}, expected one of {EXECUTION_MODES}")
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = self.max_workers * 4 if max_queue is None else max_queue
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self._pool: Optional[Executor] = None
+
+    @classmethod
+    def from_env(cls) -> 'EngineExecutor':
+        """Configure from EXECUTOR_MODE / EXECUTOR_WORKERS / EXECUTOR_QUEUE_SIZE"""
+        workers = os.environ.get("EXECUTOR_WORKERS")
+        queue = os.environ.get("EXECUTOR_QUEUE_SIZE")
+        return cls(
+            mode=os.environ.get("EXECUTOR_MODE", "inline"),
+            max_workers=int(workers) if workers else None,
+            max_queue=int(queue) if queue else None,
+        )
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    @property
+    def queue_depth(self) -> int:
+        """Admitted calls waiting for a free worker"""
+        return max(0, self.in_flight - self.max_workers)
+
+    def _get_pool(self) -> Executor:
+        # Created lazily so process workers fork after the engines are built
+        if self._pool is None:
+            if self.mode == "threads":
+                self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="lexicon-engine")
+            else:
+                self._pool = ProcessPoolExecutor(self.max_workers)
+        return self._pool
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        """Run `fn(*args)` according to the configured mode"""
+        if self.mode == "inline":
+            self.completed += 1
+            return fn(*args)
+
+        # Only the event loop thread touches the counters, so no lock is needed
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise ExecutorSaturated(f"{self.in_flight} engine calls in flight (capacity {self.capacity})")
+
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_pool(), fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def recycle(self) -> None:
+        """Replace the worker pool (process workers then re-fork from current state)"""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Streaming bulk FHIR claim processing
+Incremental NDJSON / Bundle input and NDJSON output, so memory stays flat
+regardless of how many claims a backfill pushes through
+"""
+
+import json
+import time
+from tempfile import SpooledTemporaryFile
+from typing import IO, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/fhir+ndjson", "application/ndjson")
+
+# Request bodies above this size spill from memory to a temporary file
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+
+# ===================================================================
+# INPUT PARSING
+# ===================================================================
+
+def normalize_claim(resource: Dict) -> Dict:
+    """Accept the POC's simplified claim or a FHIR R4 Claim resource"""
+    if 'diagnosis_codes' in resource:
+        return resource
+
+    def codes(items: List[Dict], concept_key: str) -> List[str]:
+        return [coding['code']
+                for item in items
+                for coding in item.get(concept_key, {}).get('coding', [])
+                if 'code' in coding]
+
+    return {
+        'resourceType': resource.get('resourceType', 'Claim'),
+        'id': resource.get('id'),
+        'patient_reference': resource.get('patient', {}).get('reference'),
+        'diagnosis_codes': codes(resource.get('diagnosis', []), 'diagnosisCodeableConcept'),
+        'procedure_codes': codes(resource.get('procedure', []), 'procedureCodeableConcept'),
+    }
+
+
+async def spool_body(chunks: AsyncIterator[bytes]) -> IO[bytes]:
+    """Copy the request body into a bounded-memory spool
+
+    Starlette's StreamingResponse listens for client disconnects on the same
+    receive channel the body arrives on, so the body cannot be read while the
+    response streams. Spooling keeps memory flat without requiring that.
+    """
+    spool = SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    async for chunk in chunks:
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+async def iter_file_chunks(file: IO[bytes], chunk_size: int = READ_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Read a spooled body back in fixed-size chunks, closing it at the end"""
+    try:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file.close()
+
+
+def claims_from_bundle(document: Dict) -> Iterator[Dict]:
+    """Claims inside a FHIR Bundle (or a single Claim document)"""
+    if document.get('resourceType') != 'Bundle':
+        yield normalize_claim(document)
+        return
+    for entry in document.get('entry', []):
+        resource = entry.get('resource', {})
+        if resource.get('resourceType') == 'Claim':
+            yield normalize_claim(resource)
+
+
+async def iter_ndjson_claims(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict]:
+    """Parse claims line by line from a byte stream without buffering the body
+
+    Lines that are not valid JSON are yielded as `{'_error': ...}` markers so
+    one bad record does not abort a million-claim backfill.
+    """
+    buffer = b""
+    line_number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield _parse_line(line, line_number)
+    if buffer.strip():
+        yield _parse_line(buffer, line_number + 1)
+
+
+def _parse_line(line: bytes, line_number: int) -> Dict:
+    try:
+        return normalize_claim(json.loads(line))
+    except (ValueError, TypeError, AttributeError) as exc:
+        return {'_error': f"line {line_number}: {exc}"}
+
+# ===================================================================
+# OUTPUT STREAMING
+# ===================================================================
+
+async def stream_results(claims: AsyncIterator[Dict],
+                         process_batch: Callable[[List[Dict]], Awaitable[List[Dict]]],
+                         batch_size: int = 256) -> AsyncIterator[bytes]:
+    """Process claims in fixed-size batches and yield NDJSON result lines
+
+    Only one batch is held in memory at a time. A batch that fails (or
+    returns the wrong number of results) yields an ERROR line per claim and
+    the stream goes on; if the input itself fails, the claims read so far
+    are still processed. The final line is always a summary with the claim
+    count, error count and throughput in claims per second.
+    """
+    started = time.perf_counter()
+    processed = errors = 0
+    input_error = None
+    batch: List[Dict] = []
+
+    async def flush() -> AsyncIterator[bytes]:
+        nonlocal processed, errors
+        valid = [claim for claim in batch if '_error' not in claim]
+        try:
+            results = await process_batch(valid) if valid else []
+            if len(results) != len(valid):
+                raise RuntimeError(f"{len(results)} results for {len(valid)} claims")
+        except Exception as exc:
+            results = [{'claim_id': claim.get('id'), 'processing_status': 'ERROR',
+                        'error': f"batch failed: {exc}"} for claim in valid]
+        results = iter(results)
+        for claim in batch:
+            result = ({'processing_status': 'ERROR', 'error': claim['_error']}
+                      if '_error' in claim else next(results))
+            processed += 1
+            errors += result.get('processing_status') == 'ERROR'
+            yield json.dumps(result).encode() + b"\n"
+
+    while True:
+        # Only reading the input is guarded; output failures are not input errors
+        try:
+            claim = await claims.__anext__()
+        except StopAsyncIteration:
+            break
+        except Exception as exc:
+            input_error = f"input stream failed: {exc}"
+            break
+        batch.append(claim)
+        if len(batch) >= batch_size:
+            async for line in flush():
+                yield line
+            batch = []
+    if batch:
+        async for line in flush():
+            yield line
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        'claims': processed,
+        'errors': errors,
+        'elapsed_seconds': round(elapsed, 3),
+        'claims_per_second': round(processed / elapsed, 1) if elapsed > 0 else None,
+    }
+    if input_error is not None:
+        summary['error'] = input_error
+    yield json.dumps({'summary': summary}).encode() + b"\n"
+
+
+async def iterate(claims: Iterable[Dict]) -> AsyncIterator[Dict]:
+    """Adapt an in-memory iterable (e.g. a parsed Bundle) to the async pipeline"""
+    for claim in claims:
+        yield claim
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+GraphQL API over the lexicon
+getClinicalPathway / getRecommendations / concept lookups as a graphql-core
+schema. Concept fields resolve through a per-request DataLoader: the
+concepts requested while one level of a query resolves are fetched in one
+bulk lookup and cached for the rest of the request, so nested
+diagnosis / treatments { concept } fields cost one lookup per level
+instead of one per item. Parsed and validated documents are cached per
+query string, and queries over the depth or cost limit are rejected before
+they execute.
+"""
+
+import asyncio
+import inspect
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from code_mapping import CodeMappingIndex
+from concept_store import ConceptStore
+from pathway import DEFAULT_BRANCH, DEFAULT_DEPTH, pathway_limits_error
+from result_cache import ResultCache
+
+try:
+    import graphql
+except ImportError:  # Only needed for /api/v1/graphql
+    graphql = None
+
+MAX_QUERY_DEPTH = 10
+MAX_QUERY_COST = 5000
+LIST_SIZE_ESTIMATE = DEFAULT_BRANCH  # Items assumed per list field when costing a query
+MAX_CONCEPT_IDS = 1000               # concepts(ids: ...) per query
+DOCUMENT_CACHE_SIZE = 1000
+
+CONCEPT_FIELDS = frozenset({'concept', 'diagnosis'})  # Fields resolved through the concept loader
+# ClinicalPathway fields holding concepts -> key of the pathway payload
+PATHWAY_CONCEPT_FIELDS = {'diagnosis': 'diagnosis_id', 'diagnosticTests': 'diagnostic_tests',
+                          'treatments': 'treatments', 'related': 'related', 'pathway': 'pathway'}
+
+SCHEMA = """
+type Query {
+  getClinicalPathway(diagnosisId: Int!, context: ClinicalContextInput,
+                     maxDepth: Int = 2, maxBranch: Int = 5): ClinicalPathway
+  getRecommendations(diagnosisId: Int!, context: ClinicalContextInput): [Recommendation!]!
+  concept(id: Int!): Concept
+  concepts(ids: [Int!]!): [Concept]!
+  conceptByCode(system: String!, code: String!): Concept
+}
+
+input ClinicalContextInput {
+  location: String
+  season: String
+}
+
+type Concept {
+  concept_id: Int!
+  human_readable_code: String
+  canonical_name: String!
+  indonesian_name: String!
+  concept_type: String!
+  synonyms: [String!]!
+}
+
+type ClinicalPathway {
+  diagnosis: Concept!
+  diagnosticTests: [PathwayItem!]!
+  treatments: [PathwayItem!]!
+  related: [PathwayItem!]!
+  pathway: [PathwayStep!]!
+  contextualInsights: ContextualInsights!
+  context: ClinicalContext!
+  max_depth: Int!
+}
+
+type PathwayItem {
+  concept: Concept!
+  priority_score: Float!
+  confidence: Float!
+  reason: String!
+  depth: Int!
+  via: Int!
+}
+
+type PathwayStep {
+  concept_id: Int!
+  canonical_name: String!
+  type: String!
+  priority_score: Float!
+  path_score: Float!
+  concept: Concept!
+  next: [PathwayStep!]!
+}
+
+type ContextualInsights {
+  location_specific_notes: String
+  seasonal_recommendations: String
+}
+
+type ClinicalContext {
+  location: String
+  season: String
+}
+
+type Recommendation {
+  concept: Concept!
+  priority_score: Float!
+  confidence: Float!
+  reason: String!
+}
+"""
+
+
+class GraphQLQueryError(Exception):
+    """A query rejected before execution (syntax, validation, depth or cost)"""
+
+    def __init__(self, messages: List[str]):
+        super().__init__("; ".join(messages))
+        self.messages = messages
+
+
+class DataLoader:
+    """Collects load(key) calls made in the same event loop tick into one batch_fn(keys) call
+
+    batch_fn returns the values in key order, directly or as an awaitable
+    (a database round trip). Results are cached per key for the loader's
+    lifetime (one request), so a concept that appears in several places of a
+    response is looked up once.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Hashable]], Any]):
+        self.batch_fn = batch_fn
+        self.cache: Dict[Hashable, asyncio.Future] = {}
+        self.queue: List[Hashable] = []
+        self.loads = 0
+        self.batches = 0
+
+    def load(self, key: Hashable) -> Any:
+        """The value for `key`, or a future of it until its batch has been looked up"""
+        self.loads += 1
+        future = self.cache.get(key)
+        if future is not None and future.done() and future.exception() is None:
+            return future.result()  # Plain value: no awaitable for the executor to gather
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self.cache[key] = loop.create_future()
+            if not self.queue:
+                loop.call_soon(self._dispatch)
+            self.queue.append(key)
+        return future
+
+    async def load_many(self, keys: Iterable[Hashable]) -> List[Any]:
+        values = [self.load(key) for key in keys]
+        return [await value if isinstance(value, asyncio.Future) else value for value in values]
+
+    async def prime(self, keys: Iterable[Hashable]) -> None:
+        """Look up the keys not cached yet in one batch, so later loads of them return plain values"""
+        await self.load_many(keys)
+
+    def _dispatch(self) -> None:
+        keys, self.queue = self.queue, []
+        self.batches += 1
+        try:
+            values = self.batch_fn(keys)
+            if not inspect.isawaitable(values):
+                self._resolve(keys, values)
+                return
+        except Exception as exc:
+            self._fail(keys, exc)
+            return
+        asyncio.ensure_future(self._resolve_later(keys, values))
+
+    async def _resolve_later(self, keys: List[Hashable], values: Awaitable[Sequence[Any]]) -> None:
+        try:
+            self._resolve(keys, await values)
+        except Exception as exc:
+            self._fail(keys, exc)
+
+    def _resolve(self, keys: List[Hashable], values: Sequence[Any]) -> None:
+        if len(values) != len(keys):
+            raise ValueError(f"batch_fn returned {len(values)} values for {len(keys)} keys")
+        for key, value in zip(keys, values):
+            self.cache[key].set_result(value)
+
+    def _fail(self, keys: List[Hashable], exc: Exception) -> None:
+        for key in keys:
+            self.cache.pop(key).set_exception(exc)  # Not cached: a later load retries
+
+
+def concept_payloads(store: ConceptStore, concept_ids: List[int]) -> List[Optional[Dict]]:
+    """Bulk concept lookup: Concept payloads in `concept_ids` order (None if unknown)"""
+    records = [store.get(concept_id) for concept_id in concept_ids]
+    return [record.to_dict() if record is not None else None for record in records]
+
+
+class GraphQLContext:
+    """Per-request context: the snapshot's data, engine calls and the concept loader"""
+
+    def __init__(self, store: ConceptStore, code_index: CodeMappingIndex,
+                 pathway: Callable[[int, Dict, int, int], Awaitable[Optional[Dict]]],
+                 recommendations: Callable[[int, Dict], Awaitable[List[Dict]]],
+                 concepts: Optional[DataLoader] = None):
+        self.store = store
+        self.code_index = code_index
+        self.pathway = pathway  # (diagnosis_id, context, max_depth, max_branch) -> pathway with concept ids
+        self.recommendations = recommendations
+        self.concepts = concepts or DataLoader(lambda ids: concept_payloads(store, ids))
+
+
+def _context(context: Optional[Dict]) -> Dict:
+    context = context or {}
+    return {'location': context.get('location'), 'season': context.get('season')}
+
+
+async def _resolve_pathway(root, info, diagnosisId: int, context: Optional[Dict] = None,
+                           maxDepth: int = DEFAULT_DEPTH, maxBranch: int = DEFAULT_BRANCH) -> Optional[Dict]:
+    error = pathway_limits_error(maxDepth, maxBranch, "maxDepth", "maxBranch")
+    if error:
+        raise graphql.GraphQLError(error)
+    pathway = await info.context.pathway(diagnosisId, _context(context), maxDepth, maxBranch)
+    if pathway is None:
+        raise graphql.GraphQLError(f"Diagnosis {diagnosisId} not found")
+    # The selected concepts of the pathway in one lookup up front: nested fields then resolve from
+    # the loader's cache without awaiting, which spares the executor an awaitable per field
+    await info.context.concepts.prime(_selected_concept_ids(info, pathway))
+    return pathway
+
+
+def _fields(selection_sets: Iterable, fragments: Dict) -> Iterator:
+    """Field nodes of the selection sets, fragments expanded"""
+    pending = list(selection_sets)
+    while pending:
+        for selection in pending.pop().selections:
+            if isinstance(selection, graphql.FieldNode):
+                yield selection
+            else:
+                if isinstance(selection, graphql.FragmentSpreadNode):
+                    selection = fragments[selection.name.value]
+                pending.append(selection.selection_set)
+
+
+def _selects_concept(field, fragments: Dict) -> bool:
+    """Whether a concept field is selected at or below `field`"""
+    pending = [field]
+    while pending:
+        node = pending.pop()
+        if node.name.value in CONCEPT_FIELDS:
+            return True
+        if node.selection_set:
+            pending.extend(_fields([node.selection_set], fragments))
+    return False
+
+
+def _selected_concept_ids(info, pathway: Dict) -> Iterator[int]:
+    """Ids of the pathway's concepts that the query selects"""
+    for field in _fields([node.selection_set for node in info.field_nodes], info.fragments):
+        key = PATHWAY_CONCEPT_FIELDS.get(field.name.value)
+        if key is None or not _selects_concept(field, info.fragments):
+            continue
+        if key == 'diagnosis_id':
+            yield pathway[key]
+        elif key == 'pathway':
+            steps = pathway[key]
+            while steps:
+                yield from (step['concept_id'] for step in steps)
+                steps = [child for step in steps for child in step['next']]
+        else:
+            yield from (item['concept_id'] for item in pathway[key])
+
+
+async def _resolve_recommendations(root, info, diagnosisId: int, context: Optional[Dict] = None) -> List[Dict]:
+    return await info.context.recommendations(diagnosisId, _context(context))
+
+
+def _resolve_concept(root, info, id: int):
+    return info.context.concepts.load(id)
+
+
+async def _resolve_concepts(root, info, ids: List[int]) -> List[Optional[Dict]]:
+    if len(ids) > MAX_CONCEPT_IDS:
+        raise graphql.GraphQLError(f"At most {MAX_CONCEPT_IDS} ids per query")
+    return await info.context.concepts.load_many(ids)
+
+
+def _resolve_concept_by_code(root, info, system: str, code: str):
+    mapping = info.context.code_index.lookup(system, code)
+    return info.context.concepts.load(mapping.concept_id) if mapping else None
+
+
+def _concept_of(key: str):
+    """Resolver loading the concept whose id is in `key` of the parent object"""
+    return lambda parent, info: info.context.concepts.load(parent[key])
+
+
+def _field(key: str):
+    return lambda parent, info: parent[key]
+
+
+def build_schema() -> 'graphql.GraphQLSchema':
+    """The lexicon schema with its resolvers attached (fields default to same-named dict keys)"""
+    if graphql is None:
+        raise RuntimeError("graphql-core is required for the GraphQL API (pip install graphql-core)")
+    schema = graphql.build_schema(SCHEMA)
+    resolvers = {
+        'Query': {'getClinicalPathway': _resolve_pathway, 'getRecommendations': _resolve_recommendations,
+                  'concept': _resolve_concept, 'concepts': _resolve_concepts,
+                  'conceptByCode': _resolve_concept_by_code},
+        'ClinicalPathway': {'diagnosis': _concept_of('diagnosis_id'),
+                            'diagnosticTests': _field('diagnostic_tests'),
+                            'contextualInsights': _field('contextual_insights')},
+        'PathwayItem': {'concept': _concept_of('concept_id')},
+        'PathwayStep': {'concept': _concept_of('concept_id')},
+    }
+    for type_name, fields in resolvers.items():
+        for field_name, resolve in fields.items():
+            schema.type_map[type_name].fields[field_name].resolve = resolve
+    return schema
+
+
+def query_depth_and_cost(schema: 'graphql.GraphQLSchema', document: 'graphql.DocumentNode') -> Tuple[int, int]:
+    """Deepest field nesting and estimated field count of the most expensive operation
+
+    Every field costs 1 and the selections below a list field count
+    LIST_SIZE_ESTIMATE times; fragments are expanded and introspection
+    fields (__schema, __typename, ...) are free.
+    """
+    fragments = {definition.name.value: definition for definition in document.definitions
+                 if isinstance(definition, graphql.FragmentDefinitionNode)}
+
+    def measure(parent, selection_set, spreads: frozenset) -> Tuple[int, int]:
+        depth = cost = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, graphql.FieldNode):
+                if selection.name.value.startswith('__'):
+                    continue
+                field = parent.fields[selection.name.value]
+                field_type, multiplier = field.type, 1
+                while isinstance(field_type, (graphql.GraphQLNonNull, graphql.GraphQLList)):
+                    if isinstance(field_type, graphql.GraphQLList):
+                        multiplier *= LIST_SIZE_ESTIMATE
+                    field_type = field_type.of_type
+                child_depth, child_cost = (measure(field_type, selection.selection_set, spreads)
+                                           if selection.selection_set else (0, 0))
+                depth = max(depth, 1 + child_depth)
+                cost += 1 + multiplier * child_cost
+                continue
+            if isinstance(selection, graphql.InlineFragmentNode):
+                fragment, name = selection, None
+            else:
+                name = selection.name.value
+                fragment = fragments[name]
+                if name in spreads:  # cycles are reported by validation
+                    continue
+            target = (schema.get_type(fragment.type_condition.name.value) if fragment.type_condition
+                      else parent)
+            child_depth, child_cost = measure(target, fragment.selection_set, spreads | {name} if name else spreads)
+            depth, cost = max(depth, child_depth), cost + child_cost
+        return depth, cost
+
+    measured = [measure(schema.query_type, definition.selection_set, frozenset())
+                for definition in document.definitions if isinstance(definition, graphql.OperationDefinitionNode)]
+    return max((d for d, _ in measured), default=0), max((c for _, c in measured), default=0)
+
+
+class GraphQLService:
+    """Parses, validates, limits and executes queries against the lexicon schema"""
+
+    def __init__(self, max_depth: int = MAX_QUERY_DEPTH, max_cost: int = MAX_QUERY_COST,
+                 document_cache_size: int = DOCUMENT_CACHE_SIZE):
+        self.schema = build_schema()
+        self.max_depth = max_depth
+        self.max_cost = max_cost
+        # query string -> validated document; rejected queries are not cached
+        self.documents = ResultCache(max_size=document_cache_size, ttl=0)
+        self.rejected = 0
+
+    def prepare(self, query: str) -> 'graphql.DocumentNode':
+        """Parsed and validated document for `query`; raises GraphQLQueryError if it may not run"""
+        document = self.documents.get(query)
+        if document is not None:
+            return document
+        try:
+            document = graphql.parse(query)
+        except graphql.GraphQLError as exc:
+            self.rejected += 1
+            raise GraphQLQueryError([exc.message])
+        errors = graphql.validate(self.schema, document)
+        if errors:
+            self.rejected += 1
+            raise GraphQLQueryError([error.message for error in errors])
+        depth, cost = query_depth_and_cost(self.schema, document)
+        if depth > self.max_depth or cost > self.max_cost:
+            self.rejected += 1
+            raise GraphQLQueryError([f"Query depth {depth} / cost {cost} exceeds the limits "
+                                     f"(depth {self.max_depth}, cost {self.max_cost})"])
+        self.documents.put(query, document)
+        return document
+
+    async def execute(self, query: str, variables: Optional[Dict], operation_name: Optional[str],
+                      context: GraphQLContext, middleware: Optional[List] = None) -> Tuple[int, Dict]:
+        """(HTTP status, GraphQL response): 400 for rejected queries, 200 with field errors otherwise"""
+        try:
+            document = self.prepare(query)
+        except GraphQLQueryError as exc:
+            return 400, {"errors": [{"message": message} for message in exc.messages]}
+        result = graphql.execute(self.schema, document, context_value=context, variable_values=variables,
+                                 operation_name=operation_name, middleware=middleware)
+        if graphql.pyutils.is_awaitable(result):
+            result = await result
+        return 200, result.formatted
+
+    def stats(self) -> Dict:
+        return {"documents": self.documents.stats(), "rejected": self.rejected,
+                "max_depth": self.max_depth, "max_cost": self.max_cost}
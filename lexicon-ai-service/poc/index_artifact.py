@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Prebuilt search index artifact
+TF-IDF vocabulary, IDF weights and postings plus the trigram and prefix
+indexes, built offline into one versioned binary file that the service
+memory-maps at startup instead of refitting (worker processes share pages)
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from concept_store import ConceptRecord, ConceptStore
+from search_index import PackedVocabularyVectorizer, PrefixIndex, SparseTopKIndex, TrigramIndex
+from storage import open_repository
+
+# Minimum cosine similarity of a TF-IDF match
+MIN_SCORE = 0.1
+
+# ===================================================================
+# INDEX BUILD
+# ===================================================================
+
+class SearchIndexes(NamedTuple):
+    """Everything ConceptSearchEngine queries, row-aligned with the concept list"""
+    vectorizer: Any  # fitted TfidfVectorizer or PackedVocabularyVectorizer
+    index: SparseTopKIndex
+    fuzzy_index: TrigramIndex
+    prefix_index: PrefixIndex
+
+
+def search_text(concept: ConceptRecord) -> str:
+    """Document indexed by TF-IDF for one concept"""
+    return f"{concept.canonical_name} {concept.indonesian_name} {' '.join(concept.synonyms)}".lower()
+
+
+def build_search_indexes(concepts: List[ConceptRecord], popularity: Dict[int, float]) -> SearchIndexes:
+    """Fit TF-IDF and build the trigram and prefix indexes from scratch"""
+    vectorizer = TfidfVectorizer()
+    matrix = vectorizer.fit_transform([search_text(concept) for concept in concepts])
+    return SearchIndexes(
+        vectorizer=vectorizer,
+        index=SparseTopKIndex(matrix, min_score=MIN_SCORE),
+        fuzzy_index=TrigramIndex.from_concepts(concepts),  # pg_trgm default threshold 0.3
+        prefix_index=PrefixIndex.from_concepts(concepts, popularity),
+    )
+
+
+def lexicon_fingerprint(concepts: Iterable[ConceptRecord], popularity: Dict[int, float]) -> bytes:
+    """Digest of every indexed field, so an artifact is never served for another lexicon"""
+    digest = hashlib.blake2b(digest_size=16)
+    for concept in concepts:
+        fields = (str(concept.concept_id), concept.canonical_name, concept.indonesian_name,
+                  "\x1e".join(concept.synonyms), repr(float(popularity.get(concept.concept_id, 0.0))))
+        digest.update("\x1f".join(fields).encode() + b"\n")
+    return digest.digest()
+
+# ===================================================================
+# BINARY FORMAT
+# ===================================================================
+#
+# header:  magic "LXSI", version, section count, lexicon fingerprint
+# table:   one (name, numpy dtype, byte offset, item count) entry per section
+# data:    sections, each aligned to 8 bytes
+#
+# Strings are stored as a UTF-8 blob section plus an offsets section; the
+# "meta" section is a JSON object with counts and index parameters.
+
+MAGIC = b"LXSI"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sII16s")
+_SECTION = struct.Struct("<24s8sQQ")
+_ALIGN = 8
+
+
+def _packed(values: Iterable[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    """(blob, offsets) arrays for a list of byte strings"""
+    values = list(values)
+    lengths = np.fromiter((len(v) for v in values), dtype=np.int64, count=len(values))
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    offsets = offsets.astype(np.uint32 if offsets[-1] < 2 ** 32 else np.uint64)
+    return np.frombuffer(b"".join(values), dtype=np.uint8), offsets
+
+
+def index_sections(indexes: SearchIndexes) -> Dict[str, np.ndarray]:
+    """Arrays of freshly built indexes, keyed by section name"""
+    vectorizer, index, fuzzy, prefix = indexes
+    if not isinstance(vectorizer, TfidfVectorizer):
+        raise TypeError("Artifacts are written from freshly built indexes (fitted TfidfVectorizer)")
+
+    # TfidfVectorizer numbers its vocabulary in sorted order, so the packed
+    # terms are sorted and column i is term i
+    vocab_blob, vocab_offsets = _packed(term.encode() for term in vectorizer.get_feature_names_out())
+    gram_blob, gram_offsets = _packed(gram.encode() for gram, _ in sorted(fuzzy.gram_ids.items(),
+                                                                          key=lambda item: item[1]))
+
+    wide = sorted(prefix._precomputed.items())
+    wide_keys, wide_key_offsets = _packed(key for key, _ in wide)
+    wide_terms, wide_term_offsets = _packed(term.encode() for _, (_, _, matched) in wide for term in matched)
+    meta = {
+        "concepts": index.num_rows,
+        "min_score": index.min_score,
+        "fuzzy_threshold": fuzzy.threshold,
+        "prefix_max_scan": prefix.max_scan,
+        "prefix_precompute_k": prefix._precompute_k,
+    }
+    return {
+        "meta": np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8),
+        "tfidf.vocab": vocab_blob,
+        "tfidf.vocab_offsets": vocab_offsets,
+        "tfidf.idf": np.asarray(vectorizer.idf_, dtype=np.float64),
+        "tfidf.indptr": index.postings.indptr,
+        "tfidf.indices": index.postings.indices,
+        "tfidf.data": index.postings.data,
+        "trigram.grams": gram_blob,
+        "trigram.gram_offsets": gram_offsets,
+        "trigram.indptr": fuzzy.indptr,
+        "trigram.terms": fuzzy.posting_terms,
+        "trigram.term_sizes": fuzzy.term_sizes,
+        "trigram.term_rows": fuzzy.term_rows,
+        "prefix.terms": np.frombuffer(prefix.blob, dtype=np.uint8),
+        "prefix.offsets": prefix.offsets,
+        "prefix.rows": prefix.rows,
+        "prefix.popularity": prefix.popularity,
+        "prefix.wide_keys": wide_keys,
+        "prefix.wide_key_offsets": wide_key_offsets,
+        "prefix.wide_indptr": np.cumsum([0] + [len(rows) for _, (rows, _, _) in wide], dtype=np.int64),
+        "prefix.wide_rows": np.concatenate([rows for _, (rows, _, _) in wide] or [np.empty(0, np.int32)]),
+        "prefix.wide_scores": np.concatenate([scores for _, (_, scores, _) in wide] or [np.empty(0)]),
+        "prefix.wide_terms": wide_terms,
+        "prefix.wide_term_offsets": wide_term_offsets,
+    }
+
+
+def encode_sections(sections: Dict[str, np.ndarray], fingerprint: bytes) -> Iterator[bytes]:
+    """Header, section table and aligned section data, as chunks to write out"""
+    table, offset = [], _HEADER.size + _SECTION.size * len(sections)
+    for name, array in sections.items():
+        offset += -offset % _ALIGN
+        table.append(_SECTION.pack(name.encode(), array.dtype.str.encode(), offset, len(array)))
+        offset += array.nbytes
+
+    yield _HEADER.pack(MAGIC, FORMAT_VERSION, len(sections), fingerprint)
+    yield b"".join(table)
+    position = _HEADER.size + _SECTION.size * len(sections)
+    for array in sections.values():
+        yield b"\0" * (-position % _ALIGN)
+        position += -position % _ALIGN
+        yield np.ascontiguousarray(array).tobytes()
+        position += array.nbytes
+
+
+def write_artifact(indexes: SearchIndexes, fingerprint: bytes, path: str) -> int:
+    """Serialize built indexes to `path`; returns the file size
+
+    Written to a temporary file and renamed into place: truncating a file
+    that running workers have mapped would crash them.
+    """
+    size = 0
+    with open(f"{path}.tmp", "wb") as f:
+        for chunk in encode_sections(index_sections(indexes), fingerprint):
+            size += f.write(chunk)
+    os.replace(f"{path}.tmp", path)
+    return size
+
+# ===================================================================
+# ARTIFACT LOADING
+# ===================================================================
+
+class SearchIndexArtifact:
+    """Read-only view of an artifact's sections (NumPy arrays over the buffer)"""
+
+    def __init__(self, buffer, source: str = "<memory>"):
+        magic, version, count, fingerprint = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{source} is not a search index artifact")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{source} has format version {version}, expected {FORMAT_VERSION}")
+
+        self.source = source
+        self.fingerprint = fingerprint
+        self._buffer = buffer
+        self.offsets: Dict[str, int] = {}
+        self.sections: Dict[str, np.ndarray] = {}
+        for i in range(count):
+            name, dtype, offset, length = _SECTION.unpack_from(buffer, _HEADER.size + i * _SECTION.size)
+            name = name.rstrip(b"\0").decode()
+            self.offsets[name] = offset
+            self.sections[name] = np.frombuffer(buffer, dtype=np.dtype(dtype.rstrip(b"\0").decode()),
+                                                count=length, offset=offset)
+        self.meta = json.loads(self.sections["meta"].tobytes())
+        self.nbytes = len(buffer)
+
+    @classmethod
+    def open(cls, path: str) -> 'SearchIndexArtifact':
+        """Memory-map an artifact (pages load lazily, shared across workers)"""
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, source=path)
+
+    def strings(self, blob: str, offsets: str) -> List[str]:
+        """Decode a (blob, offsets) section pair into a list (small sections only)"""
+        data, bounds = self.sections[blob].tobytes(), self.sections[offsets].tolist()
+        return [data[lo:hi].decode() for lo, hi in zip(bounds, bounds[1:])]
+
+    def search_indexes(self) -> SearchIndexes:
+        """Indexes backed by the artifact's buffer (no copies of the large arrays)"""
+        s, meta = self.sections, self.meta
+        vectorizer = PackedVocabularyVectorizer(self._buffer, s["tfidf.vocab_offsets"], s["tfidf.idf"],
+                                                base=self.offsets["tfidf.vocab"])
+        postings = sparse.csr_matrix((s["tfidf.data"], s["tfidf.indices"], s["tfidf.indptr"]),
+                                     shape=(len(s["tfidf.indptr"]) - 1, meta["concepts"]), copy=False)
+        gram_ids = {gram: i for i, gram in enumerate(self.strings("trigram.grams", "trigram.gram_offsets"))}
+        fuzzy = TrigramIndex.from_arrays(gram_ids, s["trigram.terms"], s["trigram.indptr"],
+                                         s["trigram.term_sizes"], s["trigram.term_rows"],
+                                         threshold=meta["fuzzy_threshold"])
+
+        bounds = s["prefix.wide_indptr"].tolist()
+        matched = self.strings("prefix.wide_terms", "prefix.wide_term_offsets")
+        precomputed = {key.encode(): (s["prefix.wide_rows"][lo:hi], s["prefix.wide_scores"][lo:hi],
+                                      matched[lo:hi])
+                       for key, lo, hi in zip(self.strings("prefix.wide_keys", "prefix.wide_key_offsets"), bounds, bounds[1:])}
+        prefix = PrefixIndex.from_arrays(self._buffer, s["prefix.offsets"], s["prefix.rows"],
+                                         s["prefix.popularity"], precomputed, base=self.offsets["prefix.terms"],
+                                         max_scan=meta["prefix_max_scan"],
+                                         precompute_k=meta["prefix_precompute_k"])
+        return SearchIndexes(vectorizer, SparseTopKIndex.from_postings(postings, meta["min_score"]),
+                             fuzzy, prefix)
+
+
+def load_search_indexes(path: str, concepts: List[ConceptRecord],
+                        popularity: Dict[int, float]) -> SearchIndexes:
+    """Memory-map the artifact at `path`, refusing one built from another lexicon"""
+    artifact = SearchIndexArtifact.open(path)
+    if artifact.fingerprint != lexicon_fingerprint(concepts, popularity):
+        raise ValueError(f"{path} was built from a different lexicon; rebuild it "
+                         f"with `python index_artifact.py build`")
+    return artifact.search_indexes()
+
+
+async def database_concepts(url: str) -> List[ConceptRecord]:
+    """Concept records of a lexicon database, in the row order the service loads them"""
+    repository = await open_repository(url)
+    try:
+        return [record async for record in repository.iter_concepts()]
+    finally:
+        await repository.close()
+
+
+def build_artifact(concepts: List[ConceptRecord], popularity: Dict[int, float], path: str) -> int:
+    """Build the indexes for a lexicon and write them to `path`; returns the file size"""
+    indexes = build_search_indexes(concepts, popularity)
+    return write_artifact(indexes, lexicon_fingerprint(concepts, popularity), path)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build an artifact for a lexicon")
+    build.add_argument("artifact_path")
+    build.add_argument("--concepts", help="JSON list of concepts (default: the service's sample lexicon)")
+    build.add_argument("--database-url", help="Read the concepts from a lexicon database (storage.py), "
+                                              "as the service does with DATABASE_URL")
+    build.add_argument("--popularity", help="JSON object of concept_id -> popularity (default: the "
+                                            "service's CONCEPT_POPULARITY; the artifact only loads if "
+                                            "the service ranks with the same table)")
+    info = commands.add_parser("info", help="Show an artifact's parameters and sections")
+    info.add_argument("artifact_path")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        # Importing main must not try to load the artifact being (re)built
+        os.environ.pop("SEARCH_INDEX_PATH", None)
+        from main import CONCEPT_POPULARITY, SAMPLE_CONCEPTS
+
+        # The service ranks (and fingerprints) every lexicon with CONCEPT_POPULARITY,
+        # so that is the default whatever the concepts come from
+        concepts, popularity = SAMPLE_CONCEPTS, CONCEPT_POPULARITY
+        if args.concepts:
+            with open(args.concepts, encoding="utf-8") as f:
+                concepts = json.load(f)
+        elif args.database_url:
+            concepts = asyncio.run(database_concepts(args.database_url))
+        if args.popularity:
+            with open(args.popularity, encoding="utf-8") as f:
+                popularity = {int(k): float(v) for k, v in json.load(f).items()}
+        t0 = time.perf_counter()
+        store = ConceptStore(concepts)
+        size = build_artifact(store.records, popularity, args.artifact_path)
+        print(f"{len(store)} concepts, {size / 2**20:.1f} MiB in {time.perf_counter() - t0:.1f}s "
+              f"-> {args.artifact_path}")
+    else:
+        artifact = SearchIndexArtifact.open(args.artifact_path)
+        print(f"fingerprint {artifact.fingerprint.hex()}, {artifact.nbytes / 2**20:.1f} MiB")
+        print(json.dumps(artifact.meta))
+        for name, array in artifact.sections.items():
+            print(f"{name:>26} {array.dtype.str:>4} {len(array):>12} {array.nbytes / 2**20:9.2f} MiB")
+
+if __name__ == "__main__":
+    main_cli()
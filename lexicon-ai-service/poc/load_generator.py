@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Async load generator for the Lexicon AI Service POC
+Replays a weighted mix of search, recommendation, FHIR claim and ML predict
+traffic against a running server (or the app in-process) and reports
+per-endpoint p50/p95/p99 latency, error rates and the saturation point.
+
+Open-loop mode sends on a fixed arrival schedule regardless of how fast
+responses come back, and measures latency from the scheduled send time, so
+a stalled server shows up as tail latency instead of as a quietly lower
+request rate (coordinated omission). Closed-loop mode (--concurrency) runs
+N clients that each wait for their previous response.
+
+    python load_generator.py --rate 200 --duration 30
+    python load_generator.py --rates 50,100,200,400,800 --duration 15 --slo-ms 100
+    python load_generator.py --concurrency 32 --duration 30
+    python load_generator.py --in-process --concepts 10000 --rates 100,200,400
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from synthetic_data import SEASONS, generate_claims
+
+DEFAULT_MIX = "search=50,recommendations=25,fhir_claim=15,ml_predict=10"
+
+# Inputs for the sample lexicon a default server starts with (typos included)
+SAMPLE_QUERIES = ["DBD", "demam", "demam berdarah", "darah lengkap", "paracetamol", "parasetamol",
+                  "cuci darah", "hemodialisis", "demm berdarah", "trombosyt", "parase", "dengue"]
+SAMPLE_LOCATIONS = ["Manado", "Jakarta", "Surabaya"]
+SAMPLE_DIAGNOSES = ["DBD", "ISPA"]
+
+# Saturation: a step is sustainable while it keeps up with the offered rate,
+# stays within the latency SLO and errors stay rare
+MIN_THROUGHPUT_RATIO = 0.95
+MAX_ERROR_RATE = 0.01
+
+# asyncio timers fire up to ~1ms late; open loop wakes this much early and
+# sends slightly ahead of schedule rather than behind it
+TIMER_SLACK = 0.001
+
+
+class TrafficMix:
+    """Weighted request factory: `next()` returns (endpoint name, httpx request kwargs)"""
+
+    def __init__(self, weights: Dict[str, float], queries: List[str], contexts: List[Tuple[int, Dict]],
+                 claims: List[Dict], seed: int = 23):
+        self.rng = random.Random(seed)
+        self.names = list(weights)
+        self.cumulative = list(np.cumsum([weights[name] for name in self.names]))
+        self.queries, self.contexts, self.claims = queries, contexts, claims
+        self.builders: Dict[str, Callable[[], Dict]] = {
+            "search": self._search,
+            "recommendations": self._recommendations,
+            "fhir_claim": self._fhir_claim,
+            "ml_predict": self._ml_predict,
+        }
+        unknown = set(self.names) - set(self.builders)
+        if unknown:
+            raise ValueError(f"Unknown endpoints in mix: {', '.join(sorted(unknown))}")
+
+    @classmethod
+    def sample(cls, weights: Dict[str, float], seed: int = 23) -> 'TrafficMix':
+        """Traffic against the sample lexicon"""
+        rng = random.Random(seed)
+        contexts = [(1, {"location": rng.choice(SAMPLE_LOCATIONS), "season": rng.choice(SEASONS)})
+                    for _ in range(100)]
+        return cls(weights, SAMPLE_QUERIES, contexts, list(generate_claims(1000, seed)), seed)
+
+    def next(self) -> Tuple[str, Dict]:
+        name = self.names[self._pick()]
+        return name, self.builders[name]()
+
+    def _pick(self) -> int:
+        point = self.rng.random() * self.cumulative[-1]
+        for i, bound in enumerate(self.cumulative):
+            if point < bound:
+                return i
+        return len(self.cumulative) - 1
+
+    def _search(self) -> Dict:
+        return {"method": "GET", "url": "/api/v1/concepts/search",
+                "params": {"q": self.rng.choice(self.queries)}}
+
+    def _recommendations(self) -> Dict:
+        diagnosis_id, context = self.rng.choice(self.contexts)
+        return {"method": "POST", "url": "/api/v1/cds/recommendations",
+                "json": {"diagnosis_id": diagnosis_id, "context": context}}
+
+    def _fhir_claim(self) -> Dict:
+        return {"method": "POST", "url": "/api/v1/fhir/claims", "json": self.rng.choice(self.claims)}
+
+    def _ml_predict(self) -> Dict:
+        return {"method": "GET", "url": "/api/v1/ml/predict",
+                "params": {"diagnosis": self.rng.choice(SAMPLE_DIAGNOSES),
+                           "location": self.rng.choice(SAMPLE_LOCATIONS)}}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """"search=50,recommendations=25" -> {"search": 50.0, "recommendations": 25.0}"""
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+# ===================================================================
+# RECORDING
+# ===================================================================
+
+class Recorder:
+    """Per-endpoint latencies (from the scheduled send), service times (from the actual send) and errors"""
+
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = {}
+        self.service: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.status: Dict[str, Dict[int, int]] = {}
+        self.send_lag: List[float] = []  # how late requests went out; high means the generator itself lags
+        self.dropped = 0  # arrivals not sent because --max-in-flight requests were outstanding
+
+    def record(self, name: str, scheduled: float, sent: float, finished: float, status: Optional[int]) -> None:
+        self.latency.setdefault(name, []).append(finished - min(scheduled, sent))
+        self.send_lag.append(max(0.0, sent - scheduled))
+        self.service.setdefault(name, []).append(finished - sent)
+        codes = self.status.setdefault(name, {})
+        codes[status or 0] = codes.get(status or 0, 0) + 1
+        if status is None or status >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self, elapsed: float) -> Dict:
+        endpoints = {}
+        for name in sorted(self.latency):
+            latency = np.array(self.latency[name]) * 1000
+            service = np.array(self.service[name]) * 1000
+            endpoints[name] = {
+                "requests": len(latency),
+                "throughput": round(len(latency) / elapsed, 1),
+                "error_rate": round(self.errors.get(name, 0) / len(latency), 4),
+                "p50_ms": round(float(np.percentile(latency, 50)), 3),
+                "p95_ms": round(float(np.percentile(latency, 95)), 3),
+                "p99_ms": round(float(np.percentile(latency, 99)), 3),
+                "max_ms": round(float(latency.max()), 3),
+                "service_p99_ms": round(float(np.percentile(service, 99)), 3),
+                "status": {str(code): count for code, count in sorted(self.status[name].items())},
+            }
+        all_latency = (np.concatenate([self.latency[n] for n in self.latency]) * 1000
+                       if self.latency else np.zeros(1))
+        total = sum(e["requests"] for e in endpoints.values())
+        errors = sum(self.errors.values()) + self.dropped
+        return {
+            "elapsed": round(elapsed, 3),
+            "requests": total,
+            "throughput": round(total / elapsed, 1),
+            "dropped": self.dropped,
+            "error_rate": round(errors / max(1, total + self.dropped), 4),
+            "p50_ms": round(float(np.percentile(all_latency, 50)), 3),
+            "p99_ms": round(float(np.percentile(all_latency, 99)), 3),
+            "send_lag_p99_ms": round(float(np.percentile(self.send_lag or [0.0], 99)) * 1000, 3),
+            "endpoints": endpoints,
+        }
+
+
+async def _send(client: httpx.AsyncClient, recorder: Recorder, name: str, request: Dict,
+                scheduled: float, timeout: float) -> None:
+    sent = time.perf_counter()
+    try:
+        response = await client.request(**request, timeout=timeout)
+        status = response.status_code
+    except httpx.HTTPError:
+        status = None
+    recorder.record(name, scheduled, sent, time.perf_counter(), status)
+
+# ===================================================================
+# LOAD MODES
+# ===================================================================
+
+async def open_loop(client: httpx.AsyncClient, mix: TrafficMix, rate: float, duration: float,
+                    max_in_flight: int = 1000, poisson: bool = True, timeout: float = 30.0) -> Dict:
+    """Send at `rate` req/s on a precomputed schedule for `duration` seconds
+
+    Arrivals are Poisson (or evenly spaced) and never wait for responses; a
+    request that goes out late because the generator fell behind is still
+    timed from its scheduled slot.
+    """
+    recorder = Recorder()
+    rng = random.Random(29)
+    in_flight = set()
+    start = time.perf_counter()
+    scheduled = start
+    while True:
+        scheduled += rng.expovariate(rate) if poisson else 1 / rate
+        if scheduled - start >= duration:
+            break
+        delay = scheduled - time.perf_counter() - TIMER_SLACK
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            recorder.dropped += 1
+            continue
+        name, request = mix.next()
+        task = asyncio.create_task(_send(client, recorder, name, request, scheduled, timeout))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.wait(in_flight)
+    result = recorder.report(time.perf_counter() - start)
+    result.update(mode="open", target_rate=rate)
+    return result
+
+
+async def closed_loop(client: httpx.AsyncClient, mix: TrafficMix, concurrency: int, duration: float,
+                      timeout: float = 30.0) -> Dict:
+    """`concurrency` clients, each sending its next request when the previous one returns"""
+    recorder = Recorder()
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def client_loop():
+        while time.perf_counter() < deadline:
+            name, request = mix.next()
+            now = time.perf_counter()
+            await _send(client, recorder, name, request, now, timeout)
+
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    result = recorder.report(time.perf_counter() - start)
+    result.update(mode="closed", concurrency=concurrency)
+    return result
+
+
+def sustainable(result: Dict, slo_ms: float) -> Tuple[bool, str]:
+    """Whether an open-loop step kept up; the reason if not"""
+    if result["throughput"] < MIN_THROUGHPUT_RATIO * result["target_rate"]:
+        return False, f"throughput {result['throughput']} < {MIN_THROUGHPUT_RATIO:.0%} of offered"
+    if result["error_rate"] > MAX_ERROR_RATE:
+        return False, f"error rate {result['error_rate']:.1%}"
+    if result["p99_ms"] > slo_ms:
+        return False, f"p99 {result['p99_ms']}ms > SLO {slo_ms}ms"
+    return True, ""
+
+
+def print_result(result: Dict) -> None:
+    offered = (f"offered {result['target_rate']:.0f} req/s" if result["mode"] == "open"
+               else f"{result['concurrency']} clients")
+    print(f"{offered}: achieved {result['throughput']:.1f} req/s, {result['requests']} requests, "
+          f"errors {result['error_rate']:.2%}, dropped {result['dropped']} | "
+          f"p50 {result['p50_ms']:.2f}ms p99 {result['p99_ms']:.2f}ms | "
+          f"send lag p99 {result['send_lag_p99_ms']:.2f}ms")
+    for name, e in result["endpoints"].items():
+        print(f"  {name:<16} {e['requests']:>7} req | p50 {e['p50_ms']:8.2f} p95 {e['p95_ms']:8.2f} "
+              f"p99 {e['p99_ms']:8.2f} max {e['max_ms']:8.1f}ms | service p99 {e['service_p99_ms']:8.2f}ms | "
+              f"errors {e['error_rate']:.2%}")
+
+# ===================================================================
+# COMMAND LINE
+# ===================================================================
+
+def _client(args) -> Tuple[httpx.AsyncClient, TrafficMix]:
+    weights = parse_mix(args.mix)
+    if not args.in_process:
+        limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+        return httpx.AsyncClient(base_url=args.base_url, limits=limits), TrafficMix.sample(weights, args.seed)
+
+    # The app shares this event loop with the generator: useful for relative
+    # comparisons, while absolute numbers belong to a separate server process
+    import main
+    if args.concepts:
+        from benchmark_suite import Workload
+        workload = Workload(args.concepts, args.seed)
+        mix = TrafficMix(weights, workload.queries, workload.contexts, workload.claims, args.seed)
+    else:
+        mix = TrafficMix.sample(weights, args.seed)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://load"), mix
+
+
+async def run(args) -> List[Dict]:
+    client, mix = _client(args)
+    results = []
+    async with client:
+        if args.concurrency:
+            result = await closed_loop(client, mix, args.concurrency, args.duration, args.timeout)
+            print_result(result)
+            return [result]
+
+        last_ok = None
+        for rate in (float(r) for r in (args.rates or str(args.rate)).split(",")):
+            result = await open_loop(client, mix, rate, args.duration, args.max_in_flight,
+                                     not args.uniform, args.timeout)
+            ok, reason = sustainable(result, args.slo_ms)
+            result["sustainable"] = ok
+            results.append(result)
+            print_result(result)
+            if not ok:
+                print(f"Saturated at {rate:.0f} req/s ({reason}); "
+                      f"last sustainable rate: {f'{last_ok:.0f} req/s' if last_ok else 'none'}")
+                break
+            last_ok = rate
+        else:
+            if len(results) > 1:
+                print(f"No saturation up to {last_ok:.0f} req/s")
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--in-process", action="store_true", help="Drive main.app in this process (no server)")
+    parser.add_argument("--concepts", type=int, default=0, help="In-process: synthetic lexicon size")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Endpoint weights")
+    parser.add_argument("--rate", type=float, default=100, help="Open loop: offered requests per second")
+    parser.add_argument("--rates", help="Open loop: comma separated rate steps, stopping at saturation")
+    parser.add_argument("--uniform", action="store_true", help="Evenly spaced arrivals instead of Poisson")
+    parser.add_argument("--concurrency", type=int, default=0, help="Closed loop with N clients instead")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per run / rate step")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Open loop: outstanding request cap")
+    parser.add_argument("--slo-ms", type=float, default=200, help="p99 latency a sustainable step must meet")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=23)
+    parser.add_argument("--output", help="Write every step's results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -4,17 +4,52 @@ Lexicon AI Service - Proof of Concept
 Minimal implementation demonstrating core AI capabilities
 """
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import Callable, List, Optional, Dict, Tuple
 # import pandas as pd  # Removed to avoid dependency issues
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import json
 import asyncio
+import os
+import time
 
-app = FastAPI(title="Lexicon AI Service POC", version="1.0.0")
+from cds_tables import CONTRAINDICATION_TYPES, ContextScoreTables
+from code_mapping import CodeMapping, CodeMappingIndex
+from concept_store import ConceptStore
+from executor import EngineExecutor, ExecutorSaturated
+from fhir_stream import (NDJSON_MEDIA_TYPES, claims_from_bundle, iter_file_chunks, iter_ndjson_claims,
+                         iterate, spool_body, stream_results)
+from graphql_api import GraphQLContext, GraphQLService, graphql
+from index_artifact import SearchIndexes, build_search_indexes, lexicon_fingerprint, load_search_indexes
+from metrics import CONTENT_TYPE, HistogramSeries, MetricsRegistry, RequestMetricsMiddleware
+from pathway import PathwayEngine, PathwayGraph, pathway_limits_error
+from relationship_learning import RelationshipLearner
+from result_cache import ResultCache
+from risk_model import RiskModel
+from search_index import PREFIX_PRECOMPUTE_K, SearchHit
+from serialization import ConceptJSON, JSONBytesResponse, RawJSON, dumps, encode
+from snapshot import LexiconSnapshot, SnapshotBusy, SnapshotManager, diff_lexicon
+from storage import LexiconRepository, database_backend, open_repository
+from validation import TreatmentValidator
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global repository, code_index
+    if DATABASE_URL:
+        # Serve the lexicon in the database instead of the sample data
+        repository = await open_repository(DATABASE_URL)
+        if not CODE_MAPPING_PATH:
+            code_index = await CodeMappingIndex.from_stream(repository.iter_code_mappings())
+        await lexicon.reload(*await repository.load_lexicon())
+    yield
+    engine_executor.shutdown()
+    if repository is not None:
+        await repository.close()
+
+app = FastAPI(title="Lexicon AI Service POC", version="1.0.0", lifespan=lifespan)
 
 # ===================================================================
 # DATA MODELS
@@ -22,11 +57,60 @@ app = FastAPI(title="Lexicon AI Service POC", version="1.0.0")
 
 class Concept(BaseModel):
     concept_id: int
+    human_readable_code: Optional[str] = None
     canonical_name: str
     indonesian_name: str
     concept_type: str
     synonyms: List[str] = []
 
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    limit: int = 10
+    fuzzy: bool = True
+
+class CodeRef(BaseModel):
+    system: str
+    code: str
+
+class BatchMappingRequest(BaseModel):
+    codes: List[CodeRef]
+
+class LexiconReloadRequest(BaseModel):
+    concepts: Optional[List[Concept]] = None  # Omitted: keep the current concepts
+    relationships: Optional[Dict[int, List[Dict]]] = None  # Omitted: keep the current relationships
+
+class EncounterConcept(BaseModel):
+    concept_id: int
+    role: str  # DIAGNOSIS, LAB_TEST, MEDICATION or PROCEDURE
+
+class Encounter(BaseModel):
+    location: Optional[str] = None
+    season: str
+    concepts: List[EncounterConcept]
+
+class LearnRelationshipsRequest(BaseModel):
+    encounters: List[Encounter]
+    apply: bool = True  # Swap the rescored relationships into the lexicon
+
+class TreatmentPlan(BaseModel):
+    diagnosis_concept_id: int
+    procedures: List[int] = []
+    medications: List[int] = []
+
+class ValidationBatchRequest(BaseModel):
+    plans: List[TreatmentPlan]
+
+class GraphQLRequest(BaseModel):
+    query: str
+    variables: Optional[Dict] = None
+    operationName: Optional[str] = None
+
+class RiskBatchRequest(BaseModel):
+    diagnoses: Optional[List[str]] = None  # Omitted: every modelled diagnosis
+    locations: Optional[List[str]] = None  # Omitted: every modelled location
+    seasons: Optional[List[str]] = None    # Omitted: WET and DRY
+    records: bool = False  # One object per combination instead of nested score lists
+
 class ClinicalRequest(BaseModel):
     diagnosis_id: int
     context: Dict[str, str] = {}
@@ -51,6 +135,7 @@ class FHIRClaim(BaseModel):
 SAMPLE_CONCEPTS = [
     {
         "concept_id": 1,
+        "human_readable_code": "DIAG-DBD-001",
         "canonical_name": "Dengue Fever",
         "indonesian_name": "Demam Berdarah Dengue",
         "concept_type": "DIAGNOSIS",
@@ -58,6 +143,7 @@ SAMPLE_CONCEPTS = [
     },
     {
         "concept_id": 2,
+        "human_readable_code": "LAB-CBC-001",
         "canonical_name": "Complete Blood Count",
         "indonesian_name": "Pemeriksaan Darah Lengkap",
         "concept_type": "LAB_TEST",
@@ -65,6 +151,7 @@ SAMPLE_CONCEPTS = [
     },
     {
         "concept_id": 3,
+        "human_readable_code": "MED-PARAC-001",
         "canonical_name": "Paracetamol",
         "indonesian_name": "Parasetamol",
         "concept_type": "MEDICATION",
@@ -72,126 +159,223 @@ SAMPLE_CONCEPTS = [
     },
     {
         "concept_id": 4,
+        "human_readable_code": "LAB-PLT-001",
         "canonical_name": "Platelet Count",
         "indonesian_name": "Hitung Trombosit",
         "concept_type": "LAB_TEST",
         "synonyms": ["PLT", "Trombosit"]
+    },
+    {
+        "concept_id": 5,
+        "human_readable_code": "MED-IBU-001",
+        "canonical_name": "Ibuprofen",
+        "indonesian_name": "Ibuprofen",
+        "concept_type": "MEDICATION",
+        "synonyms": ["Proris", "Brufen", "NSAID"]
     }
 ]
 
+# External code mappings (rows of xaie_code_mappings; confidence as in xaie_fhir_mappings)
+SAMPLE_CODE_MAPPINGS = [
+    {"concept_id": 1, "coding_system_name": "ICD-10", "code_value": "A90",
+     "code_description": "Dengue fever", "mapping_confidence": 0.95},
+    {"concept_id": 1, "coding_system_name": "ICD-10", "code_value": "A91",
+     "code_description": "Dengue haemorrhagic fever", "mapping_confidence": 0.95},
+    {"concept_id": 1, "coding_system_name": "SNOMED CT", "code_value": "1002005",
+     "code_description": "Dengue fever", "mapping_confidence": 0.95},
+    {"concept_id": 2, "coding_system_name": "LOINC", "code_value": "57021-8",
+     "code_description": "Complete blood count"},
+    {"concept_id": 3, "coding_system_name": "ATC", "code_value": "N02BE01",
+     "code_description": "Paracetamol"},
+    {"concept_id": 4, "coding_system_name": "LOINC", "code_value": "777-3",
+     "code_description": "Platelets [#/volume] in Blood by Automated count"},
+    {"concept_id": 5, "coding_system_name": "ATC", "code_value": "M01AE01",
+     "code_description": "Ibuprofen"}
+]
+
+# Concept popularity for autocomplete ranking (simulating query-log counts, normalized)
+CONCEPT_POPULARITY = {1: 0.95, 2: 0.90, 3: 0.80, 4: 0.85, 5: 0.75}
+
 # Clinical relationships (simulating AI-learned data)
 CLINICAL_RELATIONSHIPS = {
     1: [  # Dengue Fever
         {"target_id": 2, "type": "HAS_DIAGNOSTIC_TEST", "priority": 0.98, "context_boost": {"Manado_WET": 0.15}},
         {"target_id": 3, "type": "HAS_TREATMENT", "priority": 0.85, "context_boost": {"Jakarta_DRY": 0.10}},
-        {"target_id": 4, "type": "HAS_DIAGNOSTIC_TEST", "priority": 0.95, "context_boost": {"WET": 0.20}}
+        {"target_id": 4, "type": "HAS_DIAGNOSTIC_TEST", "priority": 0.95, "context_boost": {"WET": 0.20}},
+        {"target_id": 5, "type": "HAS_CONTRAINDICATION", "priority": 1.0}  # NSAIDs raise the bleeding risk
     ]
 }
 
+# Outbreak risk model (simulating trained seasonal patterns)
+SEASONAL_RISK = {
+    "DBD": {"WET": 0.85, "DRY": 0.25},
+    "ISPA": {"WET": 0.45, "DRY": 0.70}
+}
+LOCATION_RISK_MULTIPLIER = {"Manado": 1.2, "Jakarta": 1.0, "Surabaya": 0.9}
+
 # ===================================================================
 # AI SERVICES
 # ===================================================================
 
 class ConceptSearchEngine:
-    def __init__(self):
-        self.concepts = SAMPLE_CONCEPTS
-        self.vectorizer = TfidfVectorizer()
-        self._build_search_index()
-    
-    def _build_search_index(self):
-        """Build search index for fuzzy matching"""
-        search_texts = []
-        for concept in self.concepts:
-            text = f"{concept['canonical_name']} {concept['indonesian_name']} {' '.join(concept['synonyms'])}"
-            search_texts.append(text.lower())
-        
-        self.search_matrix = self.vectorizer.fit_transform(search_texts)
+    def __init__(self, store: ConceptStore, index_path: Optional[str] = None,
+                 indexes: Optional[SearchIndexes] = None):
+        self.store = store
+        self.concepts = store.records  # Row order of every search index
+        self._build_search_index(index_path, indexes)
+    
+    def _build_search_index(self, index_path: Optional[str] = None, indexes: Optional[SearchIndexes] = None):
+        """Build search index for fuzzy matching, map a prebuilt artifact or reuse built indexes"""
+        if indexes is None and index_path:
+            indexes = load_search_indexes(index_path, self.concepts, CONCEPT_POPULARITY)
+        elif indexes is None:
+            indexes = build_search_indexes(self.concepts, CONCEPT_POPULARITY)
+        self.vectorizer = indexes.vectorizer
+        self.index = indexes.index  # TF-IDF postings, minimum similarity 0.1
+        self.fuzzy_index = indexes.fuzzy_index  # pg_trgm default threshold 0.3
+        self.prefix_index = indexes.prefix_index
     
-    def search(self, query: str, limit: int = 10) -> List[Dict]:
+    @property
+    def indexes(self) -> SearchIndexes:
+        """The built indexes, for reuse by an engine over an unchanged lexicon"""
+        return SearchIndexes(self.vectorizer, self.index, self.fuzzy_index, self.prefix_index)
+    
+    def search(self, query: str, limit: int = 10, fuzzy: bool = True) -> List[Dict]:
         """Fuzzy search for medical concepts"""
+        return [hit.to_dict() for hit in self.search_hits(query, limit, fuzzy)]
+    
+    def search_hits(self, query: str, limit: int = 10, fuzzy: bool = True) -> List[SearchHit]:
+        """Top-k search returning lightweight hits that reference the concepts
+        
+        Word-level TF-IDF matches come first; remaining slots are filled from
+        the trigram index so typos and partial words still find concepts.
+        """
+        started = time.perf_counter()
         query_vector = self.vectorizer.transform([query.lower()])
-        similarities = cosine_similarity(query_vector, self.search_matrix)[0]
+        t = SEARCH_STAGES["transform"].lap(started)
+        rows, scores = self.index.scores(query_vector)
+        t = SEARCH_STAGES["similarity"].lap(t)
+        rows, scores = self.index.select(rows, scores, limit)
+        SEARCH_STAGES["select"].lap(t)
+        hits = self._to_hits(query, rows, scores, limit, fuzzy, SEARCH_STAGES)
+        SEARCH_STAGES["total"].lap(started)
+        return hits
+    
+    def search_many(self, queries: List[str], limit: int = 10, fuzzy: bool = True) -> List[List[Dict]]:
+        """Search many queries with one transform and one sparse matrix product"""
+        return [[hit.to_dict() for hit in hits] for hits in self.search_hits_many(queries, limit, fuzzy)]
+    
+    def search_hits_many(self, queries: List[str], limit: int = 10, fuzzy: bool = True) -> List[List[SearchHit]]:
+        """search_many returning hits, one list per query"""
+        started = time.perf_counter()
+        query_matrix = self.vectorizer.transform([q.lower() for q in queries])
+        t = BATCH_SEARCH_STAGES["transform"].lap(started)
+        per_query = self.index.top_k_many(query_matrix, limit)
+        BATCH_SEARCH_STAGES["similarity"].lap(t)
+        results = [self._to_hits(query, rows, scores, limit, fuzzy, BATCH_SEARCH_STAGES)
+                   for query, (rows, scores) in zip(queries, per_query)]
+        BATCH_SEARCH_STAGES["total"].lap(started)
+        return results
+    
+    def _to_hits(self, query: str, rows: np.ndarray, scores: np.ndarray, limit: int,
+                 fuzzy: bool, stages: Dict[str, HistogramSeries]) -> List[SearchHit]:
+        """Wrap TF-IDF matches as hits, filling free slots from the trigram index"""
+        matches = list(zip(rows.tolist(), scores.tolist()))
         
-        results = []
-        for i, score in enumerate(similarities):
-            if score > 0.1:  # Minimum similarity threshold
-                concept = self.concepts[i].copy()
-                concept['match_score'] = float(score)
-                results.append(concept)
+        if fuzzy and len(matches) < limit:
+            started = time.perf_counter()
+            seen = {row for row, _ in matches}
+            fuzzy_rows, fuzzy_scores = self.fuzzy_index.top_k(query, limit)
+            for row, score in zip(fuzzy_rows.tolist(), fuzzy_scores.tolist()):
+                if row not in seen and len(matches) < limit:
+                    matches.append((row, score))
+            stages["fuzzy"].lap(started)
         
-        return sorted(results, key=lambda x: x['match_score'], reverse=True)[:limit]
+        return [SearchHit(self.concepts[i], s) for i, s in matches]
+    
+    def autocomplete(self, prefix: str, limit: int = 10) -> List[Dict]:
+        """Most popular concepts with a name or synonym starting with `prefix`"""
+        started = time.perf_counter()
+        rows, scores, matched = self.prefix_index.top_k(prefix, limit)
+        AUTOCOMPLETE_STAGES["prefix"].lap(started)
+        results = []
+        for i, score, term in zip(rows.tolist(), scores.tolist(), matched):
+            concept = self.concepts[i]
+            results.append({
+                'concept_id': concept.concept_id,
+                'canonical_name': concept.canonical_name,
+                'indonesian_name': concept.indonesian_name,
+                'concept_type': concept.concept_type,
+                'matched_term': term,
+                'popularity': score
+            })
+        return results
 
 class ClinicalDecisionEngine:
-    def __init__(self):
-        self.relationships = CLINICAL_RELATIONSHIPS
-        self.concepts = {c['concept_id']: c for c in SAMPLE_CONCEPTS}
+    def __init__(self, store: ConceptStore, relationships: Dict[int, List[Dict]] = CLINICAL_RELATIONSHIPS,
+                 locations: Optional[List[str]] = None, score_tables: Optional[ContextScoreTables] = None,
+                 pathway_graph: Optional[PathwayGraph] = None,
+                 validator: Optional[TreatmentValidator] = None):
+        self.relationships = relationships
+        self.store = store
+        # Final priorities per (diagnosis, location, season, relationship)
+        self.score_tables = score_tables or ContextScoreTables(store, relationships, locations or ())
+        # Multi-hop pathways over the same relationships, as a CSR graph
+        self.pathways = PathwayEngine(store, pathway_graph or PathwayGraph.from_relationships(relationships))
+        # Expected / allowed / contraindicated concepts per diagnosis for plan validation
+        self.validator = validator or TreatmentValidator(store, relationships)
     
     def get_recommendations(self, diagnosis_id: int, context: Dict) -> List[Dict]:
         """Get AI-powered clinical recommendations"""
-        if diagnosis_id not in self.relationships:
-            return []
-        
-        recommendations = []
-        for rel in self.relationships[diagnosis_id]:
-            target_concept = self.concepts[rel['target_id']]
-            
-            # Calculate contextual priority boost
-            priority = rel['priority']
-            context_key = f"{context.get('location', '')}_{context.get('season', '')}"
-            
-            if context_key in rel.get('context_boost', {}):
-                priority += rel['context_boost'][context_key]
-            elif context.get('season') in rel.get('context_boost', {}):
-                priority += rel['context_boost'][context.get('season')]
-            
-            priority = min(priority, 1.0)  # Cap at 1.0
-            
-            # Generate reasoning
-            reason = self._generate_reasoning(target_concept, rel['type'], context)
-            
-            recommendations.append({
-                'concept': target_concept,
-                'priority_score': priority,
-                'confidence': 0.9,  # Simulated confidence
-                'reason': reason
-            })
-        
-        return sorted(recommendations, key=lambda x: x['priority_score'], reverse=True)
+        started = time.perf_counter()
+        recommendations = self.score_tables.recommend(diagnosis_id, context.get('location', ''),
+                                                      context.get('season', ''))
+        CDS_STAGES["recommend"].lap(started)
+        return recommendations
     
-    def _generate_reasoning(self, concept: Dict, rel_type: str, context: Dict) -> str:
-        """Generate clinical reasoning (simulating Bedrock)"""
-        location = context.get('location', 'Indonesia')
-        season = context.get('season', '')
-        
-        reasoning_templates = {
-            'HAS_DIAGNOSTIC_TEST': f"{concept['indonesian_name']} penting untuk monitoring kondisi pasien",
-            'HAS_TREATMENT': f"{concept['indonesian_name']} efektif untuk penanganan simptomatik"
-        }
-        
-        base_reason = reasoning_templates.get(rel_type, f"{concept['indonesian_name']} direkomendasikan")
-        
-        # Add contextual information
-        if location == "Manado" and season == "WET":
-            base_reason += f" - tinggi di {location} saat musim hujan"
-        elif season == "WET":
-            base_reason += " - penting saat musim hujan"
-        
-        return base_reason
+    def get_pathway(self, diagnosis_id: int, context: Dict, max_depth: int, max_branch: int,
+                    with_concepts: bool = True) -> Optional[Dict]:
+        """Multi-hop clinical pathway (diagnosis -> tests / treatments -> follow-ups)"""
+        started = time.perf_counter()
+        pathway = self.pathways.pathway(diagnosis_id, context.get('location'), context.get('season'),
+                                        max_depth, max_branch, with_concepts)
+        CDS_STAGES["pathway"].lap(started)
+        return pathway
+    
+    def validate_plan(self, plan: Dict) -> Dict:
+        """Check a treatment plan against the diagnosis's relationships"""
+        started = time.perf_counter()
+        result = self.validator.validate(plan)
+        CDS_STAGES["validate"].lap(started)
+        return result
+    
+    def validate_plans(self, plans: List[Dict]) -> List[Dict]:
+        """Check many treatment plans against one set of rules"""
+        started = time.perf_counter()
+        results = self.validator.validate_many(plans)
+        CDS_STAGES["validate_batch"].lap(started)
+        return results
 
 class FHIRProcessor:
-    def __init__(self):
-        self.search_engine = ConceptSearchEngine()
-        self.cds_engine = ClinicalDecisionEngine()
+    def __init__(self, search_engine: ConceptSearchEngine, cds_engine: ClinicalDecisionEngine,
+                 code_index: CodeMappingIndex):
+        self.search_engine = search_engine
+        self.cds_engine = cds_engine
+        self.code_index = code_index
     
     def process_claim(self, fhir_claim: Dict) -> Dict:
         """Process FHIR claim and return AI analysis"""
         
-        # Map diagnosis codes to concepts
+        started = time.perf_counter()
+        # Map ICD-10 diagnosis codes to concepts (falling back to parent codes)
         mapped_concepts = []
-        for diag_code in fhir_claim.get('diagnosis_codes', []):
-            # Simulate ICD-10 to concept mapping
-            if diag_code == 'A90':  # Dengue fever
-                mapped_concepts.append({'concept_id': 1, 'code': diag_code, 'confidence': 0.95})
+        diagnosis_codes = fhir_claim.get('diagnosis_codes', [])
+        mappings = self.code_index.lookup_many(('ICD-10', diag_code) for diag_code in diagnosis_codes)
+        for diag_code, mapping in zip(diagnosis_codes, mappings):
+            if mapping:
+                mapped_concepts.append({'concept_id': mapping.concept_id, 'code': diag_code,
+                                        'confidence': mapping.mapping_confidence})
+        t = FHIR_STAGES["code_mapping"].lap(started)
         
         # Get AI recommendations for primary diagnosis
         recommendations = []
@@ -199,6 +383,8 @@ class FHIRProcessor:
             primary_diagnosis = mapped_concepts[0]['concept_id']
             context = {'location': 'Jakarta', 'season': 'WET'}  # Simulated context
             recommendations = self.cds_engine.get_recommendations(primary_diagnosis, context)
+        FHIR_STAGES["recommendations"].lap(t)
+        FHIR_STAGES["total"].lap(started)
         
         return {
             'claim_id': fhir_claim.get('id'),
@@ -207,85 +393,572 @@ class FHIRProcessor:
             'processing_status': 'ANALYZED',
             'confidence_score': 0.92
         }
+    
+    def process_claims(self, fhir_claims: List[Dict]) -> List[Dict]:
+        """Process a batch of claims; a failing claim yields an ERROR result instead of aborting"""
+        results = []
+        for fhir_claim in fhir_claims:
+            try:
+                results.append(self.process_claim(fhir_claim))
+            except Exception as exc:
+                results.append({'claim_id': fhir_claim.get('id'), 'processing_status': 'ERROR', 'error': str(exc)})
+        return results
 
 # ===================================================================
 # INITIALIZE SERVICES
 # ===================================================================
 
-search_engine = ConceptSearchEngine()
-cds_engine = ClinicalDecisionEngine()
-fhir_processor = FHIRProcessor()
+# Lexicon database (postgresql://... or sqlite:///path.db); unset serves the sample data
+DATABASE_URL = os.environ.get("DATABASE_URL")
+repository: Optional[LexiconRepository] = None  # opened in lifespan
+
+# Prebuilt search index artifact (python index_artifact.py build ...) or fit at startup
+SEARCH_INDEX_PATH = os.environ.get("SEARCH_INDEX_PATH")
+
+# Compiled mapping table (python code_mapping.py build ...) or the sample rows
+CODE_MAPPING_PATH = os.environ.get("CODE_MAPPING_PATH")
+code_index = (CodeMappingIndex.open(CODE_MAPPING_PATH) if CODE_MAPPING_PATH
+              else CodeMappingIndex.from_records(SAMPLE_CODE_MAPPINGS))
+
+def build_snapshot(version: int, concepts: List[Dict], relationships: Dict[int, List[Dict]],
+                   previous: Optional[LexiconSnapshot] = None) -> LexiconSnapshot:
+    """Build one lexicon generation, reusing whatever `previous` has that did not change"""
+    # One shared copy of the lexicon; every engine and endpoint of the generation reads from it
+    store = ConceptStore(concepts)
+    relationships = dict(relationships)  # The generation owns its mapping; the caller's may change later
+    fingerprint = lexicon_fingerprint(store.records, CONCEPT_POPULARITY)
+    if previous is None:
+        search = ConceptSearchEngine(store, SEARCH_INDEX_PATH)
+        cds = ClinicalDecisionEngine(store, relationships)
+        concept_json = ConceptJSON(store)
+        changes, rebuilt = None, ("search", "cds", "concept json")
+    else:
+        changes = diff_lexicon(previous.store, previous.relationships, store, relationships)
+        rebuilt = ()
+        if fingerprint == previous.fingerprint:
+            # Same search texts in the same row order: the built indexes still apply
+            search = ConceptSearchEngine(store, indexes=previous.search_engine.indexes)
+        else:
+            search = ConceptSearchEngine(store)
+            rebuilt += ("search",)
+        # Unchanged concepts keep their encoded payloads
+        concept_json = ConceptJSON(store, previous.concept_json, changes.concepts)
+        if changes.concepts:
+            rebuilt += (f"concept json ({len(changes.concepts)} concepts)",)
+        # Only diagnoses whose relationships or target concepts changed are recomputed
+        tables = previous.cds_engine.score_tables.updated(store, relationships, changes.diagnoses)
+        # The pathway graph holds no concept data: it only changes with the relationships
+        graph = previous.cds_engine.pathways.graph
+        if any(relationships.get(d) != previous.relationships.get(d) for d in changes.diagnoses):
+            graph = None
+            rebuilt += ("pathway graph",)
+        validator = previous.cds_engine.validator.updated(store, relationships, changes.diagnoses)
+        cds = ClinicalDecisionEngine(store, relationships, score_tables=tables, pathway_graph=graph,
+                                     validator=validator)
+        if changes.diagnoses:
+            rebuilt += (f"cds ({len(changes.diagnoses)} diagnoses)",)
+    return LexiconSnapshot(version, store, relationships, search, cds,
+                           FHIRProcessor(search, cds, code_index), changes, rebuilt, fingerprint, concept_json)
+
+MAX_BATCH_QUERIES = 1000
+# Autocomplete answers from the top-k lists precomputed for short prefixes
+MAX_AUTOCOMPLETE_LIMIT = PREFIX_PRECOMPUTE_K
+MAX_BATCH_PLANS = 10000
+
+# CPU-bound engine calls run inline, in threads or in processes (EXECUTOR_MODE)
+engine_executor = EngineExecutor.from_env()
+
+# Repeated searches / (diagnosis, location, season) lookups skip the engines
+# entirely (CACHE_SIZE, CACHE_TTL, CACHE_POLICY); cached results are shared
+search_cache = ResultCache.from_env()
+recommendation_cache = ResultCache.from_env()
+
+def invalidate_result_caches(diagnosis_id: Optional[int] = None) -> Dict[str, int]:
+    """Drop cached results after concepts (all) or relationships (one diagnosis) are reloaded"""
+    if diagnosis_id is not None:
+        return {"recommendations": recommendation_cache.invalidate(lambda key: key[0] == diagnosis_id)}
+    return {"search": search_cache.invalidate(), "recommendations": recommendation_cache.invalidate()}
+
+def _on_lexicon_swap(old: LexiconSnapshot, new: LexiconSnapshot) -> None:
+    """Drop only the cached results the new generation can change; re-fork process workers"""
+    if new.changes is None or new.changes.concepts:
+        search_cache.invalidate()
+    if new.changes is None:
+        recommendation_cache.invalidate()
+    elif new.changes.diagnoses:
+        recommendation_cache.invalidate(lambda key: key[0] in new.changes.diagnoses)
+    if engine_executor.mode == "processes":
+        engine_executor.recycle()
+
+# The current lexicon generation; reloads build the next one in the background.
+# With DATABASE_URL the first generation is built from the database in lifespan
+# (so a SEARCH_INDEX_PATH artifact is checked against that lexicon), not from the sample data.
+lexicon = SnapshotManager(build_snapshot, *((None, None) if DATABASE_URL else
+                                            (SAMPLE_CONCEPTS, CLINICAL_RELATIONSHIPS)))
+lexicon.listeners.append(_on_lexicon_swap)
+
+# Every diagnosis x location x season risk, precomputed; single predictions are lookups.
+# Rebuild both when the risk tables change.
+MAX_RISK_GRID = 1_000_000
+risk_model = RiskModel(SEASONAL_RISK, LOCATION_RISK_MULTIPLIER)
+risk_grid = risk_model.grid()
+
+# GraphQL schema and validated-document cache (None without graphql-core installed)
+graphql_service = GraphQLService() if graphql is not None else None
+
+# Relationship scores learned from encounter batches, counted incrementally
+relationship_learner = RelationshipLearner(list(LOCATION_RISK_MULTIPLIER))
+learning_lock = asyncio.Lock()
+
+# Hot path instrumentation, scraped from /metrics. Stage timers record in the
+# process that runs the engine: in EXECUTOR_MODE=processes they stay in the
+# workers and only request, executor and cache metrics reach /metrics.
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram("lexicon_stage_seconds", "Engine hot path latency per stage",
+                                  ("engine", "stage"))
+
+def _stages(engine: str, *stages: str) -> Dict[str, HistogramSeries]:
+    return {stage: stage_seconds.labels(engine, stage) for stage in stages}
+
+SEARCH_STAGES = _stages("search", "transform", "similarity", "select", "fuzzy", "total")
+BATCH_SEARCH_STAGES = _stages("search_batch", "transform", "similarity", "fuzzy", "total")
+AUTOCOMPLETE_STAGES = _stages("autocomplete", "prefix")
+CDS_STAGES = _stages("cds", "recommend", "pathway", "validate", "validate_batch")
+FHIR_STAGES = _stages("fhir_claim", "code_mapping", "recommendations", "total")
+
+app.add_middleware(
+    RequestMetricsMiddleware,
+    duration=metrics.histogram("lexicon_http_request_seconds", "HTTP request latency by route",
+                               ("route", "method")),
+    requests=metrics.counter("lexicon_http_requests_total", "HTTP requests by route and status",
+                             ("route", "method", "status")),
+)
+
+def _per_cache(field: str) -> Callable[[], Dict]:
+    caches = {"search": search_cache, "recommendations": recommendation_cache}
+    return lambda: {(name,): cache.stats()[field] for name, cache in caches.items()}
+
+def _index_sizes() -> Dict:
+    """Entries and bytes of each index of the current generation"""
+    engine = lexicon.current.search_engine
+    postings, fuzzy = engine.index.postings, engine.fuzzy_index
+    return {
+        ("tfidf", "entries"): postings.nnz,
+        ("tfidf", "bytes"): postings.data.nbytes + postings.indices.nbytes + postings.indptr.nbytes,
+        ("trigram", "entries"): len(fuzzy.posting_terms),
+        ("trigram", "bytes"): fuzzy.nbytes,
+        ("prefix", "entries"): len(engine.prefix_index.rows),
+        ("prefix", "bytes"): engine.prefix_index.nbytes,
+        ("code_mapping", "entries"): len(code_index),
+        ("code_mapping", "bytes"): code_index.nbytes,
+    }
+
+metrics.gauge("lexicon_executor_in_flight", "Engine calls running", lambda: engine_executor.in_flight)
+metrics.gauge("lexicon_executor_queue_depth", "Engine calls waiting for a worker",
+              lambda: engine_executor.queue_depth)
+metrics.gauge("lexicon_executor_completed_total", "Engine calls completed",
+              lambda: engine_executor.completed, kind="counter")
+metrics.gauge("lexicon_executor_rejected_total", "Engine calls rejected (queue full)",
+              lambda: engine_executor.rejected, kind="counter")
+metrics.gauge("lexicon_cache_hits_total", "Result cache hits", _per_cache("hits"), ("cache",), kind="counter")
+metrics.gauge("lexicon_cache_misses_total", "Result cache misses", _per_cache("misses"), ("cache",), kind="counter")
+metrics.gauge("lexicon_cache_hit_ratio", "Result cache hit rate since start", _per_cache("hit_rate"), ("cache",))
+metrics.gauge("lexicon_cache_entries", "Cached results", _per_cache("size"), ("cache",))
+metrics.gauge("lexicon_concepts", "Concepts in the current lexicon", lambda: len(lexicon.current.store))
+metrics.gauge("lexicon_index_size", "Search and mapping index sizes", _index_sizes, ("index", "unit"))
+metrics.gauge("lexicon_snapshot_version", "Current lexicon generation", lambda: lexicon.current.version)
+metrics.gauge("lexicon_reloads_total", "Lexicon reloads", lambda: lexicon.reloads, kind="counter")
+metrics.gauge("lexicon_reload_failures_total", "Failed lexicon reloads", lambda: lexicon.failures, kind="counter")
+
+def _pinned(snapshot: LexiconSnapshot) -> Optional[LexiconSnapshot]:
+    """Snapshot to hand to a task: in-process workers use the request's own,
+    process workers use the generation they were forked with
+    """
+    return None if engine_executor.mode == "processes" else snapshot
+
+# Module-level task functions so they can be pickled to process workers,
+# which use their own (forked or re-imported) copy of the engines
+# Search results are (concept_id, match_score) pairs; the endpoints splice in
+# the snapshot's pre-encoded concept payloads (ConceptJSON.search_hits)
+def _search_task(query: str, limit: int, fuzzy: bool,
+                 snapshot: Optional[LexiconSnapshot] = None) -> List[Tuple[int, float]]:
+    hits = (snapshot or lexicon.current).search_engine.search_hits(query, limit, fuzzy)
+    return [(hit.concept.concept_id, hit.match_score) for hit in hits]
+
+def _search_many_task(queries: List[str], limit: int, fuzzy: bool,
+                      snapshot: Optional[LexiconSnapshot] = None) -> List[List[Tuple[int, float]]]:
+    per_query = (snapshot or lexicon.current).search_engine.search_hits_many(queries, limit, fuzzy)
+    return [[(hit.concept.concept_id, hit.match_score) for hit in hits] for hits in per_query]
+
+def _recommendations_task(diagnosis_id: int, context: Dict,
+                          snapshot: Optional[LexiconSnapshot] = None) -> List[Dict]:
+    return (snapshot or lexicon.current).cds_engine.get_recommendations(diagnosis_id, context)
+
+def _pathway_task(diagnosis_id: int, context: Dict, max_depth: int, max_branch: int, with_concepts: bool = True,
+                  snapshot: Optional[LexiconSnapshot] = None) -> Optional[Dict]:
+    return (snapshot or lexicon.current).cds_engine.get_pathway(diagnosis_id, context, max_depth, max_branch,
+                                                                with_concepts)
+
+def _validate_task(plan: Dict, snapshot: Optional[LexiconSnapshot] = None) -> Dict:
+    return (snapshot or lexicon.current).cds_engine.validate_plan(plan)
+
+def _validate_many_task(plans: List[Dict], snapshot: Optional[LexiconSnapshot] = None) -> List[Dict]:
+    return (snapshot or lexicon.current).cds_engine.validate_plans(plans)
+
+def _fhir_claim_task(claim: Dict, snapshot: Optional[LexiconSnapshot] = None) -> Dict:
+    return (snapshot or lexicon.current).fhir_processor.process_claim(claim)
+
+def _fhir_claims_batch_task(claims: List[Dict], snapshot: Optional[LexiconSnapshot] = None) -> List[Dict]:
+    return (snapshot or lexicon.current).fhir_processor.process_claims(claims)
+
+async def _cached_recommendations(snapshot: LexiconSnapshot, diagnosis_id: int, context: Dict) -> List[Dict]:
+    """Recommendations from the result cache, or the engine (cached while `snapshot` is current)"""
+    key = (diagnosis_id, context.get('location') or '', context.get('season') or '')
+    recommendations = recommendation_cache.get(key)
+    if recommendations is None:
+        recommendations = await engine_executor.run(_recommendations_task, diagnosis_id, context,
+                                                    _pinned(snapshot))
+        if lexicon.current is snapshot:
+            recommendation_cache.put(key, recommendations)
+    return recommendations
+
+def _graphql_context(snapshot: LexiconSnapshot) -> GraphQLContext:
+    """Resolver context for one GraphQL request, pinned to the snapshot it started on"""
+    async def pathway(diagnosis_id: int, context: Dict, max_depth: int, max_branch: int) -> Optional[Dict]:
+        return await engine_executor.run(_pathway_task, diagnosis_id, context, max_depth, max_branch, False,
+                                         _pinned(snapshot))
+    
+    async def recommendations(diagnosis_id: int, context: Dict) -> List[Dict]:
+        return await _cached_recommendations(snapshot, diagnosis_id, context)
+    
+    return GraphQLContext(snapshot.store, code_index, pathway, recommendations)
+
+def _mapping_payload(mapping: Optional[CodeMapping], store: ConceptStore) -> Optional[Dict]:
+    """ConceptMapping response for a code mapping (None if unmapped or unknown concept)"""
+    concept = store.get(mapping.concept_id) if mapping else None
+    if not concept:
+        return None
+    return {
+        "concept": concept.to_dict(),
+        "mapping_confidence": mapping.mapping_confidence,
+        "coding_system": mapping.coding_system,
+        "requested_code": mapping.requested_code,
+        "matched_code": mapping.matched_code,
+        "code_description": mapping.code_description,
+        "match_type": mapping.match_type
+    }
 
 # ===================================================================
 # API ENDPOINTS
 # ===================================================================
 
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    """Shed load instead of queueing without bound"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
 @app.get("/")
 async def root():
     return {"message": "Lexicon AI Service POC", "version": "1.0.0"}
 
 @app.get("/api/v1/concepts/search")
-async def search_concepts(q: str, limit: int = 10):
+async def search_concepts(q: str, limit: int = 10, fuzzy: bool = True):
     """Search medical concepts with fuzzy matching"""
-    results = search_engine.search(q, limit)
-    return {"query": q, "results": results, "total": len(results)}
+    snapshot = lexicon.current
+    key = (q, limit, fuzzy)
+    results = search_cache.get(key)
+    if results is None:
+        results = await engine_executor.run(_search_task, q, limit, fuzzy, _pinned(snapshot))
+        if lexicon.current is snapshot:  # A result of a replaced generation is not cached
+            search_cache.put(key, results)
+    # Prebuilt body: no jsonable_encoder pass over the concept payloads
+    return JSONBytesResponse(encode({"query": q, "results": snapshot.concept_json.search_hits(results),
+                                     "total": len(results)}))
+
+@app.post("/api/v1/concepts/search/batch")
+async def search_concepts_batch(request: BatchSearchRequest):
+    """Resolve many free-text terms (e.g. all terms of one claim) in one call"""
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    
+    snapshot = lexicon.current
+    keys = [(q, request.limit, request.fuzzy) for q in request.queries]
+    batches = [search_cache.get(key) for key in keys]
+    misses = [i for i, results in enumerate(batches) if results is None]
+    if misses:
+        # Only uncached queries go through the vectorized batch pass
+        computed = await engine_executor.run(_search_many_task, [request.queries[i] for i in misses],
+                                             request.limit, request.fuzzy, _pinned(snapshot))
+        for i, results in zip(misses, computed):
+            batches[i] = results
+            if lexicon.current is snapshot:
+                search_cache.put(keys[i], results)
+    concept_json = snapshot.concept_json
+    return JSONBytesResponse(encode({
+        "results": [{"query": q, "results": concept_json.search_hits(r), "total": len(r)}
+                    for q, r in zip(request.queries, batches)],
+        "total_queries": len(request.queries)
+    }))
+
+@app.get("/api/v1/concepts")
+async def list_concepts(concept_type: Optional[str] = Query(None, alias="type"),
+                        code: Optional[str] = None, limit: int = 20, offset: int = 0):
+    """List concepts filtered by concept type or human-readable code"""
+    store = lexicon.current.store
+    if code is not None:
+        record = store.get_by_code(code)
+        records = [record] if record and concept_type in (None, record.concept_type) else []
+    elif concept_type is not None:
+        records = store.by_type(concept_type)
+    else:
+        records = store.records
+    
+    page = records[offset:offset + limit]
+    return {"data": [r.to_dict() for r in page], "total": len(records), "limit": limit, "offset": offset}
+
+@app.get("/api/v1/concepts/autocomplete")
+async def autocomplete_concepts(q: str, limit: int = Query(10, ge=1, le=MAX_AUTOCOMPLETE_LIMIT)):
+    """Prefix autocomplete for claim entry (per keystroke)
+    
+    `limit` is 1..MAX_AUTOCOMPLETE_LIMIT (422 otherwise), the top-k length
+    precomputed for short prefixes, so every keystroke is answered from a
+    materialized list.
+    """
+    results = lexicon.current.search_engine.autocomplete(q, limit)
+    return {"prefix": q, "results": results, "total": len(results)}
 
 @app.get("/api/v1/concepts/{concept_id}")
 async def get_concept(concept_id: int):
     """Get concept details"""
-    concept = next((c for c in SAMPLE_CONCEPTS if c['concept_id'] == concept_id), None)
-    if not concept:
+    concept = lexicon.current.concept_json.concept(concept_id)
+    if concept is None:
         raise HTTPException(status_code=404, detail="Concept not found")
-    return concept
+    return JSONBytesResponse(concept)
 
 @app.post("/api/v1/cds/recommendations")
 async def get_clinical_recommendations(request: ClinicalRequest):
     """Get AI-powered clinical recommendations"""
-    recommendations = cds_engine.get_recommendations(request.diagnosis_id, request.context)
+    snapshot = lexicon.current
+    recommendations = await _cached_recommendations(snapshot, request.diagnosis_id, request.context)
     
-    diagnosis_concept = next((c for c in SAMPLE_CONCEPTS if c['concept_id'] == request.diagnosis_id), None)
+    concept_json = snapshot.concept_json
     
-    return {
-        "diagnosis": diagnosis_concept,
-        "recommendations": recommendations,
-        "context": request.context,
+    return JSONBytesResponse(encode({
+        "diagnosis": concept_json.concept(request.diagnosis_id),
+        # One encoder pass: the concept dicts are shared from the score tables already
+        "recommendations": RawJSON(dumps(recommendations)),
+        "context": RawJSON(dumps(request.context)),
         "total_recommendations": len(recommendations)
-    }
+    }))
+
+@app.get("/api/v1/cds/pathway/{diagnosis_id}")
+async def get_clinical_pathway(diagnosis_id: int, location: Optional[str] = None, season: Optional[str] = None,
+                               max_depth: int = 2, max_branch: int = 5):
+    """Clinical pathway: tests and treatments several relationship hops deep, best first in context"""
+    error = pathway_limits_error(max_depth, max_branch)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    context = {"location": location, "season": season}
+    pathway = await engine_executor.run(_pathway_task, diagnosis_id, context, max_depth, max_branch, True,
+                                        _pinned(lexicon.current))
+    if pathway is None:
+        raise HTTPException(status_code=404, detail="Diagnosis not found")
+    return pathway
+
+@app.post("/api/v1/cds/validate")
+async def validate_treatment_plan(plan: TreatmentPlan):
+    """Validate a treatment plan: contraindicated, unknown or unindicated items and missing expected care"""
+    return await engine_executor.run(_validate_task, plan.dict(), _pinned(lexicon.current))
+
+@app.post("/api/v1/cds/validate/batch")
+async def validate_treatment_plans(request: ValidationBatchRequest):
+    """Validate many treatment plans (e.g. a claims run) in one pass; results keep request order"""
+    if len(request.plans) > MAX_BATCH_PLANS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_PLANS} plans per batch")
+    results = await engine_executor.run(_validate_many_task, [plan.dict() for plan in request.plans],
+                                        _pinned(lexicon.current))
+    return {"results": results, "total": len(results), "invalid": sum(not r["is_valid"] for r in results)}
+
+@app.post("/api/v1/graphql")
+async def graphql_endpoint(request: GraphQLRequest):
+    """GraphQL queries (getClinicalPathway, getRecommendations, concepts) with batched concept resolution
+    
+    Queries deeper than MAX_QUERY_DEPTH or costlier than MAX_QUERY_COST are
+    rejected with 400 before they run.
+    """
+    if graphql_service is None:
+        raise HTTPException(status_code=501, detail="graphql-core is required for /api/v1/graphql")
+    status, payload = await graphql_service.execute(request.query, request.variables, request.operationName,
+                                                    _graphql_context(lexicon.current))
+    return JSONResponse(payload, status_code=status)
 
 @app.post("/api/v1/fhir/claims")
 async def process_fhir_claim(claim: FHIRClaim):
     """Process FHIR claim with AI analysis"""
-    result = fhir_processor.process_claim(claim.dict())
-    return result
+    result = await engine_executor.run(_fhir_claim_task, claim.dict(), _pinned(lexicon.current))
+    # The result is plain dicts already: one encoder pass, no jsonable_encoder walk
+    return JSONBytesResponse(dumps(result))
 
-@app.get("/api/v1/ml/predict")
-async def ml_prediction_demo(diagnosis: str = "DBD", location: str = "Manado"):
-    """Demo ML prediction for Indonesian healthcare context"""
+@app.post("/api/v1/fhir/claims/bulk")
+async def process_fhir_claims_bulk(request: Request, batch_size: int = 256):
+    """Bulk claim processing: NDJSON (streamed) or FHIR Bundle in, NDJSON out
     
-    # Simulate ML model prediction
-    seasonal_risk = {
-        "DBD": {"WET": 0.85, "DRY": 0.25},
-        "ISPA": {"WET": 0.45, "DRY": 0.70}
-    }
+    NDJSON bodies are spooled (bounded memory) and parsed incrementally;
+    results stream back per batch and end with a summary line reporting
+    claims per second.
+    """
+    batch_size = max(1, min(batch_size, 4096))
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    
+    if content_type in NDJSON_MEDIA_TYPES:
+        claims = iter_ndjson_claims(iter_file_chunks(await spool_body(request.stream())))
+    else:
+        # A Bundle is a single JSON document and has to be parsed whole
+        try:
+            document = json.loads(await request.body())
+            claims = iterate(list(claims_from_bundle(document)))
+        except (ValueError, TypeError, AttributeError):
+            raise HTTPException(status_code=400, detail="Body must be a FHIR Bundle/Claim or NDJSON")
+    
+    # A long backfill stays on the generation it started with
+    snapshot = _pinned(lexicon.current)
+    
+    async def process_batch(batch: List[Dict]) -> List[Dict]:
+        return await engine_executor.run(_fhir_claims_batch_task, batch, snapshot)
     
-    location_multiplier = {"Manado": 1.2, "Jakarta": 1.0, "Surabaya": 0.9}
+    return StreamingResponse(stream_results(claims, process_batch, batch_size),
+                             media_type="application/x-ndjson")
+
+@app.post("/api/v1/mapping/batch")
+async def map_external_codes_batch(request: BatchMappingRequest):
+    """Map many external codes in one lookup pass; results keep request order (null = unmapped)"""
+    if len(request.codes) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_QUERIES} codes per batch")
+    
+    store = lexicon.current.store
+    mappings = code_index.lookup_many((ref.system, ref.code) for ref in request.codes)
+    results = [_mapping_payload(mapping, store) for mapping in mappings]
+    return {"results": results, "total": len(results), "mapped": sum(r is not None for r in results)}
+
+@app.get("/api/v1/mapping/{system}/{code}")
+async def map_external_code(system: str, code: str):
+    """Map an external code (ICD-10, ICD-9-CM, SNOMED CT, ...) to a concept"""
+    payload = _mapping_payload(code_index.lookup(system, code), lexicon.current.store)
+    if payload is None:
+        raise HTTPException(status_code=404, detail=f"No mapping for {system} {code}")
+    return payload
+
+@app.post("/api/v1/admin/cache/invalidate")
+async def invalidate_cache(diagnosis_id: Optional[int] = None):
+    """Explicit invalidation after an out-of-band concept or relationship reload"""
+    return {"invalidated": invalidate_result_caches(diagnosis_id)}
+
+@app.post("/api/v1/admin/lexicon/reload")
+async def reload_lexicon(request: LexiconReloadRequest):
+    """Build the next lexicon snapshot in the background and swap it in atomically
+    
+    Requests keep being served from the current snapshot while the next one
+    builds; only indexes and cached results affected by the change are rebuilt.
+    An empty body re-reads the lexicon from DATABASE_URL when one is configured.
+    """
+    current = lexicon.current
+    if request.concepts is None and request.relationships is None and repository is not None:
+        # Nothing posted: re-read the lexicon from the database
+        concepts, relationships = await repository.load_lexicon()
+    else:
+        concepts = ([c.dict() for c in request.concepts] if request.concepts is not None
+                    else list(current.store))
+        relationships = request.relationships if request.relationships is not None else current.relationships
+    try:
+        snapshot = await lexicon.reload(concepts, relationships)
+    except SnapshotBusy as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    except (KeyError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid lexicon: {exc}")
+    return {"previous_version": current.version, **snapshot.stats()}
+
+@app.post("/api/v1/admin/relationships/learn")
+async def learn_relationships(request: LearnRelationshipsRequest):
+    """Count a batch of encounters into the learned relationship scores and rescore the diagnoses it touched
     
-    base_risk = seasonal_risk.get(diagnosis, {"WET": 0.5, "DRY": 0.5})["WET"]  # Assume wet season
-    adjusted_risk = base_risk * location_multiplier.get(location, 1.0)
-    adjusted_risk = min(adjusted_risk, 1.0)
+    With `apply`, the rescored diagnoses replace their relationships in the
+    next lexicon snapshot; other diagnoses keep their current ones.
+    """
+    async with learning_lock:
+        try:
+            batch = relationship_learner.batch_from_encounters(e.dict() for e in request.encounters)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        changed = await asyncio.to_thread(relationship_learner.add_batch, batch)
+        learned = await asyncio.to_thread(relationship_learner.relationships, changed)
+    
+    payload = {"learning": relationship_learner.stats(), "rescored_diagnoses": sorted(changed),
+               "relationships": learned}
+    if request.apply and learned:
+        current = lexicon.current
+        try:
+            # Contraindications are curated, not learned: keep them alongside the rescored
+            # relationships, and drop learned edges to a concept contraindicated for the diagnosis
+            merged = {}
+            for d, rels in learned.items():
+                curated = [rel for rel in current.relationships.get(d, ()) if rel['type'] in CONTRAINDICATION_TYPES]
+                contraindicated = {rel['target_id'] for rel in curated}
+                merged[d] = [rel for rel in rels if rel['target_id'] not in contraindicated] + curated
+            snapshot = await lexicon.reload(list(current.store), {**current.relationships, **merged})
+        except SnapshotBusy as exc:
+            raise HTTPException(status_code=409, detail=str(exc))
+        except (KeyError, ValueError) as exc:
+            raise HTTPException(status_code=400, detail=f"Invalid lexicon: {exc}")
+        payload["lexicon"] = {"previous_version": current.version, **snapshot.stats()}
+    return payload
+
+@app.get("/api/v1/ml/predict")
+async def ml_prediction_demo(diagnosis: str = "DBD", location: str = "Manado", season: str = "WET"):
+    """Demo ML prediction for Indonesian healthcare context"""
+    
+    # Served from the precomputed grid; names outside it are scored on the fly
+    prediction = risk_grid.get(diagnosis, location, season)
+    if prediction is None:
+        try:
+            prediction = risk_model.predict(diagnosis, location, season)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    adjusted_risk, category = prediction
     
     return {
         "diagnosis": diagnosis,
         "location": location,
-        "season": "WET",
+        "season": season,
         "risk_score": adjusted_risk,
-        "risk_category": "HIGH" if adjusted_risk > 0.7 else "MEDIUM" if adjusted_risk > 0.4 else "LOW",
+        "risk_category": category,
         "recommendations": [
             "Tingkatkan monitoring trombosit" if diagnosis == "DBD" else "Perhatikan gejala pernapasan",
             f"Waspada peningkatan kasus di {location}"
         ]
     }
 
+@app.post("/api/v1/ml/predict/batch")
+async def ml_prediction_batch(request: RiskBatchRequest):
+    """Risk for every diagnosis x location x season combination requested, scored as one array operation"""
+    if request.diagnoses is None and request.locations is None and request.seasons is None:
+        grid = risk_grid
+    else:
+        sizes = [len(axis) if axis is not None else default for axis, default in (
+            (request.diagnoses, len(risk_model.diagnoses)), (request.locations, len(risk_model.locations)),
+            (request.seasons, len(risk_model.seasons)))]
+        if sizes[0] * sizes[1] * sizes[2] > MAX_RISK_GRID:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_RISK_GRID} combinations per batch")
+        try:
+            grid = risk_model.grid(request.diagnoses, request.locations, request.seasons)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    return grid.to_dict(records=request.records)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Per-stage latency histograms, request counts, cache, executor and index gauges (Prometheus text format)"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
 @app.get("/api/v1/health")
 async def health_check():
     """Health check endpoint"""
@@ -297,9 +970,20 @@ async def health_check():
             "fhir_processor": "operational",
             "ml_predictions": "operational"
         },
+        "executor": engine_executor.stats(),
+        "cache": {
+            "search": search_cache.stats(),
+            "recommendations": recommendation_cache.stats()
+        },
+        "lexicon": lexicon.stats(),
+        "relationship_learning": relationship_learner.stats(),
+        "graphql": graphql_service.stats() if graphql_service is not None else "graphql-core not installed",
         "data": {
-            "total_concepts": len(SAMPLE_CONCEPTS),
-            "clinical_relationships": len(CLINICAL_RELATIONSHIPS)
+            "total_concepts": len(lexicon.current.store),
+            "code_mappings": len(code_index),
+            "search_index": SEARCH_INDEX_PATH or "built at startup",
+            "storage": database_backend(DATABASE_URL),
+            "clinical_relationships": len(lexicon.current.relationships)
         }
     }
 
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Lightweight metrics for the Lexicon AI Service POC
+Counters, fixed-bucket histograms and scrape-time gauges rendered in the
+Prometheus text exposition format. Recording is a bisect and two additions
+on preallocated series, cheap enough to leave on in the hot paths.
+"""
+
+import bisect
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; 50us (a cached lookup) up to 10s (a large bulk batch)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Scrape-time value: a number, or {label values: number} for labelled gauges
+GaugeValue = Union[float, Dict[Tuple[str, ...], float]]
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class HistogramSeries:
+    """One label combination of a histogram
+
+    Updates are unlocked: with engine threads, two observations racing on
+    the same bucket can rarely lose one count, which is fine for latency
+    distributions and keeps the hot path free of lock traffic.
+    """
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def lap(self, since: float) -> float:
+        """Observe the time since `since` (a perf_counter value) and return now, for the next stage"""
+        now = time.perf_counter()
+        self.observe(now - since)
+        return now
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class CounterSeries:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterable[str]:
+        """Exposition lines of every series"""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class _RecordedMetric(_Metric):
+    """Metric whose series are updated by the service as it runs"""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        """The series for these label values, created on first use (bind it once, outside hot loops)"""
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            series = self._series.setdefault(values, self._new_series())
+        return series
+
+    @abstractmethod
+    def _new_series(self):
+        """A zeroed series for one label combination"""
+
+
+class Histogram(_RecordedMetric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self) -> HistogramSeries:
+        return HistogramSeries(self.buckets)
+
+    def samples(self) -> Iterable[str]:
+        for values, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), list(series.counts)):
+                cumulative += count
+                le = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {series.sum!r}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Counter(_RecordedMetric):
+    kind = "counter"
+
+    def _new_series(self) -> CounterSeries:
+        return CounterSeries()
+
+    def samples(self) -> Iterable[str]:
+        for values, series in sorted(self._series.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(series.value)}"
+
+
+class Gauge(_Metric):
+    """Value read from the service at scrape time (cache sizes, queue depths, index sizes)
+
+    There are no series to record into (no `labels`): `read` returns the
+    value, or {label values: value} for every series at once.
+    """
+
+    def __init__(self, name: str, help: str, read: Callable[[], GaugeValue],
+                 labelnames: Tuple[str, ...] = (), kind: str = "gauge"):
+        super().__init__(name, help, labelnames)
+        self.read = read
+        self.kind = kind  # "counter" for running totals kept by other components
+
+    def samples(self) -> Iterable[str]:
+        value = self.read()
+        values = value if isinstance(value, dict) else {(): value}
+        for labels, number in sorted(values.items()):
+            if number is not None:
+                yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(number)}"
+
+
+class MetricsRegistry:
+    """All metrics of one process, rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, read: Callable[[], GaugeValue],
+              labelnames: Tuple[str, ...] = (), kind: str = "gauge") -> Gauge:
+        return self._register(Gauge(name, help, read, labelnames, kind))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route template, method and status
+
+    Timing runs until the last body chunk is sent, so streamed responses
+    (bulk NDJSON) are measured in full.
+    """
+
+    def __init__(self, app, duration: Histogram, requests: Counter):
+        self.app = app
+        self.duration = duration
+        self.requests = requests
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Route templates keep label cardinality bounded (/concepts/{concept_id}, not each id)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            self.duration.labels(path, scope["method"]).observe(time.perf_counter() - started)
+            self.requests.labels(path, scope["method"], str(status[0])).inc()
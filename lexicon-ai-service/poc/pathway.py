@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Clinical pathway engine over a CSR relationship graph
+xaie_concept_relationships as compressed sparse row adjacency: each source
+concept owns a contiguous slice of target / relationship type / priority
+arrays, best base priority first, and context boosts are sorted
+(edge, boost) arrays per context key. A pathway is a bounded-depth walk
+from a diagnosis that takes the highest context priorities first at every
+step (diagnosis -> tests / treatments -> their follow-ups). Expanded
+(concept, context, remaining depth) subtrees are memoized, so subpaths
+shared between diagnoses and requests are walked once.
+"""
+
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from cds_tables import (CONTRAINDICATION_TYPES, DEFAULT_REASONING, REASONING_TEMPLATES,
+                        RECOMMENDATION_CONFIDENCE, context_note, recommended_relationships)
+from concept_store import ConceptStore
+from result_cache import ResultCache
+
+DEFAULT_DEPTH = 2
+DEFAULT_BRANCH = 5
+MAX_PATHWAY_DEPTH = 10      # hard depth bound, checked before anything else
+MAX_PATHWAY_STEPS = 10000  # branch ** depth bound per request
+MEMO_SIZE = 100000
+
+def pathway_limits_error(max_depth: int, max_branch: int, depth_name: str = "max_depth",
+                         branch_name: str = "max_branch") -> Optional[str]:
+    """Why a (max_depth, max_branch) request is refused, or None if it is within bounds
+
+    Depth is bounded first so the branch ** depth check never computes a
+    huge power, and a branch of 1 cannot ask for an arbitrarily deep walk.
+    """
+    if not 1 <= max_depth <= MAX_PATHWAY_DEPTH or not 1 <= max_branch <= MAX_PATHWAY_STEPS \
+            or max_branch ** max_depth > MAX_PATHWAY_STEPS:
+        return (f"{depth_name} must be 1..{MAX_PATHWAY_DEPTH}, {branch_name} positive and "
+                f"{branch_name} ** {depth_name} at most {MAX_PATHWAY_STEPS}")
+    return None
+
+
+# Pathway sections per relationship type; other types are listed under "related"
+PATHWAY_SECTIONS = {"HAS_DIAGNOSTIC_TEST": "diagnostic_tests", "HAS_TREATMENT": "treatments"}
+
+# Season names in the contextual insight text
+SEASON_NAMES = {"WET": "hujan", "DRY": "kemarau"}
+
+# How an edge's context priority came about
+NOT_BOOSTED, SEASON_BOOST, LOCATION_SEASON_BOOST = 0, 1, 2
+
+_NO_BOOSTS = (np.zeros(0, dtype=np.int64), np.zeros(0))
+
+
+class PathStep(NamedTuple):
+    """One edge taken from a concept, with the subtree below its target"""
+    concept_id: int
+    type: int
+    priority: float
+    boosted: int
+    children: Tuple['PathStep', ...]
+
+
+class PathwayGraph:
+    """Typed, weighted relationship graph in CSR form
+
+    Nodes are concept ids, sorted (`nodes`); the edges of node i are
+    `indptr[i]:indptr[i + 1]` into `targets` (node indexes), `types`
+    (indexes into `type_names`) and `priority`, best first with ties in
+    input order. `boosts[key]` holds the edges boosted under a context key
+    ("<location>_<season>" or "<season>") and their boosts, sorted by edge.
+    Contraindications are not edges; `contraindications[concept_id]` holds
+    the concept ids contraindicated for it. Immutable once built, so
+    snapshots with the same relationships share it.
+    """
+
+    def __init__(self, nodes: np.ndarray, indptr: np.ndarray, targets: np.ndarray, types: np.ndarray,
+                 priority: np.ndarray, type_names: List[str], boosts: Dict[str, Tuple[np.ndarray, np.ndarray]],
+                 contraindications: Optional[Dict[int, FrozenSet[int]]] = None):
+        self.nodes = nodes
+        self.indptr = indptr
+        self.targets = targets
+        self.types = types
+        self.priority = priority
+        self.type_names = type_names
+        self.boosts = boosts
+        self.contraindications = contraindications or {}
+
+    @classmethod
+    def from_arrays(cls, sources: np.ndarray, targets: np.ndarray, types: np.ndarray, priority: np.ndarray,
+                    type_names: List[str], boosts: Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]] = None,
+                    contraindications: Optional[Dict[int, FrozenSet[int]]] = None) -> 'PathwayGraph':
+        """Graph from parallel edge arrays; `boosts` index edges by their input position"""
+        sources = np.asarray(sources, dtype=np.int64)
+        priority = np.asarray(priority, dtype=np.float64)
+        nodes, inverse = np.unique(np.concatenate((sources, np.asarray(targets, dtype=np.int64))),
+                                   return_inverse=True)
+        src, dst = inverse[:len(sources)], inverse[len(sources):]
+
+        # Grouped by source, best priority first; lexsort is stable, so ties keep input order
+        order = np.lexsort((-priority, src))
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(nodes)), out=indptr[1:])
+        position = np.empty(len(order), dtype=np.int64)
+        position[order] = np.arange(len(order))
+
+        csr_boosts = {}
+        for key, (edges, values) in (boosts or {}).items():
+            edges = position[np.asarray(edges, dtype=np.int64)]
+            by_edge = np.argsort(edges, kind='stable')
+            csr_boosts[key] = (edges[by_edge], np.asarray(values, dtype=np.float64)[by_edge])
+        type_dtype = np.uint8 if len(type_names) <= 2 ** 8 else np.int32
+        return cls(nodes, indptr, dst[order].astype(np.int32), np.asarray(types)[order].astype(type_dtype),
+                   priority[order], list(type_names), csr_boosts, contraindications)
+
+    @classmethod
+    def from_relationships(cls, relationships: Dict[int, List[Dict]]) -> 'PathwayGraph':
+        """Graph from CLINICAL_RELATIONSHIPS-shaped data (any concept may be a source)"""
+        sources, targets, types, priority = [], [], [], []
+        type_index: Dict[str, int] = {}
+        boosts: Dict[str, Tuple[List[int], List[float]]] = {}
+        contraindications: Dict[int, FrozenSet[int]] = {}
+        for source_id, rels in relationships.items():
+            contraindicated = frozenset(rel['target_id'] for rel in rels if rel['type'] in CONTRAINDICATION_TYPES)
+            if contraindicated:
+                contraindications[source_id] = contraindicated
+            for rel in recommended_relationships(rels):
+                for key, boost in rel.get('context_boost', {}).items():
+                    edges, values = boosts.setdefault(key, ([], []))
+                    edges.append(len(targets))
+                    values.append(boost)
+                sources.append(source_id)
+                targets.append(rel['target_id'])
+                types.append(type_index.setdefault(rel['type'], len(type_index)))
+                priority.append(rel['priority'])
+        return cls.from_arrays(np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64),
+                               np.array(types, dtype=np.int32), np.array(priority, dtype=np.float64),
+                               list(type_index), boosts, contraindications)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.targets)
+
+    @property
+    def nbytes(self) -> int:
+        return (sum(a.nbytes for a in (self.nodes, self.indptr, self.targets, self.types, self.priority))
+                + sum(edges.nbytes + values.nbytes for edges, values in self.boosts.values()))
+
+    def index(self, concept_id: int) -> Optional[int]:
+        """Node index of a concept id, or None if it has no relationships"""
+        i = int(np.searchsorted(self.nodes, concept_id))
+        return i if i < len(self.nodes) and self.nodes[i] == concept_id else None
+
+    def context(self, location: Optional[str], season: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        """(location, season) reduced to what the boosts can tell apart, for sharing memo entries"""
+        if season is None:
+            return None, None
+        if location is not None and f"{location}_{season}" not in self.boosts:
+            location = None
+        if location is None and season not in self.boosts:
+            season = None
+        return location, season
+
+    def edge_priorities(self, node: int, location: Optional[str],
+                        season: Optional[str]) -> Tuple[int, np.ndarray, Optional[np.ndarray]]:
+        """First edge of `node`, the context priority of each of its edges and how it was boosted
+
+        Same rule as cds_tables.context_priority: a "<location>_<season>"
+        boost takes precedence over a season boost, and scores cap at 1.0.
+        The boost kinds are None when no edge of the node is boosted in this
+        context; the priorities are then the stored ones, already in order.
+        """
+        start, end = int(self.indptr[node]), int(self.indptr[node + 1])
+        priority, boosted = self.priority[start:end], None
+        if season is None:
+            return start, priority, None
+        keys = [(season, SEASON_BOOST)]
+        if location is not None:
+            keys.append((f"{location}_{season}", LOCATION_SEASON_BOOST))
+        for key, kind in keys:
+            entry = self.boosts.get(key)
+            if entry is None:
+                continue
+            edges, values = entry
+            lo, hi = edges.searchsorted(start), edges.searchsorted(end)
+            if lo == hi:
+                continue
+            if boosted is None:
+                priority, boosted = priority.copy(), np.zeros(end - start, dtype=np.uint8)
+            edges = edges[lo:hi]
+            priority[edges - start] = self.priority[edges] + values[lo:hi]
+            boosted[edges - start] = kind
+        if boosted is not None:
+            np.minimum(priority, 1.0, out=priority)
+        return start, priority, boosted
+
+
+class PathwayEngine:
+    """Bounded-depth, priority-ordered pathways over a PathwayGraph
+
+    Relationships whose target concept is not in the store are skipped, as
+    in the recommendation tables. Ties in context priority keep the graph's
+    edge order.
+    """
+
+    def __init__(self, store: ConceptStore, graph: PathwayGraph, memo_size: int = MEMO_SIZE):
+        self.store = store
+        self.graph = graph
+        # Subtrees depend on the graph and the store only, both fixed for this engine
+        self.memo = ResultCache(max_size=memo_size, ttl=0)
+
+    def _expand(self, node: int, location: Optional[str], season: Optional[str], depth: int,
+                branch: int) -> Tuple[PathStep, ...]:
+        """The `branch` best edges of `node` in context, each expanded `depth - 1` more levels"""
+        key = (node, location, season, depth, branch)
+        steps = self.memo.get(key)
+        if steps is not None:
+            return steps
+
+        graph = self.graph
+        start, priority, boosted = graph.edge_priorities(node, location, season)
+        if boosted is None:
+            order = range(len(priority))  # stored best first
+            boosted = np.zeros(len(priority), dtype=np.uint8)
+        else:
+            order = np.argsort(-priority, kind='stable').tolist()
+        targets = graph.targets[start:start + len(priority)]
+        concept_ids, targets = graph.nodes[targets].tolist(), targets.tolist()
+        types, priority, boosted = graph.types[start:start + len(priority)].tolist(), priority.tolist(), boosted.tolist()
+        found = []
+        for r in order:
+            if concept_ids[r] not in self.store:
+                continue
+            children = self._expand(targets[r], location, season, depth - 1, branch) if depth > 1 else ()
+            found.append(PathStep(concept_ids[r], types[r], priority[r], boosted[r], children))
+            if len(found) == branch:
+                break
+        steps = tuple(found)
+        self.memo.put(key, steps)
+        return steps
+
+    def steps(self, concept_id: int, location: Optional[str] = None, season: Optional[str] = None,
+              max_depth: int = DEFAULT_DEPTH, max_branch: int = DEFAULT_BRANCH) -> Tuple[PathStep, ...]:
+        """The pathway tree below a concept, as graph node indexes (memoized)
+
+        Expansion recurses once per level, so the depth is capped at
+        MAX_PATHWAY_DEPTH whatever the caller asks (cycles are walked, not
+        followed forever).
+        """
+        max_depth = min(max_depth, MAX_PATHWAY_DEPTH)
+        node = self.graph.index(concept_id)
+        if node is None:
+            return ()
+        return self._expand(node, *self.graph.context(location or None, season or None), max_depth, max_branch)
+
+    def pathway(self, diagnosis_id: int, location: Optional[str] = None, season: Optional[str] = None,
+                max_depth: int = DEFAULT_DEPTH, max_branch: int = DEFAULT_BRANCH,
+                with_concepts: bool = True) -> Optional[Dict]:
+        """Pathway tree from a diagnosis plus its steps grouped per section, or None if it is unknown
+
+        A step's `path_score` is the product of the context priorities along
+        its path; sections list each concept once, at its best path score.
+        Concepts contraindicated for the diagnosis are left out at every
+        depth, with their subtrees, even when an intermediate step leads to
+        them (memoized subtrees are shared between roots, so this is done
+        here rather than in `steps`).
+        Without `with_concepts` the diagnosis and section entries carry
+        concept ids instead of concept payloads, for callers that resolve
+        them themselves (GraphQL, in one batched lookup).
+        """
+        diagnosis = self.store.get(diagnosis_id)
+        if diagnosis is None:
+            return None
+        location, season = location or None, season or None
+        contraindicated = self.graph.contraindications.get(diagnosis_id, frozenset())
+        steps = self.steps(diagnosis_id, location, season, max_depth, max_branch)
+
+        type_names, note = self.graph.type_names, context_note(location, season)
+        season_name = SEASON_NAMES.get(season, season)
+        # (section, concept_id) -> (path score, depth, via, relationship type) of its best occurrence
+        best: Dict[Tuple[str, int], Tuple[float, int, int, str]] = {}
+        boosted_names: Dict[int, List[str]] = {SEASON_BOOST: [], LOCATION_SEASON_BOOST: []}
+
+        def walk(steps: Iterable[PathStep], path: Tuple[int, ...], path_score: float, depth: int) -> List[Dict]:
+            tree = []
+            for step in steps:
+                if step.concept_id in path:  # cycle back to a concept already on this path
+                    continue
+                if step.concept_id in contraindicated:
+                    continue
+                concept = self.store.get(step.concept_id)
+                rel_type = type_names[step.type]
+                score = path_score * step.priority
+                if step.boosted and concept.indonesian_name not in boosted_names[step.boosted]:
+                    boosted_names[step.boosted].append(concept.indonesian_name)
+                key = (PATHWAY_SECTIONS.get(rel_type, "related"), step.concept_id)
+                if key not in best or score > best[key][0]:
+                    best[key] = (score, depth, path[-1], rel_type)
+                tree.append({
+                    'concept_id': step.concept_id,
+                    'canonical_name': concept.canonical_name,
+                    'type': rel_type,
+                    'priority_score': step.priority,
+                    'path_score': score,
+                    'next': walk(step.children, path + (step.concept_id,), score, depth + 1),
+                })
+            return tree
+
+        tree = walk(steps, (diagnosis_id,), 1.0, 1)
+        sections: Dict[str, List[Dict]] = {name: [] for name in (*PATHWAY_SECTIONS.values(), "related")}
+        for (section, concept_id), (score, depth, via, rel_type) in sorted(best.items(), key=lambda e: -e[1][0]):
+            concept = self.store.get(concept_id)
+            template = REASONING_TEMPLATES.get(rel_type, DEFAULT_REASONING)
+            sections[section].append({
+                **({'concept': concept.to_dict()} if with_concepts else {'concept_id': concept_id}),
+                'priority_score': score,
+                'confidence': RECOMMENDATION_CONFIDENCE,
+                'reason': template.format(name=concept.indonesian_name) + note,
+                'depth': depth,
+                'via': via,
+            })
+        return {
+            **({'diagnosis': diagnosis.to_dict()} if with_concepts else {'diagnosis_id': diagnosis_id}),
+            **sections,
+            'pathway': tree,
+            'contextual_insights': {
+                'location_specific_notes': (f"Prioritas lebih tinggi di {location} saat musim {season_name}: "
+                                            + ", ".join(boosted_names[LOCATION_SEASON_BOOST])
+                                            if boosted_names[LOCATION_SEASON_BOOST] else None),
+                'seasonal_recommendations': (f"Prioritas lebih tinggi saat musim {season_name}: "
+                                             + ", ".join(boosted_names[SEASON_BOOST])
+                                             if boosted_names[SEASON_BOOST] else None),
+            },
+            'context': {'location': location, 'season': season},
+            'max_depth': max_depth,
+        }
+
+    def stats(self) -> Dict:
+        return {"nodes": len(self.graph.nodes), "edges": self.graph.num_edges, "bytes": self.graph.nbytes,
+                "memo": self.memo.stats()}
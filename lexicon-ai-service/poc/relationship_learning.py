@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Relationship score learning from encounter data
+Learns what CLINICAL_RELATIONSHIPS hand-types: commonality, confidence and
+priority of each diagnosis -> lab test / medication / procedure pairing,
+plus per-context (location_season, season) boosts, from
+xaie_encounters / xaie_encounter_concepts rows.
+
+Counts are sparse diagnosis x concept co-occurrence matrices built with one
+sparse product per batch. They are additive, so a new batch of encounters
+is counted and added on; nothing is recomputed from history, and only the
+diagnoses the batch touched need rescoring.
+"""
+
+import time
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+LEARNING_ENGINE_VERSION = "cooccurrence-1"
+
+SEASONS = ("WET", "DRY")
+
+# xaie_encounter_concepts.concept_role; the diagnosis is the relationship source
+DIAGNOSIS = 0
+ROLES = {"DIAGNOSIS": DIAGNOSIS, "LAB_TEST": 1, "MEDICATION": 2, "PROCEDURE": 3}
+RELATIONSHIP_TYPE_BY_ROLE = {1: "HAS_DIAGNOSTIC_TEST", 2: "HAS_TREATMENT", 3: "HAS_PROCEDURE"}
+
+# priority = weighted confidence / commonality / volume (recorded in xaie_score_audit_log.weights_used)
+DEFAULT_WEIGHTS = {"confidence": 0.6, "commonality": 0.25, "volume": 0.15}
+WILSON_Z = 1.96                # 95% interval
+VOLUME_SATURATION = 10000      # pairings at which the volume score reaches 1.0
+MIN_SUPPORT = 5                # pairings before a relationship is emitted
+MIN_CONTEXT_ENCOUNTERS = 30    # diagnosis encounters in a context before it can boost
+MIN_BOOST = 0.01
+MAX_PER_DIAGNOSIS = 20
+
+
+def wilson_lower_bound(successes: np.ndarray, trials: np.ndarray, z: float = WILSON_Z) -> np.ndarray:
+    """Lower bound of the Wilson score interval: a proportion discounted for small samples"""
+    trials = np.maximum(trials, 1)
+    p = successes / trials
+    z2 = z * z
+    centre = p + z2 / (2 * trials)
+    margin = z * np.sqrt(p * (1 - p) / trials + z2 / (4 * trials * trials))
+    return (centre - margin) / (1 + z2 / trials)
+
+
+class EncounterBatch(NamedTuple):
+    """One batch of encounter concepts as parallel arrays (one row per xaie_encounter_concepts row)
+
+    `encounter` numbers the batch's encounters 0..num_encounters-1; `location`
+    and `season` are per encounter, as indexes into the learner's axes
+    (-1 = unknown location).
+    """
+    encounter: np.ndarray  # int64 per row
+    concept: np.ndarray    # int64 concept_id per row
+    role: np.ndarray       # int8 ROLES value per row
+    location: np.ndarray   # int32 per encounter
+    season: np.ndarray     # int32 per encounter
+
+    @property
+    def num_encounters(self) -> int:
+        return len(self.season)
+
+
+class _ContextLevel:
+    """Co-occurrence counts split by one context axis (e.g. location_season)
+
+    Row `diagnosis * num_keys + key` of `pairs` counts encounters with that
+    diagnosis in that context by target; `diagnoses` counts the encounters.
+    """
+
+    def __init__(self, keys: List[str]):
+        self.keys = keys
+        self.diagnoses = np.zeros(0, dtype=np.int64)
+        self.pairs = sparse.csr_matrix((0, 0), dtype=np.int64)
+
+
+def _presence(rows: np.ndarray, cols: np.ndarray, shape: Tuple[int, int]) -> sparse.csr_matrix:
+    """0/1 incidence matrix (a concept coded twice in one encounter counts once)"""
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)), shape=shape)
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+
+def _accumulate(counts: sparse.csr_matrix, encounter: np.ndarray, row: np.ndarray,
+                targets: sparse.csr_matrix, num_rows: int) -> Tuple[sparse.csr_matrix, np.ndarray]:
+    """Add one batch's (row, target) encounter counts to `counts`, grown to `num_rows` rows
+
+    The product runs over the rows present in the batch only and is then
+    scattered back, so its cost does not depend on how many rows exist.
+    Returns the new counts and the batch's encounters per row.
+    """
+    present, local = np.unique(row, return_inverse=True)
+    incidence = _presence(encounter, local, (targets.shape[0], len(present)))
+    product = (incidence.T @ targets).tocoo()
+    added = sparse.csr_matrix((product.data, (present[product.row], product.col)),
+                              shape=(num_rows, targets.shape[1]))
+    if counts.shape != added.shape:
+        counts = counts.copy()
+        counts.resize(added.shape)
+    encounters = np.zeros(num_rows, dtype=np.int64)
+    encounters[present] = np.diff(incidence.tocsc().indptr)
+    return counts + added, encounters
+
+
+class RelationshipLearner:
+    """Incremental co-occurrence counts and relationship scores
+
+    `add_batch` folds a batch into the counts and returns the diagnoses it
+    touched; `relationships` scores diagnoses into CLINICAL_RELATIONSHIPS
+    shape (ready for a snapshot reload), `audit_rows` into
+    xaie_score_audit_log rows.
+    """
+
+    def __init__(self, locations: Sequence[str], seasons: Sequence[str] = SEASONS,
+                 weights: Optional[Dict[str, float]] = None, min_support: int = MIN_SUPPORT,
+                 min_context_encounters: int = MIN_CONTEXT_ENCOUNTERS,
+                 max_per_diagnosis: int = MAX_PER_DIAGNOSIS):
+        self.locations = list(locations)
+        self.seasons = list(seasons)
+        self.location_index = {name: i for i, name in enumerate(self.locations)}
+        self.season_index = {name: i for i, name in enumerate(self.seasons)}
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.min_support = min_support
+        self.min_context_encounters = min_context_encounters
+        self.max_per_diagnosis = max_per_diagnosis
+
+        # Dense indexes for concept ids, in order of first appearance
+        self.diagnosis_ids: List[int] = []
+        self.target_ids: List[int] = []
+        self.target_roles: List[int] = []
+        self._diagnosis_index: Dict[int, int] = {}
+        self._target_index: Dict[int, int] = {}
+
+        self.encounters = 0
+        self.diagnosis_counts = np.zeros(0, dtype=np.int64)
+        self.pair_counts = sparse.csr_matrix((0, 0), dtype=np.int64)
+        self.location_season = _ContextLevel([f"{loc}_{season}" for loc in self.locations
+                                              for season in self.seasons])
+        self.season = _ContextLevel(list(self.seasons))
+        self.updated_at: Optional[float] = None
+
+    # ---- ingest ---------------------------------------------------------
+
+    def _dense(self, concept_ids: np.ndarray, index: Dict[int, int], ids: List[int],
+               roles: Optional[np.ndarray] = None) -> np.ndarray:
+        """Dense indexes for concept ids, registering new ones (one dict probe per distinct id)"""
+        unique, first, inverse = np.unique(concept_ids, return_index=True, return_inverse=True)
+        mapped = np.empty(len(unique), dtype=np.int64)
+        for i, concept_id in enumerate(unique.tolist()):
+            position = index.get(concept_id)
+            if position is None:
+                position = index[concept_id] = len(ids)
+                ids.append(concept_id)
+                if roles is not None:
+                    self.target_roles.append(int(roles[first[i]]))
+            mapped[i] = position
+        return mapped[inverse]
+
+    def add_batch(self, batch: EncounterBatch) -> FrozenSet[int]:
+        """Count a batch of encounters; returns the diagnosis ids whose scores may have changed"""
+        is_diagnosis = batch.role == DIAGNOSIS
+        d_enc = batch.encounter[is_diagnosis]
+        d_idx = self._dense(batch.concept[is_diagnosis], self._diagnosis_index, self.diagnosis_ids)
+        t_enc = batch.encounter[~is_diagnosis]
+        t_idx = self._dense(batch.concept[~is_diagnosis], self._target_index, self.target_ids,
+                            batch.role[~is_diagnosis])
+        n, n_diag, n_target = batch.num_encounters, len(self.diagnosis_ids), len(self.target_ids)
+
+        # encounters x targets, shared by every level
+        targets = _presence(t_enc, t_idx, (n, n_target))
+        self.pair_counts, added = _accumulate(self.pair_counts, d_enc, d_idx, targets, n_diag)
+        self.diagnosis_counts = np.pad(self.diagnosis_counts, (0, n_diag - len(self.diagnosis_counts))) + added
+
+        # Same product with the diagnosis split by context key
+        d_location, d_season = batch.location[d_enc], batch.season[d_enc]
+        known = d_location >= 0
+        for level, keys, mask in (
+                (self.location_season, d_location * len(self.seasons) + d_season, known),
+                (self.season, d_season, np.ones(len(d_enc), dtype=bool))):
+            width = len(level.keys)
+            level.pairs, added = _accumulate(level.pairs, d_enc[mask], d_idx[mask] * width + keys[mask],
+                                             targets, n_diag * width)
+            level.diagnoses = np.pad(level.diagnoses, (0, n_diag * width - len(level.diagnoses))) + added
+
+        self.encounters += n
+        self.updated_at = time.time()
+        return frozenset(self.diagnosis_ids[i] for i in np.unique(d_idx).tolist())
+
+    def batch_from_encounters(self, encounters: Iterable[Dict]) -> EncounterBatch:
+        """Batch from encounter dicts: {"location", "season", "concepts": [{"concept_id", "role"}]}"""
+        encounter, concept, role, location, season = [], [], [], [], []
+        for i, enc in enumerate(encounters):
+            location.append(self.location_index.get(enc.get("location") or "", -1))
+            if enc["season"] not in self.season_index:
+                raise ValueError(f"Unknown season {enc['season']!r}; expected one of {', '.join(self.seasons)}")
+            season.append(self.season_index[enc["season"]])
+            for item in enc["concepts"]:
+                if item["role"] not in ROLES:
+                    raise ValueError(f"Unknown concept role {item['role']!r}")
+                encounter.append(i)
+                concept.append(item["concept_id"])
+                role.append(ROLES[item["role"]])
+        return EncounterBatch(np.array(encounter, dtype=np.int64), np.array(concept, dtype=np.int64),
+                              np.array(role, dtype=np.int8), np.array(location, dtype=np.int32),
+                              np.array(season, dtype=np.int32))
+
+    # ---- scoring --------------------------------------------------------
+
+    def _scores(self, rows: np.ndarray) -> Dict[str, np.ndarray]:
+        """Scores of every (diagnosis row, target) pairing of `rows` with enough support"""
+        block = self.pair_counts[rows].tocoo()
+        keep = block.data >= self.min_support
+        diag, target, count = rows[block.row[keep]], block.col[keep], block.data[keep]
+        trials = self.diagnosis_counts[diag]
+
+        commonality = count / trials
+        confidence = wilson_lower_bound(count, trials)
+        volume = np.minimum(1.0, np.log1p(count) / np.log1p(VOLUME_SATURATION))
+        w = self.weights
+        priority = w["confidence"] * confidence + w["commonality"] * commonality + w["volume"] * volume
+
+        # Best first per diagnosis, ties by target order; keep max_per_diagnosis
+        order = np.lexsort((target, -priority, diag))
+        diag, target = diag[order], target[order]
+        starts = np.searchsorted(diag, diag, side="left")
+        ranked = np.arange(len(diag)) - starts < self.max_per_diagnosis
+        order = order[ranked]
+        return {
+            "diagnosis": diag[ranked], "target": target[ranked], "count": count[order],
+            "commonality": commonality[order], "confidence": confidence[order],
+            "volume": volume[order], "priority": priority[order],
+        }
+
+    def _context_boosts(self, scores: Dict[str, np.ndarray]) -> List[Dict[str, float]]:
+        """Context key -> boost for every scored pairing
+
+        A context boosts a pairing by how far its Wilson lower bound there
+        exceeds the overall commonality, when the diagnosis has enough
+        encounters in that context.
+        """
+        boosts: List[Dict[str, float]] = [{} for _ in range(len(scores["diagnosis"]))]
+        if not len(boosts):
+            return boosts
+        position = {(d, t): i for i, (d, t) in enumerate(zip(scores["diagnosis"].tolist(),
+                                                             scores["target"].tolist()))}
+        for level in (self.location_season, self.season):
+            width = len(level.keys)
+            diagnoses = np.unique(scores["diagnosis"])
+            rows = (diagnoses[:, None] * width + np.arange(width)).ravel()
+            rows = rows[level.diagnoses[rows] >= self.min_context_encounters]
+            if not len(rows):
+                continue
+            block = level.pairs[rows].tocoo()
+            ctx_rows = rows[block.row]
+            lower = wilson_lower_bound(block.data, level.diagnoses[ctx_rows])
+            for row, target, bound in zip(ctx_rows.tolist(), block.col.tolist(), lower.tolist()):
+                i = position.get((row // width, target))
+                if i is None:
+                    continue
+                boost = bound - scores["commonality"][i]
+                if boost >= MIN_BOOST:
+                    boosts[i][level.keys[row % width]] = round(float(boost), 4)
+        return boosts
+
+    def _rows(self, diagnosis_ids: Optional[Iterable[int]]) -> np.ndarray:
+        if diagnosis_ids is None:
+            return np.arange(len(self.diagnosis_ids))
+        return np.array(sorted(self._diagnosis_index[d] for d in diagnosis_ids if d in self._diagnosis_index),
+                        dtype=np.int64)
+
+    def relationships(self, diagnosis_ids: Optional[Iterable[int]] = None) -> Dict[int, List[Dict]]:
+        """CLINICAL_RELATIONSHIPS-shaped relationships of the given (default: all) diagnoses
+
+        Diagnoses without a pairing above `min_support` are left out.
+        """
+        scores = self._scores(self._rows(diagnosis_ids))
+        boosts = self._context_boosts(scores)
+        learned: Dict[int, List[Dict]] = {}
+        for i, (d, t) in enumerate(zip(scores["diagnosis"].tolist(), scores["target"].tolist())):
+            learned.setdefault(self.diagnosis_ids[d], []).append({
+                "target_id": self.target_ids[t],
+                "type": RELATIONSHIP_TYPE_BY_ROLE[self.target_roles[t]],
+                "priority": round(float(scores["priority"][i]), 4),
+                "context_boost": boosts[i],
+                "commonality": round(float(scores["commonality"][i]), 4),
+                "confidence": round(float(scores["confidence"][i]), 4),
+                "total_encounters": int(scores["count"][i]),
+            })
+        return learned
+
+    def audit_rows(self, diagnosis_ids: Optional[Iterable[int]] = None) -> Iterable[Dict]:
+        """xaie_score_audit_log rows (keyed by concept ids; relationship_id is resolved on write)"""
+        scores = self._scores(self._rows(diagnosis_ids))
+        for i, (d, t) in enumerate(zip(scores["diagnosis"].tolist(), scores["target"].tolist())):
+            yield {
+                "source_concept_id": self.diagnosis_ids[d],
+                "target_concept_id": self.target_ids[t],
+                "learning_engine_version": LEARNING_ENGINE_VERSION,
+                "encounter_count_pairing": int(scores["count"][i]),
+                "volume_score": float(scores["volume"][i]),
+                "evidence_score": float(scores["confidence"][i]),
+                "weights_used": self.weights,
+                "calculated_commonality_score": float(scores["commonality"][i]),
+                "calculated_confidence_score": float(scores["confidence"][i]),
+                "calculated_priority_score": float(scores["priority"][i]),
+            }
+
+    def stats(self) -> Dict:
+        return {
+            "encounters": self.encounters,
+            "diagnoses": len(self.diagnosis_ids),
+            "targets": len(self.target_ids),
+            "pairings": int(self.pair_counts.nnz),
+            "context_pairings": int(self.location_season.pairs.nnz + self.season.pairs.nnz),
+            "updated_at": self.updated_at,
+        }
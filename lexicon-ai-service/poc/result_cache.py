@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Bounded result cache for engine calls
+In-process equivalent of xaie_ml_predictions.input_hash: results keyed by
+their inputs, with size bound, TTL, eviction policy and hit/miss counters
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+CACHE_POLICIES = ("lru", "fifo")
+
+_MISSING = object()
+
+
+class ResultCache:
+    """Thread-safe mapping of input key -> result with bounded size and TTL
+
+    - lru:  a hit refreshes the entry; the least recently used entry is evicted
+    - fifo: hits do not reorder; the oldest inserted entry is evicted
+
+    Entries older than `ttl` seconds are treated as misses (ttl 0 disables
+    expiry). Cached results are shared between callers and must not be
+    mutated.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0, policy: str = "lru",
+                 clock: Callable[[], float] = time.monotonic):
+        if policy not in CACHE_POLICIES:
+            raise ValueError(f"Unknown cache policy {policy!r}, expected one of {CACHE_POLICIES}")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.policy = policy
+        self._clock = clock
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> 'ResultCache':
+        """Configure from CACHE_SIZE / CACHE_TTL / CACHE_POLICY"""
+        return cls(
+            max_size=int(os.environ.get("CACHE_SIZE", 10000)),
+            ttl=float(os.environ.get("CACHE_TTL", 300)),
+            policy=os.environ.get("CACHE_POLICY", "lru"),
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def _lookup(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            expires_at, value = entry
+            if self.ttl and self._clock() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return _MISSING
+            if self.policy == "lru":
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                del self._entries[key]
+            self._entries[key] = (self._clock() + self.ttl, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, fn: Callable, *args: Any) -> Any:
+        """Cached result for `key`, computing `fn(*args)` on a miss"""
+        value = self._lookup(key)
+        if value is _MISSING:
+            value = fn(*args)
+            self.put(key, value)
+        return value
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """Drop every entry (or those whose key matches `predicate`); returns the count"""
+        with self._lock:
+            if predicate is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                stale = [key for key in self._entries if predicate(key)]
+                for key in stale:
+                    del self._entries[key]
+                dropped = len(stale)
+            self.invalidations += dropped
+            return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "policy": self.policy,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Vectorized outbreak risk scoring
+Seasonal base risk per diagnosis and a multiplier per location, held as
+NumPy tables so a whole diagnosis x location x season grid is one broadcast
+multiply. The full grid is precomputed and single predictions are lookups
+into it.
+"""
+
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+SEASONS = ("WET", "DRY")
+
+# Unknown diagnoses / locations score with these (the original demo defaults)
+DEFAULT_BASE_RISK = 0.5
+DEFAULT_MULTIPLIER = 1.0
+
+# risk > 0.7 HIGH, > 0.4 MEDIUM, else LOW
+CATEGORY_BOUNDS = np.array([0.4, 0.7])
+CATEGORIES = ("LOW", "MEDIUM", "HIGH")
+
+
+def _positions(names: Sequence[str], index: Dict[str, int], default: int) -> np.ndarray:
+    return np.fromiter((index.get(name, default) for name in names), dtype=np.intp, count=len(names))
+
+
+def risk_categories(scores: np.ndarray) -> np.ndarray:
+    """Category index (into CATEGORIES) of every score"""
+    return np.digitize(scores, CATEGORY_BOUNDS, right=True)
+
+
+class RiskGrid:
+    """Risk scores for every diagnosis x location x season combination
+
+    `scores[d, l, s]` with the axes' names in `diagnoses`, `locations` and
+    `seasons`; `get` is three dict probes and an array read.
+    """
+
+    def __init__(self, diagnoses: Sequence[str], locations: Sequence[str], seasons: Sequence[str],
+                 scores: np.ndarray, model_version: int = 1):
+        self.diagnoses = list(diagnoses)
+        self.locations = list(locations)
+        self.seasons = list(seasons)
+        self.scores = scores
+        self.categories = risk_categories(scores)
+        self.model_version = model_version
+        self.generated_at = time.time()
+        self._diagnosis_index = {name: i for i, name in enumerate(self.diagnoses)}
+        self._location_index = {name: i for i, name in enumerate(self.locations)}
+        self._season_index = {name: i for i, name in enumerate(self.seasons)}
+
+    def __len__(self) -> int:
+        return self.scores.size
+
+    def get(self, diagnosis: str, location: str, season: str) -> Optional[Tuple[float, str]]:
+        """(risk score, category) or None if any axis value is not in the grid"""
+        i = self._diagnosis_index.get(diagnosis)
+        j = self._location_index.get(location)
+        k = self._season_index.get(season)
+        if i is None or j is None or k is None:
+            return None
+        return float(self.scores[i, j, k]), CATEGORIES[self.categories[i, j, k]]
+
+    def to_dict(self, records: bool = False) -> Dict:
+        """Compact nested lists (`risk_scores[d][l][s]`) or one record per combination"""
+        payload = {"model_version": self.model_version, "generated_at": self.generated_at,
+                   "diagnoses": self.diagnoses, "locations": self.locations, "seasons": self.seasons,
+                   "total": len(self)}
+        if not records:
+            payload["risk_scores"] = np.round(self.scores, 4).tolist()
+            payload["risk_categories"] = np.asarray(CATEGORIES)[self.categories].tolist()
+            return payload
+        d, loc, s = np.indices(self.scores.shape).reshape(3, -1)
+        names = np.asarray(CATEGORIES)
+        payload["predictions"] = [
+            {"diagnosis": self.diagnoses[i], "location": self.locations[j], "season": self.seasons[k],
+             "risk_score": score, "risk_category": category}
+            for i, j, k, score, category in zip(d.tolist(), loc.tolist(), s.tolist(),
+                                                np.round(self.scores, 4).ravel().tolist(),
+                                                names[self.categories.ravel()].tolist())
+        ]
+        return payload
+
+
+class RiskModel:
+    """Seasonal risk x location multiplier tables
+
+    Row / entry 0 of each table holds the defaults, so names missing from
+    the tables index position 0 instead of branching per item.
+    """
+
+    def __init__(self, seasonal_risk: Dict[str, Dict[str, float]], location_multiplier: Dict[str, float],
+                 seasons: Sequence[str] = SEASONS, version: int = 1):
+        self.seasons = list(seasons)
+        self.diagnoses = list(seasonal_risk)
+        self.locations = list(location_multiplier)
+        self.version = version
+        self._diagnosis_index = {name: i + 1 for i, name in enumerate(self.diagnoses)}
+        self._location_index = {name: i + 1 for i, name in enumerate(self.locations)}
+        self._season_index = {name: i for i, name in enumerate(self.seasons)}
+
+        self.base_risk = np.full((len(self.diagnoses) + 1, len(self.seasons)), DEFAULT_BASE_RISK)
+        for i, name in enumerate(self.diagnoses, start=1):
+            for j, season in enumerate(self.seasons):
+                self.base_risk[i, j] = seasonal_risk[name].get(season, DEFAULT_BASE_RISK)
+        self.multiplier = np.array([DEFAULT_MULTIPLIER] +
+                                   [location_multiplier[name] for name in self.locations])
+
+    def grid(self, diagnoses: Optional[Sequence[str]] = None, locations: Optional[Sequence[str]] = None,
+             seasons: Optional[Sequence[str]] = None) -> RiskGrid:
+        """Risk for every combination of the given axes (default: everything the model knows)"""
+        diagnoses = self.diagnoses if diagnoses is None else list(diagnoses)
+        locations = self.locations if locations is None else list(locations)
+        seasons = self.seasons if seasons is None else list(seasons)
+        unknown = [season for season in seasons if season not in self._season_index]
+        if unknown:
+            raise ValueError(f"Unknown season(s) {', '.join(unknown)}; "
+                             f"expected one of {', '.join(self.seasons)}")
+
+        base = self.base_risk[np.ix_(_positions(diagnoses, self._diagnosis_index, 0),
+                                     _positions(seasons, self._season_index, 0))]
+        multiplier = self.multiplier[_positions(locations, self._location_index, 0)]
+        # (diagnoses, 1, seasons) * (1, locations, 1) -> (diagnoses, locations, seasons)
+        scores = np.minimum(base[:, None, :] * multiplier[None, :, None], 1.0)
+        return RiskGrid(diagnoses, locations, seasons, scores, self.version)
+
+    def predict(self, diagnosis: str, location: str, season: str) -> Tuple[float, str]:
+        """One combination, for names outside the precomputed grid"""
+        return self.grid([diagnosis], [location], [season]).get(diagnosis, location, season)
+
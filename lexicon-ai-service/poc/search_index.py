@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+Search indexes for the Lexicon AI Service POC
+Sparse top-k retrieval over the TF-IDF concept matrix, a pg_trgm-style
+trigram index for typo-tolerant lookup and a sorted-array prefix index for
+autocomplete
+"""
+
+import math
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from concept_store import ConceptRecord
+
+# ===================================================================
+# RESULT RECORDS
+# ===================================================================
+
+class SearchHit(NamedTuple):
+    """Search result referencing (not copying) the matched concept record"""
+    concept: ConceptRecord
+    match_score: float
+
+    def to_dict(self) -> Dict:
+        """Materialize the API payload for this hit"""
+        result = self.concept.to_dict()
+        result['match_score'] = self.match_score
+        return result
+
+# ===================================================================
+# SPARSE TOP-K RETRIEVAL
+# ===================================================================
+
+class SparseTopKIndex:
+    """Inverted index over an L2-normalized TF-IDF matrix (one row per concept)
+
+    Rows produced by TfidfVectorizer are unit length, so the dot product with
+    a query vector is the cosine similarity. Only the postings of the query
+    terms are touched, never the full concept list.
+    """
+
+    def __init__(self, matrix: sparse.spmatrix, min_score: float = 0.1):
+        # Term-major CSR: row t holds the (concept row, weight) postings of term t
+        self.postings = sparse.csr_matrix(matrix).T.tocsr()
+        self.postings.sort_indices()
+        self.num_rows = matrix.shape[0]
+        self.min_score = min_score
+
+    @classmethod
+    def from_postings(cls, postings: sparse.csr_matrix, min_score: float = 0.1) -> 'SparseTopKIndex':
+        """Wrap prebuilt term-major postings (e.g. from an index artifact) without copying"""
+        index = cls.__new__(cls)
+        index.postings = postings
+        index.num_rows = postings.shape[1]
+        index.min_score = min_score
+        return index
+
+    def scores(self, query_vector: sparse.spmatrix) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (concept rows, cosine scores) for every concept sharing a query term"""
+        query_vector = sparse.csr_matrix(query_vector)
+        terms = query_vector.indices
+        if len(terms) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        indptr, indices, data = self.postings.indptr, self.postings.indices, self.postings.data
+        if len(terms) == 1:
+            start, end = indptr[terms[0]], indptr[terms[0] + 1]
+            return indices[start:end], data[start:end] * query_vector.data[0]
+
+        rows = np.concatenate([indices[indptr[t]:indptr[t + 1]] for t in terms])
+        weights = np.concatenate([data[indptr[t]:indptr[t + 1]] * w
+                                  for t, w in zip(terms, query_vector.data)])
+        # Accumulate per concept over the candidate set only (sorted by row)
+        candidates, inverse = np.unique(rows, return_inverse=True)
+        return candidates, np.bincount(inverse, weights=weights)
+
+    def top_k(self, query_vector: sparse.spmatrix, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (concept rows, scores) of the best `k` matches above `min_score`"""
+        return self.select(*self.scores(query_vector), k)
+
+    def select(self, rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The best `k` of scored rows above `min_score`, best first"""
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        mask = scores > self.min_score
+        rows, scores = rows[mask], scores[mask]
+
+        if len(scores) > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[keep], scores[keep]
+
+        # Highest score first, ties in concept order (matches the original stable sort)
+        order = np.lexsort((rows, -scores))
+        return rows[order], scores[order]
+
+    def top_k_many(self, query_matrix: sparse.spmatrix, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Score every query row with one sparse product and return per-query top-k"""
+        num_queries = query_matrix.shape[0]
+        if k <= 0 or num_queries == 0:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))] * num_queries
+
+        # (queries x terms) @ (terms x concepts): only postings of used terms are read
+        scores = sparse.csr_matrix(query_matrix) @ self.postings
+        query_of = np.repeat(np.arange(num_queries), np.diff(scores.indptr))
+        mask = scores.data > self.min_score
+        query_of, rows, values = query_of[mask], scores.indices[mask], scores.data[mask]
+
+        # Group by query, best score first, ties in concept order; keep rank < k
+        order = np.lexsort((rows, -values, query_of))
+        query_of, rows, values = query_of[order], rows[order], values[order]
+        group_start = np.searchsorted(query_of, np.arange(num_queries))
+        keep = np.arange(len(query_of)) - group_start[query_of] < k
+        query_of, rows, values = query_of[keep], rows[keep], values[keep]
+
+        bounds = np.searchsorted(query_of, np.arange(num_queries + 1))
+        return [(rows[bounds[q]:bounds[q + 1]], values[bounds[q]:bounds[q + 1]])
+                for q in range(num_queries)]
+
+
+class PackedVocabularyVectorizer:
+    """TF-IDF query encoder over a sorted vocabulary packed in one UTF-8 blob
+
+    `transform` matches a fitted default TfidfVectorizer (same tokens, raw
+    counts times IDF, L2 row norm) but looks terms up by bisect instead of a
+    per-term dict, so a memory-mapped vocabulary is used in place.
+    """
+
+    TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")  # TfidfVectorizer default token_pattern
+
+    def __init__(self, blob: bytes, offsets: np.ndarray, idf: np.ndarray, base: int = 0):
+        self.terms = _PackedTerms(blob, offsets, base)
+        self.idf = idf
+
+    def _term_id(self, token: str) -> Optional[int]:
+        key = token.encode()
+        i = bisect_left(self.terms, key)
+        return i if i < len(self.terms) and self.terms[i] == key else None
+
+    def transform(self, texts: Iterable[str]) -> sparse.csr_matrix:
+        indptr, indices, counts = [0], [], []
+        for text in texts:
+            row: Dict[int, int] = {}
+            for token in self.TOKEN_RE.findall(text.lower()):
+                term = self._term_id(token)
+                if term is not None:
+                    row[term] = row.get(term, 0) + 1
+            for term in sorted(row):
+                indices.append(term)
+                counts.append(row[term])
+            indptr.append(len(indices))
+
+        indices = np.array(indices, dtype=np.int32)
+        data = np.array(counts, dtype=np.float64) * self.idf[indices]
+        matrix = sparse.csr_matrix((data, indices, np.array(indptr, dtype=np.int32)),
+                                   shape=(len(indptr) - 1, len(self.idf)))
+        return normalize(matrix, norm='l2', copy=False)
+
+# ===================================================================
+# TRIGRAM FUZZY INDEX (in-process equivalent of pg_trgm)
+# ===================================================================
+
+_WORD_RE = re.compile(r'[^\W_]+')
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigram set of `text` using pg_trgm rules (lowercase, words padded '  w ')"""
+    grams = set()
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def concept_terms(concept: ConceptRecord) -> List[str]:
+    """All searchable terms of a concept (names and synonyms)"""
+    return [concept.canonical_name, concept.indonesian_name, *concept.synonyms]
+
+
+class TrigramIndex:
+    """Trigram posting lists over concept terms, mirroring the
+    `xaie_synonyms.term gin_trgm_ops` index and `similarity()` threshold
+
+    Grams shared by at least 1/BITMAP_DENSITY of the terms (word starts like
+    "  b") are also kept as packed membership bitmaps, built on first use; a
+    bitmap is no larger than the posting list it stands for.
+    """
+
+    BITMAP_DENSITY = 32
+
+    def __init__(self, terms: Iterable[str], term_rows: Iterable[int], threshold: float = 0.3):
+        gram_ids: Dict[str, int] = {}
+        pair_grams: List[int] = []
+        pair_terms: List[int] = []
+        sizes: List[int] = []
+
+        for term_id, term in enumerate(terms):
+            grams = trigrams(term)
+            sizes.append(len(grams))
+            for gram in grams:
+                pair_grams.append(gram_ids.setdefault(gram, len(gram_ids)))
+                pair_terms.append(term_id)
+
+        # CSR layout: postings of gram g are terms[indptr[g]:indptr[g + 1]]
+        pair_grams_arr = np.array(pair_grams, dtype=np.int32)
+        order = np.argsort(pair_grams_arr, kind='stable')
+        self.gram_ids = gram_ids
+        self.posting_terms = np.array(pair_terms, dtype=np.int32)[order]
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(pair_grams_arr, minlength=len(gram_ids)))))
+        self.term_sizes = np.array(sizes, dtype=np.int32)
+        self.term_rows = np.fromiter(term_rows, dtype=np.int64)
+        self.threshold = threshold
+        self._bitmaps: Dict[int, np.ndarray] = {}
+
+    @classmethod
+    def from_concepts(cls, concepts: List[ConceptRecord], threshold: float = 0.3) -> 'TrigramIndex':
+        """Index every name and synonym, each term pointing at its concept row"""
+        terms, rows = [], []
+        for row, concept in enumerate(concepts):
+            for term in concept_terms(concept):
+                terms.append(term)
+                rows.append(row)
+        return cls(terms, rows, threshold)
+
+    @classmethod
+    def from_arrays(cls, gram_ids: Dict[str, int], posting_terms: np.ndarray, indptr: np.ndarray,
+                    term_sizes: np.ndarray, term_rows: np.ndarray, threshold: float = 0.3) -> 'TrigramIndex':
+        """Wrap prebuilt posting arrays (e.g. from an index artifact) without copying"""
+        index = cls.__new__(cls)
+        index.gram_ids = gram_ids
+        index.posting_terms = posting_terms
+        index.indptr = indptr
+        index.term_sizes = term_sizes
+        index.term_rows = term_rows
+        index.threshold = threshold
+        index._bitmaps = {}
+        return index
+
+    def _postings(self, gram_id: int) -> np.ndarray:
+        return self.posting_terms[self.indptr[gram_id]:self.indptr[gram_id + 1]]
+
+    def _bitmap(self, gram_id: int) -> np.ndarray:
+        bitmap = self._bitmaps.get(gram_id)
+        if bitmap is None:
+            member = np.zeros(len(self.term_sizes), dtype=bool)
+            member[self._postings(gram_id)] = True
+            bitmap = self._bitmaps[gram_id] = np.packbits(member)
+        return bitmap
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the posting arrays and the bitmaps built so far"""
+        return (sum(a.nbytes for a in (self.posting_terms, self.indptr, self.term_sizes, self.term_rows))
+                + sum(bitmap.nbytes for bitmap in self._bitmaps.values()))
+
+    def top_k(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (concept rows, similarity) of the best `k` concepts above threshold"""
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        query_grams = trigrams(query)
+        gram_ids = [self.gram_ids[g] for g in query_grams if g in self.gram_ids]
+        if k <= 0 or not gram_ids:
+            return empty
+
+        # Candidate generation: similarity >= t implies shared >= t * |query|,
+        # so a match appears in at least one of the len(grams) - min_shared + 1
+        # rarest grams (prefix filter). Candidates are counted over those
+        # posting lists only; the commonest grams are then just probed for
+        # them, by bitmap when their postings are long.
+        min_shared = max(1, math.ceil(self.threshold * len(query_grams) - 1e-9))
+        if min_shared > len(gram_ids):
+            return empty
+        gram_ids.sort(key=lambda g: self.indptr[g + 1] - self.indptr[g])
+        prefix = len(gram_ids) - min_shared + 1
+        terms, shared = np.unique(np.concatenate([self._postings(g) for g in gram_ids[:prefix]]),
+                                  return_counts=True)
+        byte, bit = terms >> 3, (7 - (terms & 7)).astype(np.uint8)
+        for g in gram_ids[prefix:]:
+            postings = self._postings(g)
+            if len(postings) * self.BITMAP_DENSITY >= len(self.term_sizes):
+                shared += (self._bitmap(g)[byte] >> bit) & 1
+            else:
+                shared += np.isin(terms, postings, assume_unique=True)
+        keep = shared >= min_shared
+        terms, shared = terms[keep], shared[keep].astype(np.float64)
+        similarity = shared / (len(query_grams) + self.term_sizes[terms] - shared)
+
+        mask = similarity >= self.threshold
+        if not mask.any():
+            return empty
+        rows, similarity = self.term_rows[terms[mask]], similarity[mask]
+
+        # Best matching term per concept
+        order = np.lexsort((-similarity, rows))
+        rows, similarity = rows[order], similarity[order]
+        first = np.concatenate(([True], rows[1:] != rows[:-1]))
+        rows, similarity = rows[first], similarity[first]
+
+        if len(similarity) > k:
+            keep = np.argpartition(-similarity, k - 1)[:k]
+            rows, similarity = rows[keep], similarity[keep]
+        order = np.lexsort((rows, -similarity))
+        return rows[order], similarity[order]
+
+# ===================================================================
+# PREFIX AUTOCOMPLETE INDEX
+# ===================================================================
+
+def normalize_term(term: str) -> str:
+    """Lowercase and collapse whitespace (shared by indexing and lookups)"""
+    return " ".join(term.lower().split())
+
+
+class _PackedTerms(Sequence):
+    """Read-only sequence view of sorted terms packed in one UTF-8 blob
+
+    The blob may be a region of a larger buffer (e.g. a memory-mapped index
+    artifact) starting at byte `base`.
+    """
+
+    def __init__(self, blob: bytes, offsets: np.ndarray, base: int = 0):
+        self.blob = blob
+        self.base = base
+        # memoryview indexing yields Python ints, much cheaper than NumPy scalars
+        self.offsets = memoryview(offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return self.blob[self.base + self.offsets[i]:self.base + self.offsets[i + 1]]
+
+
+# Top-k length materialized per wide prefix (and the largest autocomplete limit served)
+PREFIX_PRECOMPUTE_K = 10
+
+
+class PrefixIndex:
+    """Sorted array of normalized terms for prefix autocomplete
+
+    Terms are stored as one UTF-8 blob plus an offsets array (no per-term
+    Python objects) and looked up with bisect. Every name, synonym and
+    word-start suffix ("hitung trombosit" -> "trombosit") is indexed, and
+    results are ranked by precomputed concept popularity. Top-k lists are
+    materialized at build time for every prefix matching more than
+    `max_scan` terms, so a lookup never ranks more than `max_scan` entries.
+    """
+
+    SMALL_RANGE = 64
+
+    def __init__(self, terms: Iterable[str], term_rows: Iterable[int], popularity: np.ndarray,
+                 max_scan: int = 256, precompute_k: int = PREFIX_PRECOMPUTE_K):
+        entries = sorted(set(zip((normalize_term(t).encode() for t in terms), term_rows)))
+        lengths = np.fromiter((len(term) for term, _ in entries), dtype=np.int64, count=len(entries))
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+
+        self.blob = b"".join(term for term, _ in entries)
+        self.offsets = offsets.astype(np.uint32 if offsets[-1] < 2 ** 32 else np.uint64)
+        self.rows = np.fromiter((row for _, row in entries), dtype=np.int32, count=len(entries))
+        self.popularity = np.asarray(popularity, dtype=np.float64)
+        self.terms = _PackedTerms(self.blob, self.offsets)
+
+        self.max_scan = max_scan
+        self._precompute_k = precompute_k
+        self._precomputed: Dict[bytes, Tuple[np.ndarray, np.ndarray, List[str]]] = {}
+        self._precompute_wide_prefixes()
+
+    def _precompute_wide_prefixes(self) -> None:
+        """Materialize top-k for every prefix whose range exceeds `max_scan`"""
+        # Ancestors of a wide prefix are wide too, so walk down from the root
+        # and only expand wide prefixes; children are found by bisect jumps.
+        pending = [(b"", 0, len(self.terms))]
+        while pending:
+            prefix, lo, hi = pending.pop()
+            depth = len(prefix) + 1
+            i = lo
+            while i < hi:
+                term = self.terms[i]
+                if len(term) < depth:
+                    i += 1
+                    continue
+                child = term[:depth]
+                child_hi = bisect_left(self.terms, child + b"\xff", i, hi)
+                if child_hi - i > self.max_scan:
+                    self._precomputed[child] = self._rank_range(i, child_hi, self._precompute_k)
+                    pending.append((child, i, child_hi))
+                i = child_hi
+
+    @classmethod
+    def from_concepts(cls, concepts: List[ConceptRecord], popularity: Optional[Dict[int, float]] = None,
+                      **kwargs) -> 'PrefixIndex':
+        """Index names, synonyms and their word-start suffixes of every concept"""
+        popularity = popularity or {}
+        terms, rows = [], []
+        for row, concept in enumerate(concepts):
+            for term in concept_terms(concept):
+                words = normalize_term(term).split()
+                for start in range(len(words)):
+                    terms.append(" ".join(words[start:]))
+                    rows.append(row)
+        scores = np.array([popularity.get(c.concept_id, 0.0) for c in concepts], dtype=np.float64)
+        return cls(terms, rows, scores, **kwargs)
+
+    @classmethod
+    def from_arrays(cls, blob: bytes, offsets: np.ndarray, rows: np.ndarray, popularity: np.ndarray,
+                    precomputed: Dict[bytes, Tuple[np.ndarray, np.ndarray, List[str]]],
+                    base: int = 0, max_scan: int = 256,
+                    precompute_k: int = PREFIX_PRECOMPUTE_K) -> 'PrefixIndex':
+        """Wrap prebuilt sorted terms and top-k lists (e.g. from an index artifact) without copying"""
+        index = cls.__new__(cls)
+        index.blob = blob
+        index.offsets = offsets
+        index.rows = rows
+        index.popularity = popularity
+        index.terms = _PackedTerms(blob, offsets, base)
+        index.max_scan = max_scan
+        index._precompute_k = precompute_k
+        index._precomputed = precomputed
+        return index
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the packed arrays"""
+        return int(self.offsets[-1]) + self.offsets.nbytes + self.rows.nbytes + self.popularity.nbytes
+
+    def _range(self, prefix: bytes) -> Tuple[int, int]:
+        # 0xff never occurs in UTF-8, so prefix + 0xff sorts after every extension
+        lo = bisect_left(self.terms, prefix)
+        return lo, bisect_left(self.terms, prefix + b"\xff", lo)
+
+    def _rank_range(self, lo: int, hi: int, k: int) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        if lo == hi:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64), []
+
+        if hi - lo <= self.SMALL_RANGE:
+            return self._rank_small_range(lo, hi, k)
+
+        # One entry per concept, reporting its alphabetically first matching term
+        rows, first = np.unique(self.rows[lo:hi], return_index=True)
+        scores = self.popularity[rows]
+        if len(rows) > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            rows, first, scores = rows[keep], first[keep], scores[keep]
+        order = np.lexsort((rows, -scores))
+        matched = [self.terms[lo + i].decode() for i in first[order].tolist()]
+        return rows[order], scores[order], matched
+
+    def _rank_small_range(self, lo: int, hi: int, k: int) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        # Plain Python beats NumPy call overhead for a handful of entries
+        first: Dict[int, int] = {}
+        for offset, row in enumerate(self.rows[lo:hi].tolist()):
+            first.setdefault(row, offset)
+        rows = list(first)
+        scores = self.popularity[rows].tolist()
+        ranked = sorted(zip(scores, rows), key=lambda item: (-item[0], item[1]))[:k]
+        matched = [self.terms[lo + first[row]].decode() for _, row in ranked]
+        return (np.array([row for _, row in ranked], dtype=np.int32),
+                np.array([score for score, _ in ranked], dtype=np.float64), matched)
+
+    def top_k(self, prefix: str, k: int) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """Return (concept rows, popularity, matched terms) for the `k` most popular
+        concepts having a term that starts with `prefix`
+        """
+        key = normalize_term(prefix).encode()
+        if k <= 0 or not key:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64), []
+        cached = self._precomputed.get(key)
+        if cached is not None and k <= self._precompute_k:
+            rows, scores, matched = cached
+            return rows[:k], scores[:k], matched[:k]
+        return self._rank_range(*self._range(key), k)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Response serialization fast path
+Every concept's JSON object is encoded once per lexicon snapshot (reusing
+the bytes of unchanged concepts from the previous one) into one buffer;
+responses splice those bytes with the few per-request fields and go out as
+prebuilt bodies, skipping FastAPI's jsonable_encoder and JSONResponse
+rendering. orjson is used when installed, the standard library otherwise.
+"""
+
+import json
+from array import array
+from itertools import accumulate
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from fastapi.responses import Response
+
+from concept_store import ConceptStore
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library encoder writes the same JSON
+    orjson = None
+
+
+def dumps(value) -> bytes:
+    """Compact UTF-8 JSON: the document JSONResponse renders for plain values"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class RawJSON(bytes):
+    """Already-encoded JSON, spliced into a response as it is"""
+
+
+# Encoded '"key":' prefixes of the response fields seen so far (a handful)
+_MEMBER_PREFIXES: Dict[str, bytes] = {}
+MAX_MEMBER_PREFIXES = 1024
+
+
+def _member_prefix(key) -> bytes:
+    prefix = _MEMBER_PREFIXES.get(key)
+    if prefix is None:
+        prefix = dumps(str(key)) + b":"
+        if len(_MEMBER_PREFIXES) < MAX_MEMBER_PREFIXES:
+            _MEMBER_PREFIXES[key] = prefix
+    return prefix
+
+
+def encode(value) -> bytes:
+    """JSON for `value`, copying RawJSON parts verbatim
+
+    Only dicts and lists on the way to a RawJSON part are walked in Python;
+    hand plain subtrees over already encoded (RawJSON(dumps(...))).
+    """
+    if isinstance(value, RawJSON):
+        return value
+    if isinstance(value, dict):
+        return b"{" + b",".join([_member_prefix(key) + encode(item) for key, item in value.items()]) + b"}"
+    if isinstance(value, (list, tuple)):
+        return b"[" + b",".join([encode(item) for item in value]) + b"]"
+    return dumps(value)
+
+
+class JSONBytesResponse(Response):
+    """application/json response with a body encoded up front"""
+    media_type = "application/json"
+
+
+class ConceptJSON:
+    """ConceptRecord.to_dict() of every concept, encoded once, in store row order
+
+    The objects share one bytes buffer; `offsets[row]:offsets[row + 1]` is
+    the object of store row `row`.
+    """
+
+    def __init__(self, store: ConceptStore, previous: Optional['ConceptJSON'] = None,
+                 changed: Iterable[int] = ()):
+        self.store = store
+        changed = set(changed)
+        parts, reused = [], 0
+        for record in store.records:
+            part = None
+            if previous is not None and record.concept_id not in changed:
+                part = previous._object(record.concept_id)
+            if part is None:
+                part = dumps(record.to_dict())
+            else:
+                reused += 1
+            parts.append(part)
+        self.buffer = b"".join(parts)
+        self.offsets = array("q", [0])
+        self.offsets.extend(accumulate(map(len, parts)))
+        self.reused = reused
+
+    def _object(self, concept_id: int) -> Optional[bytes]:
+        row = self.store.row_of(concept_id)
+        if row is None:
+            return None
+        return self.buffer[self.offsets[row]:self.offsets[row + 1]]
+
+    def concept(self, concept_id: int) -> Optional[RawJSON]:
+        """The concept's object, or None if it is not in the store"""
+        obj = self._object(concept_id)
+        return RawJSON(obj) if obj is not None else None
+
+    def search_hits(self, hits: Sequence[Tuple[int, float]]) -> RawJSON:
+        """Array of SearchHit.to_dict() objects for (concept id, match score) pairs
+
+        A concept missing from this snapshot (hits from a process worker
+        still on the previous generation) is left out.
+        """
+        row_of, buffer, offsets = self.store.row_of, self.buffer, self.offsets
+        scores = dumps([score for _, score in hits])[1:-1].split(b",")
+        objects = []
+        for (concept_id, _), score in zip(hits, scores):
+            row = row_of(concept_id)
+            if row is not None:
+                # The object without its closing brace, then the extra member
+                objects.append(buffer[offsets[row]:offsets[row + 1] - 1] + b',"match_score":' + score + b"}")
+        return RawJSON(b"[" + b",".join(objects) + b"]")
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buffer) + self.offsets.itemsize * len(self.offsets)
+
+    def stats(self) -> Dict:
+        return {"concepts": len(self.offsets) - 1, "bytes": self.nbytes, "reused": self.reused,
+                "encoder": "orjson" if orjson is not None else "json"}
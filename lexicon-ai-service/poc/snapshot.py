@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Versioned lexicon snapshots with atomic hot reload
+Each snapshot bundles one generation of the lexicon (xaie_concepts,
+xaie_concept_relationships) with the engines built from it. Reloads build the
+next snapshot in the background and swap it in with a single reference
+assignment; requests that already hold the old snapshot keep using it.
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from concept_store import ConceptRecord, ConceptStore
+
+
+class SnapshotBusy(Exception):
+    """Raised when a reload is requested while another one is still building"""
+
+
+class LexiconChanges(NamedTuple):
+    """What differs between two lexicon generations"""
+    concepts: FrozenSet[int]   # added, removed or edited concept ids
+    diagnoses: FrozenSet[int]  # diagnoses whose recommendations may differ
+
+    def to_dict(self) -> Dict:
+        return {"concepts": len(self.concepts), "diagnoses": len(self.diagnoses)}
+
+
+def _record_fields(record: ConceptRecord) -> Tuple:
+    return (record.human_readable_code, record.canonical_name, record.indonesian_name,
+            record.concept_type, record.synonyms)
+
+
+def diff_lexicon(old_store: ConceptStore, old_relationships: Dict[int, List[Dict]],
+                 new_store: ConceptStore, new_relationships: Dict[int, List[Dict]]) -> LexiconChanges:
+    """Concepts that changed, and diagnoses whose relationships or target concepts changed"""
+    concepts = {record.concept_id for record in old_store if record.concept_id not in new_store}
+    for record in new_store:
+        old = old_store.get(record.concept_id)
+        if old is None or _record_fields(old) != _record_fields(record):
+            concepts.add(record.concept_id)
+
+    diagnoses = set()
+    for diagnosis_id in old_relationships.keys() | new_relationships.keys():
+        rels = new_relationships.get(diagnosis_id)
+        if rels != old_relationships.get(diagnosis_id):
+            diagnoses.add(diagnosis_id)
+        elif any(rel['target_id'] in concepts for rel in rels):
+            diagnoses.add(diagnosis_id)
+    return LexiconChanges(frozenset(concepts), frozenset(diagnoses))
+
+
+class LexiconSnapshot:
+    """One immutable generation of the lexicon and every engine built from it"""
+
+    def __init__(self, version: int, store: ConceptStore, relationships: Dict[int, List[Dict]],
+                 search_engine: Any, cds_engine: Any, fhir_processor: Any,
+                 changes: Optional[LexiconChanges] = None, rebuilt: Tuple[str, ...] = (),
+                 fingerprint: bytes = b"", concept_json: Any = None):
+        self.version = version
+        self.store = store
+        self.relationships = relationships
+        self.search_engine = search_engine
+        self.cds_engine = cds_engine
+        self.fhir_processor = fhir_processor
+        self.changes = changes      # None for the initial load
+        self.rebuilt = rebuilt      # names of the indexes built (not carried over)
+        self.fingerprint = fingerprint  # digest of the searchable fields, in row order
+        self.concept_json = concept_json  # every concept's API payload, pre-encoded
+        self.built_at = time.time()
+        self.build_seconds = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "concepts": len(self.store),
+            "diagnoses_with_relationships": len(self.relationships),
+            "built_at": self.built_at,
+            "build_seconds": round(self.build_seconds, 3),
+            "changes": self.changes.to_dict() if self.changes else None,
+            "rebuilt": list(self.rebuilt),
+            "fingerprint": self.fingerprint.hex(),
+            "concept_json": self.concept_json.stats() if self.concept_json is not None else None,
+        }
+
+
+# builder(version, concepts, relationships, previous snapshot or None) -> snapshot
+SnapshotBuilder = Callable[[int, List[Dict], Dict[int, List[Dict]], Optional[LexiconSnapshot]], LexiconSnapshot]
+
+
+class SnapshotManager:
+    """Holds the current snapshot and replaces it without blocking requests
+
+    Readers take `current` once per request and use that object throughout;
+    the swap is a single attribute assignment on the event loop, so a reader
+    never sees a half-built generation. Builds run in a worker thread, one
+    at a time, each diffed against the snapshot current when it started.
+    Listeners are called with (old, new) after every swap; old is None for
+    the first snapshot when the manager starts without a lexicon (the first
+    `reload` then builds generation 1 from scratch).
+    """
+
+    def __init__(self, builder: SnapshotBuilder, concepts: Optional[List[Dict]] = None,
+                 relationships: Optional[Dict[int, List[Dict]]] = None):
+        self._builder = builder
+        self._lock = asyncio.Lock()
+        self.listeners: List[Callable[[Optional[LexiconSnapshot], LexiconSnapshot], None]] = []
+        self.reloads = 0
+        self.failures = 0
+        self.current: Optional[LexiconSnapshot] = None
+        if concepts is not None:
+            self.current = self._build(concepts, relationships or {}, None)
+
+    @property
+    def building(self) -> bool:
+        return self._lock.locked()
+
+    def _build(self, concepts: List[Dict], relationships: Dict[int, List[Dict]],
+               previous: Optional[LexiconSnapshot]) -> LexiconSnapshot:
+        started = time.perf_counter()
+        version = previous.version + 1 if previous else 1
+        snapshot = self._builder(version, concepts, relationships, previous)
+        snapshot.build_seconds = time.perf_counter() - started
+        return snapshot
+
+    def swap(self, snapshot: LexiconSnapshot) -> LexiconSnapshot:
+        """Make `snapshot` current and notify listeners; returns the replaced one"""
+        previous, self.current = self.current, snapshot
+        for listener in self.listeners:
+            listener(previous, snapshot)
+        return previous
+
+    async def reload(self, concepts: List[Dict], relationships: Dict[int, List[Dict]]) -> LexiconSnapshot:
+        """Build the next snapshot off the event loop, then swap it in"""
+        if self._lock.locked():
+            raise SnapshotBusy(f"Snapshot {self.current.version + 1 if self.current else 1} is still building")
+        async with self._lock:
+            previous = self.current
+            try:
+                snapshot = await asyncio.get_running_loop().run_in_executor(
+                    None, self._build, concepts, relationships, previous)
+            except Exception:
+                self.failures += 1
+                raise
+            self.swap(snapshot)
+            self.reloads += 1
+            return snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **(self.current.stats() if self.current is not None else {"version": 0}),
+            "building": self.building,
+            "reloads": self.reloads,
+            "failed_reloads": self.failures,
+        }
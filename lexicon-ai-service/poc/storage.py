@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+Database-backed lexicon storage
+Reads xaie_concepts / xaie_synonyms / xaie_code_mappings /
+xaie_concept_relationships (database/schema.sql) through a pooled asyncpg
+connection, with SQLite as a local stand-in. Bulk paths stream through
+server-side cursors and COPY in fixed-size chunks, so memory stays bounded
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import re
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from concept_store import ConceptRecord
+
+try:
+    import asyncpg
+except ImportError:  # Only needed for postgresql:// URLs
+    asyncpg = None
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database", "schema.sql")
+
+# Rows fetched per cursor round trip / written per COPY chunk
+FETCH_SIZE = 10000
+COPY_CHUNK_SIZE = 50000
+
+ACTIVE_STATUS = "Active"
+
+# The Indonesian name is the official translation synonym; other synonyms stay synonyms
+TRANSLATION_LANGUAGE = "id"
+TRANSLATION_TERM_TYPE = "Official Translation"
+
+CONCEPT_COLUMNS = ("concept_id", "human_readable_code", "canonical_name", "concept_type", "status")
+SYNONYM_COLUMNS = ("concept_id", "term", "language_code", "term_type")
+CODE_MAPPING_COLUMNS = ("concept_id", "coding_system_name", "code_value", "code_description")
+RELATIONSHIP_COLUMNS = ("source_concept_id", "target_concept_id", "relationship_type", "commonality_score",
+                        "priority_score", "contextual_commonality")
+
+# ===================================================================
+# QUERIES
+# ===================================================================
+#
+# Written with $n placeholders (asyncpg); SQLite gets them rewritten to "?".
+# Orderings follow the schema's indexes so Postgres streams them without a sort.
+
+CONCEPTS_SQL = """
+SELECT c.concept_id, c.human_readable_code, c.canonical_name, c.concept_type,
+       s.term, s.language_code, s.term_type
+FROM xaie_concepts c
+LEFT JOIN xaie_synonyms s ON s.concept_id = c.concept_id AND s.is_active
+WHERE c.status = $1
+ORDER BY c.concept_id, s.synonym_id
+"""
+
+# idx_relationships_source (source_concept_id, priority_score DESC)
+RELATIONSHIPS_SQL = """
+SELECT source_concept_id, target_concept_id, relationship_type, priority_score,
+       commonality_score, contextual_commonality
+FROM xaie_concept_relationships
+WHERE is_active
+ORDER BY source_concept_id, priority_score DESC
+"""
+
+RELATIONSHIPS_FOR_SQL = """
+SELECT source_concept_id, target_concept_id, relationship_type, priority_score,
+       commonality_score, contextual_commonality
+FROM xaie_concept_relationships
+WHERE source_concept_id = $1 AND is_active
+ORDER BY priority_score DESC
+LIMIT $2
+"""
+
+# xaie_fhir_mappings carries the mapping confidence when there is one
+CODE_MAPPINGS_SQL = """
+SELECT m.concept_id, m.coding_system_name, m.code_value, m.code_description,
+       (SELECT max(f.mapping_confidence) FROM xaie_fhir_mappings f
+        WHERE f.concept_id = m.concept_id AND f.fhir_code = m.code_value) AS mapping_confidence
+FROM xaie_code_mappings m
+"""
+
+# idx_code_mappings_system_value
+CODE_LOOKUP_SQL = """
+SELECT concept_id, code_description FROM xaie_code_mappings
+WHERE coding_system_name = $1 AND code_value = $2
+"""
+
+# idx_synonyms_term_trgm: `%` is the indexable pg_trgm similarity operator
+# (pg_trgm.similarity_threshold, default 0.3 like TrigramIndex)
+SEARCH_SYNONYMS_SQL = """
+SELECT s.concept_id, max(similarity(s.term, $1)) AS score
+FROM xaie_synonyms s
+WHERE s.term % $1 AND s.is_active
+GROUP BY s.concept_id
+ORDER BY score DESC, s.concept_id
+LIMIT $2
+"""
+
+COUNT_CONCEPTS_SQL = "SELECT count(*) FROM xaie_concepts"
+
+# Bulk loads write explicit concept ids; move the BIGSERIAL past them for later inserts
+SYNC_CONCEPT_ID_SQL = """
+SELECT setval(pg_get_serial_sequence('xaie_concepts', 'concept_id'), max(concept_id))
+FROM xaie_concepts
+"""
+
+# SQLite has no trigram index: substring match, shorter terms ranked higher
+SQLITE_SEARCH_SYNONYMS_SQL = """
+SELECT s.concept_id, max(CAST(length($1) AS REAL) / length(s.term)) AS score
+FROM xaie_synonyms s
+WHERE lower(s.term) LIKE '%' || lower($1) || '%' AND s.is_active
+GROUP BY s.concept_id
+ORDER BY score DESC, s.concept_id
+LIMIT $2
+"""
+
+# Tables the POC reads, in SQLite syntax (the Postgres schema is database/schema.sql)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS xaie_concepts (
+    concept_id INTEGER PRIMARY KEY,
+    human_readable_code TEXT UNIQUE,
+    canonical_name TEXT NOT NULL,
+    definition TEXT,
+    concept_type TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'Pending Review'
+);
+CREATE TABLE IF NOT EXISTS xaie_synonyms (
+    synonym_id INTEGER PRIMARY KEY,
+    concept_id INTEGER NOT NULL REFERENCES xaie_concepts(concept_id) ON DELETE CASCADE,
+    term TEXT NOT NULL,
+    language_code TEXT NOT NULL,
+    term_type TEXT NOT NULL,
+    is_active BOOLEAN NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS xaie_code_mappings (
+    mapping_id INTEGER PRIMARY KEY,
+    concept_id INTEGER NOT NULL REFERENCES xaie_concepts(concept_id) ON DELETE CASCADE,
+    coding_system_name TEXT NOT NULL,
+    code_value TEXT NOT NULL,
+    code_description TEXT,
+    UNIQUE (concept_id, coding_system_name, code_value)
+);
+CREATE TABLE IF NOT EXISTS xaie_fhir_mappings (
+    id INTEGER PRIMARY KEY,
+    concept_id INTEGER NOT NULL REFERENCES xaie_concepts(concept_id),
+    fhir_resource_type TEXT,
+    fhir_system TEXT,
+    fhir_code TEXT,
+    mapping_confidence REAL DEFAULT 1.0,
+    UNIQUE (concept_id, fhir_system, fhir_code)
+);
+CREATE TABLE IF NOT EXISTS xaie_concept_relationships (
+    relationship_id INTEGER PRIMARY KEY,
+    source_concept_id INTEGER NOT NULL REFERENCES xaie_concepts(concept_id) ON DELETE CASCADE,
+    target_concept_id INTEGER NOT NULL REFERENCES xaie_concepts(concept_id) ON DELETE CASCADE,
+    relationship_type TEXT NOT NULL,
+    commonality_score REAL,
+    priority_score REAL,
+    contextual_commonality TEXT,
+    is_active BOOLEAN NOT NULL DEFAULT 1,
+    UNIQUE (source_concept_id, target_concept_id, relationship_type)
+);
+CREATE INDEX IF NOT EXISTS idx_synonyms_concept_id ON xaie_synonyms(concept_id);
+CREATE INDEX IF NOT EXISTS idx_code_mappings_system_value ON xaie_code_mappings(coding_system_name, code_value);
+CREATE INDEX IF NOT EXISTS idx_relationships_source ON xaie_concept_relationships(source_concept_id, priority_score DESC);
+"""
+
+
+def context_boosts(contextual_commonality: Any, commonality: Optional[float]) -> Dict[str, float]:
+    """CLINICAL_RELATIONSHIPS-style context boosts from a relationship row
+
+    A context ("Manado_WET", "WET") boosts a relationship by how much more
+    common the pairing is there than overall.
+    """
+    if isinstance(contextual_commonality, str):
+        contextual_commonality = json.loads(contextual_commonality)
+    if not contextual_commonality or commonality is None:
+        return {}
+    return {key: round(value - commonality, 4)
+            for key, value in contextual_commonality.items() if value > commonality}
+
+
+def relationship_from_row(row) -> Dict:
+    return {
+        "target_id": row["target_concept_id"],
+        "type": row["relationship_type"],
+        "priority": row["priority_score"] or 0.0,
+        "context_boost": context_boosts(row["contextual_commonality"], row["commonality_score"]),
+    }
+
+# ===================================================================
+# REPOSITORIES
+# ===================================================================
+
+class LexiconRepository(ABC):
+    """Lexicon reads and bulk writes over a backend's four primitives
+
+    Backends implement `stream` (server-side cursor), `fetch`, `copy_rows`
+    and `close`; every query and load path is written once here.
+    """
+
+    search_sql = SEARCH_SYNONYMS_SQL
+
+    @abstractmethod
+    def stream(self, sql: str, *args: Any, fetch_size: int = FETCH_SIZE) -> AsyncIterator[Any]:
+        """Rows of a query, `fetch_size` at a time (an async generator)"""
+
+    @abstractmethod
+    async def fetch(self, sql: str, *args: Any) -> List[Any]:
+        """Every row of a (small) query"""
+
+    @abstractmethod
+    async def copy_rows(self, table: str, columns: Sequence[str], rows: Iterable[Tuple],
+                        chunk_size: int = COPY_CHUNK_SIZE) -> int:
+        """Bulk load rows into a table; returns the number loaded"""
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Release the connection (pool)"""
+
+    # ---- streaming loads --------------------------------------------
+
+    async def iter_concepts(self) -> AsyncIterator[ConceptRecord]:
+        """Active concepts with their synonyms, one record at a time (ordered by concept_id)"""
+        current, translation, synonyms = None, None, []
+        async for row in self.stream(CONCEPTS_SQL, ACTIVE_STATUS):
+            if current is None or row["concept_id"] != current["concept_id"]:
+                if current is not None:
+                    yield self._record(current, translation, synonyms)
+                current, translation, synonyms = row, None, []
+            term = row["term"]
+            if term is None:
+                continue
+            if (translation is None and row["language_code"] == TRANSLATION_LANGUAGE
+                    and row["term_type"] == TRANSLATION_TERM_TYPE):
+                translation = term
+            else:
+                synonyms.append(term)
+        if current is not None:
+            yield self._record(current, translation, synonyms)
+
+    @staticmethod
+    def _record(row, translation: Optional[str], synonyms: List[str]) -> ConceptRecord:
+        return ConceptRecord(row["concept_id"], row["human_readable_code"], row["canonical_name"],
+                             translation or row["canonical_name"], row["concept_type"], tuple(synonyms))
+
+    async def iter_relationships(self) -> AsyncIterator[Tuple[int, Dict]]:
+        """(source concept id, relationship) for every active relationship, best first per source"""
+        async for row in self.stream(RELATIONSHIPS_SQL):
+            yield row["source_concept_id"], relationship_from_row(row)
+
+    async def iter_code_mappings(self) -> AsyncIterator[Dict]:
+        """xaie_code_mappings rows in the shape CodeMappingIndex compiles"""
+        async for row in self.stream(CODE_MAPPINGS_SQL):
+            yield dict(zip(("concept_id", "coding_system_name", "code_value", "code_description",
+                            "mapping_confidence"), tuple(row)))
+
+    async def load_lexicon(self) -> Tuple[List[ConceptRecord], Dict[int, List[Dict]]]:
+        """Concept records and relationships for a snapshot build, streamed row by row"""
+        concepts = [record async for record in self.iter_concepts()]
+        relationships: Dict[int, List[Dict]] = {}
+        async for source_id, relationship in self.iter_relationships():
+            relationships.setdefault(source_id, []).append(relationship)
+        return concepts, relationships
+
+    # ---- point queries ----------------------------------------------
+
+    async def search_synonyms(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+        """(concept id, similarity) of the best synonym matches"""
+        return [(row[0], row[1]) for row in await self.fetch(self.search_sql, query, limit)]
+
+    async def relationships_for(self, source_id: int, limit: int = 50) -> List[Dict]:
+        return [relationship_from_row(row) for row in await self.fetch(RELATIONSHIPS_FOR_SQL, source_id, limit)]
+
+    async def lookup_code(self, system: str, code: str) -> Optional[Tuple[int, Optional[str]]]:
+        """(concept id, description) of an exact code mapping"""
+        rows = await self.fetch(CODE_LOOKUP_SQL, system, code)
+        return (rows[0][0], rows[0][1]) if rows else None
+
+    # ---- bulk writes --------------------------------------------------
+
+    async def count_concepts(self) -> int:
+        return (await self.fetch(COUNT_CONCEPTS_SQL))[0][0]
+
+    async def sync_id_sequences(self) -> None:
+        """Let generated ids continue after explicitly loaded ones (no-op where ids need no sequence)"""
+
+    async def copy_concepts(self, concepts: Iterable[Dict]) -> Tuple[int, int]:
+        """Bulk load concept dicts (SAMPLE_CONCEPTS shape) as concepts plus synonyms
+
+        Concepts are read once, a chunk at a time: each chunk's concept rows
+        are loaded before its synonym rows, so only one chunk is held.
+        """
+        loaded = synonyms = 0
+        for chunk in _chunks(concepts, COPY_CHUNK_SIZE):
+            loaded += await self.copy_rows("xaie_concepts", CONCEPT_COLUMNS, concept_rows(chunk))
+            synonyms += await self.copy_rows("xaie_synonyms", SYNONYM_COLUMNS, synonym_rows(chunk))
+        return loaded, synonyms
+
+
+def concept_rows(concepts: Iterable[Dict]) -> Iterable[Tuple]:
+    """xaie_concepts rows for concept dicts"""
+    for concept in concepts:
+        yield (concept["concept_id"], concept.get("human_readable_code"), concept["canonical_name"],
+               concept["concept_type"], ACTIVE_STATUS)
+
+
+def synonym_rows(concepts: Iterable[Dict]) -> Iterable[Tuple]:
+    """xaie_synonyms rows for concept dicts: the Indonesian name, then each synonym"""
+    for concept in concepts:
+        yield concept["concept_id"], concept["indonesian_name"], TRANSLATION_LANGUAGE, TRANSLATION_TERM_TYPE
+        for term in concept.get("synonyms", ()):
+            yield concept["concept_id"], term, TRANSLATION_LANGUAGE, "Synonym"
+
+
+def code_mapping_rows(mappings: Iterable[Dict]) -> Iterable[Tuple]:
+    """xaie_code_mappings rows for mapping dicts (mapping_confidence belongs to xaie_fhir_mappings)"""
+    for mapping in mappings:
+        yield tuple(mapping.get(column) for column in CODE_MAPPING_COLUMNS)
+
+
+def relationship_rows(relationships: Dict[int, List[Dict]]) -> Iterable[Tuple]:
+    """xaie_concept_relationships rows for CLINICAL_RELATIONSHIPS-shaped data
+
+    Boosts are stored as contextual commonality over a base commonality of 0.
+    """
+    for source_id, rels in relationships.items():
+        for rel in rels:
+            yield (source_id, rel["target_id"], rel["type"], 0.0, rel["priority"],
+                   json.dumps(rel.get("context_boost", {})))
+
+
+def _chunks(rows: Iterable, size: int) -> Iterable[List]:
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class PostgresLexiconRepository(LexiconRepository):
+    """asyncpg pool; statements are prepared once per connection (statement cache)"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    @classmethod
+    async def connect(cls, dsn: str, min_size: int = 2, max_size: int = 10,
+                      statement_cache_size: int = 100) -> 'PostgresLexiconRepository':
+        if asyncpg is None:
+            raise RuntimeError("asyncpg is required for postgresql:// database URLs (pip install asyncpg)")
+        return cls(await asyncpg.create_pool(dsn, min_size=min_size, max_size=max_size,
+                                             statement_cache_size=statement_cache_size))
+
+    async def stream(self, sql: str, *args: Any, fetch_size: int = FETCH_SIZE) -> AsyncIterator[Any]:
+        async with self.pool.acquire() as conn:
+            # Server-side cursors only live inside a transaction
+            async with conn.transaction(readonly=True):
+                async for row in conn.cursor(sql, *args, prefetch=fetch_size):
+                    yield row
+
+    async def fetch(self, sql: str, *args: Any) -> List[Any]:
+        return await self.pool.fetch(sql, *args)
+
+    async def copy_rows(self, table: str, columns: Sequence[str], rows: Iterable[Tuple],
+                        chunk_size: int = COPY_CHUNK_SIZE) -> int:
+        """COPY rows in chunks, all in one transaction"""
+        copied = 0
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                for chunk in _chunks(rows, chunk_size):
+                    await conn.copy_records_to_table(table, records=chunk, columns=list(columns))
+                    copied += len(chunk)
+        return copied
+
+    async def create_schema(self) -> None:
+        with open(SCHEMA_PATH, encoding="utf-8") as f:
+            await self.pool.execute(f.read())
+
+    async def sync_id_sequences(self) -> None:
+        await self.pool.execute(SYNC_CONCEPT_ID_SQL)
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+
+class SQLiteLexiconRepository(LexiconRepository):
+    """Local stand-in: one connection, calls serialized and run off the event loop"""
+
+    search_sql = SQLITE_SEARCH_SYNONYMS_SQL
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _sql(sql: str) -> str:
+        # $n -> ?n, SQLite's numbered parameters
+        return re.sub(r"\$(\d+)", r"?\1", sql)
+
+    async def _call(self, fn, *args):
+        async with self._lock:
+            return await asyncio.to_thread(fn, *args)
+
+    async def stream(self, sql: str, *args: Any, fetch_size: int = FETCH_SIZE) -> AsyncIterator[Any]:
+        # The lock is held per round trip, never across a yield: the consumer
+        # may query the repository (or stop iterating) between rows
+        cursor = await self._call(self.connection.execute, self._sql(sql), args)
+        try:
+            while True:
+                rows = await self._call(cursor.fetchmany, fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            cursor.close()
+
+    async def fetch(self, sql: str, *args: Any) -> List[Any]:
+        return await self._call(lambda: self.connection.execute(self._sql(sql), args).fetchall())
+
+    async def copy_rows(self, table: str, columns: Sequence[str], rows: Iterable[Tuple],
+                        chunk_size: int = COPY_CHUNK_SIZE) -> int:
+        """Insert rows in chunks, all in one transaction"""
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+        def insert() -> int:
+            copied = 0
+            with self.connection:
+                for chunk in _chunks(rows, chunk_size):
+                    self.connection.executemany(sql, chunk)
+                    copied += len(chunk)
+            return copied
+
+        return await self._call(insert)
+
+    async def create_schema(self) -> None:
+        await self._call(self.connection.executescript, SQLITE_SCHEMA)
+
+    async def close(self) -> None:
+        await self._call(self.connection.close)
+
+
+async def open_repository(url: str) -> LexiconRepository:
+    """Repository for a DATABASE_URL: postgresql://... or sqlite:///path/to/file.db"""
+    if url.startswith(("postgresql://", "postgres://")):
+        return await PostgresLexiconRepository.connect(url)
+    if url.startswith("sqlite://"):
+        return SQLiteLexiconRepository(url[len("sqlite://"):].removeprefix("/") or ":memory:")
+    raise ValueError(f"Unsupported database URL scheme: {url.split(':', 1)[0]}")
+
+
+def database_backend(url: Optional[str]) -> str:
+    """Backend name of a DATABASE_URL without its credentials"""
+    return url.split(":", 1)[0] if url else "none"
+
+# ===================================================================
+# COMMAND LINE
+# ===================================================================
+
+async def _seed(args) -> None:
+    from synthetic_data import generate_code_mappings, generate_concepts, generate_locations, generate_relationships
+
+    repository = await open_repository(args.database_url)
+    try:
+        if args.create_schema:
+            await repository.create_schema()
+        existing = await repository.count_concepts()
+        if existing:
+            # Explicit concept ids would collide with the rows already there
+            print(f"xaie_concepts already has {existing} rows; seed only loads an empty database")
+            return
+        if args.concepts:
+            concepts = generate_concepts(args.concepts)
+            relationships = generate_relationships(concepts, generate_locations())
+            mappings = generate_code_mappings(args.concepts)
+        else:
+            from main import CLINICAL_RELATIONSHIPS, SAMPLE_CODE_MAPPINGS, SAMPLE_CONCEPTS
+            concepts, relationships, mappings = SAMPLE_CONCEPTS, CLINICAL_RELATIONSHIPS, SAMPLE_CODE_MAPPINGS
+        t0 = time.perf_counter()
+        loaded, synonyms = await repository.copy_concepts(concepts)
+        rels = await repository.copy_rows("xaie_concept_relationships", RELATIONSHIP_COLUMNS,
+                                          relationship_rows(relationships))
+        codes = await repository.copy_rows("xaie_code_mappings", CODE_MAPPING_COLUMNS, code_mapping_rows(mappings))
+        await repository.sync_id_sequences()
+        print(f"{loaded} concepts, {synonyms} synonyms, {rels} relationships, {codes} code mappings "
+              f"in {time.perf_counter() - t0:.1f}s")
+    finally:
+        await repository.close()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    seed = commands.add_parser("seed", help="Bulk load a lexicon into an empty database")
+    seed.add_argument("database_url")
+    seed.add_argument("--concepts", type=int, default=0, help="Synthetic lexicon size (default: the sample)")
+    seed.add_argument("--create-schema", action="store_true",
+                      help="Create the tables first (Postgres: database/schema.sql, whose sample rows "
+                           "then make the database non-empty, so nothing more is loaded)")
+    args = parser.parse_args()
+    asyncio.run(_seed(args))
+
+
+if __name__ == "__main__":
+    main_cli()
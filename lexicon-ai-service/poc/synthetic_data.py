@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generators for POC benchmarks
+Produces lexicons shaped like SAMPLE_CONCEPTS at arbitrary scale
+"""
+
+import random
+from typing import Dict, List
+
+CONCEPT_TYPES = ["DIAGNOSIS", "LAB_TEST", "MEDICATION", "PROCEDURE"]
+
+CONSONANTS = "bcdfghjklmnprstwyz"
+VOWELS = "aeiou"
+# Consonant-vowel(-consonant) syllables give a trigram distribution close to real
+# Indonesian/Latin medical vocabulary
+SYLLABLES = ([c + v for c in CONSONANTS for v in VOWELS]
+             + [c + v + e for c in CONSONANTS for v in VOWELS for e in "lmnrst"])
+
+
+def _make_vocabulary(rng: random.Random, size: int) -> List[str]:
+    """Generate `size` unique pseudo-medical words"""
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def _pick_words(rng: random.Random, vocabulary: List[str], count: int) -> List[str]:
+    """Pick words with a skewed (Zipf-like) distribution so some terms are common"""
+    size = len(vocabulary)
+    return [vocabulary[int(size * rng.random() ** 3)] for _ in range(count)]
+
+
+def generate_concepts(n: int, seed: int = 42) -> List[Dict]:
+    """Generate `n` concepts with canonical/Indonesian names and synonyms"""
+    rng = random.Random(seed)
+    vocabulary = _make_vocabulary(rng, max(1000, n // 4))
+
+    concepts = []
+    for i in range(n):
+        canonical = " ".join(_pick_words(rng, vocabulary, rng.randint(2, 3))).title()
+        indonesian = " ".join(_pick_words(rng, vocabulary, rng.randint(2, 3))).title()
+        synonyms = [" ".join(_pick_words(rng, vocabulary, rng.randint(1, 2))).title()
+                    for _ in range(rng.randint(1, 3))]
+        # Abbreviations like "DBD" / "CBC"
+        synonyms.append("".join(word[0] for word in indonesian.split()).upper())
+        concepts.append({
+            "concept_id": i + 1,
+            "canonical_name": canonical,
+            "indonesian_name": indonesian,
+            "concept_type": CONCEPT_TYPES[i % len(CONCEPT_TYPES)],
+            "synonyms": synonyms,
+        })
+    return concepts
+
+
+def sample_queries(concepts: List[Dict], n: int, seed: int = 7) -> List[str]:
+    """Sample realistic queries (names, synonyms, single words) from a lexicon"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n):
+        concept = rng.choice(concepts)
+        kind = rng.random()
+        if kind < 0.4:
+            queries.append(rng.choice(concept["synonyms"]))
+        elif kind < 0.7:
+            queries.append(concept["indonesian_name"])
+        else:
+            queries.append(rng.choice(concept["canonical_name"].split()))
+    return queries
+
+
+ICD10_SAMPLE_CODES = ["A90", "A91", "J06.9", "R50.9", "K29.7", "E11.9", "I10", "A09"]
+
+
+def generate_claims(n: int, seed: int = 11):
+    """Lazily generate `n` simplified FHIR claims (a generator, for backfill-sized runs)"""
+    rng = random.Random(seed)
+    for i in range(n):
+        yield {
+            "resourceType": "Claim",
+            "id": f"CLAIM-{i + 1:08d}",
+            "patient_reference": f"Patient/PAT-{rng.randint(1, max(1, n // 3)):08d}",
+            "diagnosis_codes": rng.sample(ICD10_SAMPLE_CODES, rng.randint(1, 2)),
+            "procedure_codes": [],
+        }
+
+
+def generate_code_mappings(n_concepts: int, seed: int = 13):
+    """Lazily generate xaie_code_mappings rows: ICD-10 (3-5 char), ICD-9-CM and SNOMED CT codes"""
+    rng = random.Random(seed)
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    for category in range(min(n_concepts, 26 * 100)):
+        # Categories (A00) map to a concept; some subcategories (A00.1, A00.12) refine it
+        code = f"{letters[category // 100]}{category % 100:02d}"
+        yield {"concept_id": rng.randint(1, n_concepts), "coding_system_name": "ICD-10",
+               "code_value": code, "code_description": f"Category {code}"}
+        for sub in rng.sample(range(10), rng.randint(0, 6)):
+            yield {"concept_id": rng.randint(1, n_concepts), "coding_system_name": "ICD-10",
+                   "code_value": f"{code}.{sub}", "code_description": f"Subcategory {code}.{sub}"}
+            if rng.random() < 0.3:
+                yield {"concept_id": rng.randint(1, n_concepts), "coding_system_name": "ICD-10",
+                       "code_value": f"{code}.{sub}{rng.randint(0, 9)}", "code_description": "Extension"}
+    for i in range(n_concepts):
+        yield {"concept_id": i + 1, "coding_system_name": "SNOMED CT",
+               "code_value": str(rng.randint(10 ** 6, 10 ** 9)), "code_description": f"Concept {i + 1}",
+               "mapping_confidence": round(rng.uniform(0.7, 1.0), 2)}
+        if rng.random() < 0.2:
+            yield {"concept_id": i + 1, "coding_system_name": "ICD-9-CM",
+                   "code_value": f"{rng.randint(1, 999):03d}.{rng.randint(0, 99):02d}",
+                   "code_description": f"Concept {i + 1}"}
+
+
+SEASONS = ["WET", "DRY"]
+RELATIONSHIP_TYPES = ["HAS_DIAGNOSTIC_TEST", "HAS_TREATMENT"]
+
+
+def generate_locations(n: int = 514, seed: int = 17) -> List[str]:
+    """Synthetic kabupaten/kota names (Indonesia has 514 regencies and cities)"""
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < n:
+        names.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).title())
+    return sorted(names)
+
+
+def generate_relationships(concepts: List[Dict], locations: List[str], per_diagnosis: int = 10,
+                           boosts_per_relationship: int = 3, seed: int = 19) -> Dict[int, List[Dict]]:
+    """CLINICAL_RELATIONSHIPS-shaped data for every DIAGNOSIS concept"""
+    rng = random.Random(seed)
+    targets = [c["concept_id"] for c in concepts if c["concept_type"] != "DIAGNOSIS"]
+    relationships = {}
+    for concept in concepts:
+        if concept["concept_type"] != "DIAGNOSIS":
+            continue
+        rels = []
+        for target_id in rng.sample(targets, min(per_diagnosis, len(targets))):
+            boosts = {}
+            for _ in range(rng.randint(0, boosts_per_relationship)):
+                key = (rng.choice(SEASONS) if rng.random() < 0.3
+                       else f"{rng.choice(locations)}_{rng.choice(SEASONS)}")
+                boosts[key] = round(rng.uniform(0.05, 0.2), 2)
+            rels.append({"target_id": target_id, "type": rng.choice(RELATIONSHIP_TYPES),
+                         "priority": round(rng.uniform(0.5, 0.99), 2), "context_boost": boosts})
+        relationships[concept["concept_id"]] = rels
+    return relationships
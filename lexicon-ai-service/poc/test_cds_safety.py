@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Clinical safety checks for the CDS endpoints
+In-process (TestClient) assertions, run with `python -m pytest`: a curated
+contraindication must keep its target out of recommendations and pathways,
+whatever other relationships (imported or learned) point at it.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from cds_tables import ContextScoreTables, recommended_relationships
+from concept_store import ConceptStore
+from pathway import MAX_PATHWAY_DEPTH, PathwayEngine, PathwayGraph
+
+DBD, IBUPROFEN = 1, 5
+
+
+@pytest.fixture
+def client():
+    main.lexicon.current = main.build_snapshot(1, main.SAMPLE_CONCEPTS, main.CLINICAL_RELATIONSHIPS)
+    main.invalidate_result_caches()
+    return TestClient(main.app)
+
+
+def recommended_ids(client) -> set:
+    data = client.post("/api/v1/cds/recommendations",
+                       json={"diagnosis_id": DBD, "context": {"location": "Manado", "season": "WET"}}).json()
+    return {rec['concept']['concept_id'] for rec in data['recommendations']}
+
+
+def pathway_ids(client) -> set:
+    data = client.get(f"/api/v1/cds/pathway/{DBD}", params={"max_depth": 3}).json()
+    ids, steps = set(), list(data['pathway'])
+    while steps:
+        step = steps.pop()
+        ids.add(step['concept_id'])
+        steps.extend(step['next'])
+    return ids | {item['concept']['concept_id'] for item in data['treatments'] + data['diagnostic_tests']}
+
+
+def test_contraindicated_edge_is_never_recommended():
+    rels = [{"target_id": IBUPROFEN, "type": "HAS_TREATMENT", "priority": 0.8},
+            {"target_id": 3, "type": "HAS_TREATMENT", "priority": 0.85},
+            {"target_id": IBUPROFEN, "type": "HAS_CONTRAINDICATION", "priority": 1.0}]
+    assert [rel['target_id'] for rel in recommended_relationships(rels)] == [3]
+
+    store = ConceptStore(main.SAMPLE_CONCEPTS)
+    tables = ContextScoreTables(store, {DBD: rels})
+    assert [rec['concept']['concept_id'] for rec in tables.recommend(DBD, 'Manado', 'WET')] == [3]
+    graph = PathwayGraph.from_relationships({DBD: rels})
+    assert graph.num_edges == 1
+
+
+def test_learned_cooccurrence_does_not_override_contraindication(client):
+    assert IBUPROFEN not in recommended_ids(client)
+    encounters = [{"location": "Manado", "season": "WET",
+                   "concepts": [{"concept_id": DBD, "role": "DIAGNOSIS"},
+                                {"concept_id": IBUPROFEN, "role": "MEDICATION"}]} for _ in range(20)]
+    data = client.post("/api/v1/admin/relationships/learn", json={"encounters": encounters}).json()
+    assert data['lexicon']['version'] == 2
+
+    # The contraindication survives the merge, and nothing else points at the drug
+    rels = main.lexicon.current.relationships[DBD]
+    assert [rel['type'] for rel in rels if rel['target_id'] == IBUPROFEN] == ["HAS_CONTRAINDICATION"]
+    assert IBUPROFEN not in recommended_ids(client)
+    assert IBUPROFEN not in pathway_ids(client)
+
+    plan = {"diagnosis_concept_id": DBD, "procedures": [2], "medications": [IBUPROFEN]}
+    result = client.post("/api/v1/cds/validate", json=plan).json()
+    assert not result['is_valid']
+    assert {"severity": "CRITICAL", "concept_id": IBUPROFEN} in [
+        {"severity": issue['severity'], "concept_id": issue['concept_id']} for issue in result['issues']]
+
+
+def test_contraindication_holds_through_intermediate_steps(client):
+    # Dengue -> Complete Blood Count -> Ibuprofen, while Dengue contraindicates Ibuprofen
+    relationships = {**main.CLINICAL_RELATIONSHIPS,
+                     2: [{"target_id": IBUPROFEN, "type": "HAS_TREATMENT", "priority": 0.88}]}
+    main.lexicon.current = main.build_snapshot(2, main.SAMPLE_CONCEPTS, relationships)
+    main.invalidate_result_caches()
+    assert IBUPROFEN not in pathway_ids(client)
+    assert IBUPROFEN not in recommended_ids(client)
+
+    # The memoized Complete Blood Count subtree still reaches Ibuprofen from a root without the contraindication
+    steps = main.lexicon.current.cds_engine.pathways.steps(2, max_depth=1)
+    assert [step.concept_id for step in steps] == [IBUPROFEN]
+
+
+def test_relationship_to_a_missing_concept_is_skipped(client):
+    relationships = {DBD: [*main.CLINICAL_RELATIONSHIPS[DBD],
+                           {"target_id": 99, "type": "HAS_DIAGNOSTIC_TEST", "priority": 0.99}]}
+    assert client.post("/api/v1/admin/lexicon/reload", json={"relationships": relationships}).status_code == 200
+
+    response = client.post("/api/v1/cds/validate", json={"diagnosis_concept_id": DBD, "procedures": [2]})
+    assert response.status_code == 200
+    assert 99 not in [suggestion['concept']['concept_id'] for suggestion in response.json()['suggestions']]
+    assert 99 not in recommended_ids(client) | pathway_ids(client)
+
+
+def test_pathway_limits_are_checked_before_walking(client):
+    for params in ({"max_depth": 3000000, "max_branch": 7}, {"max_depth": 50, "max_branch": 1},
+                   {"max_depth": 0}, {"max_branch": 10 ** 30}):
+        assert client.get(f"/api/v1/cds/pathway/{DBD}", params=params).status_code == 400
+
+    # A cycle with a branch of 1 is walked to the depth bound, never recursed into without end
+    graph = PathwayGraph.from_relationships({1: [{"target_id": 2, "type": "HAS_DIAGNOSTIC_TEST", "priority": 0.9}],
+                                             2: [{"target_id": 1, "type": "HAS_TREATMENT", "priority": 0.9}]})
+    steps = PathwayEngine(ConceptStore(main.SAMPLE_CONCEPTS), graph).steps(DBD, max_depth=100000, max_branch=1)
+    depth = 0
+    while steps:
+        depth, steps = depth + 1, steps[0].children
+    assert depth == MAX_PATHWAY_DEPTH
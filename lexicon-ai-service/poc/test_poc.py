@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 """
 Test script for Lexicon AI Service POC
+Sequential functional walkthrough of each endpoint; for behaviour under
+concurrent load use load_generator.py
 """
 
 import requests
@@ -21,7 +23,8 @@ def test_concept_search():
     """Test concept search functionality"""
     print("🔍 Testing Concept Search...")
     
-    test_queries = ["DBD", "darah lengkap", "paracetamol", "demam"]
+    test_queries = ["DBD", "darah lengkap", "paracetamol", "demam",
+                    "demm berdarah", "trombosyt", "parase"]  # typos / partial words
     
     for query in test_queries:
         response = requests.get(f"{BASE_URL}/api/v1/concepts/search", params={"q": query})
@@ -33,6 +36,54 @@ def test_concept_search():
             print(f"  Top match: {top_result['canonical_name']} ({top_result['indonesian_name']}) - Score: {top_result['match_score']:.3f}")
         print()
 
+def test_batch_search():
+    """Test batch concept search (all terms of one claim in one call)"""
+    print("📦 Testing Batch Search...")
+    
+    queries = ["DBD", "darah lengkap", "trombosit", "panadol"]
+    response = requests.post(f"{BASE_URL}/api/v1/concepts/search/batch", json={"queries": queries, "limit": 3})
+    data = response.json()
+    
+    for item in data['results']:
+        top = item['results'][0]['canonical_name'] if item['results'] else 'no match'
+        print(f"Query: '{item['query']}' -> {top}")
+    print()
+
+def test_autocomplete():
+    """Test prefix autocomplete"""
+    print("⌨️  Testing Autocomplete...")
+    
+    for prefix in ["d", "dar", "trom", "pan"]:
+        response = requests.get(f"{BASE_URL}/api/v1/concepts/autocomplete", params={"q": prefix, "limit": 5})
+        data = response.json()
+        suggestions = [f"{r['canonical_name']} ({r['matched_term']})" for r in data['results']]
+        print(f"Prefix: '{prefix}' -> {', '.join(suggestions) or 'no suggestions'}")
+    print()
+
+def test_code_mapping():
+    """Test external code mapping with hierarchical fallback"""
+    print("🔗 Testing Code Mapping...")
+    
+    test_codes = [("ICD-10", "A90"), ("ICD-10", "A91.23"), ("SNOMED", "1002005"), ("ICD-10", "Z99.9")]
+    
+    for system, code in test_codes:
+        response = requests.get(f"{BASE_URL}/api/v1/mapping/{system}/{code}")
+        if response.status_code == 404:
+            print(f"{system} {code}: not mapped")
+            continue
+        data = response.json()
+        print(f"{system} {code} -> {data['concept']['indonesian_name']} "
+              f"(matched {data['matched_code']}, {data['match_type']}, "
+              f"confidence {data['mapping_confidence']:.2f})")
+    
+    response = requests.post(
+        f"{BASE_URL}/api/v1/mapping/batch",
+        json={"codes": [{"system": system, "code": code} for system, code in test_codes]}
+    )
+    data = response.json()
+    print(f"Batch: {data['mapped']}/{data['total']} codes mapped in one call")
+    print()
+
 def test_clinical_recommendations():
     """Test clinical decision support"""
     print("🧠 Testing Clinical Recommendations...")
@@ -58,6 +109,79 @@ def test_clinical_recommendations():
             print(f"    Reason: {rec['reason']}")
         print()
 
+def test_clinical_pathway():
+    """Test multi-hop clinical pathways"""
+    print("🛤️  Testing Clinical Pathway...")
+    
+    response = requests.get(f"{BASE_URL}/api/v1/cds/pathway/1",
+                            params={"location": "Manado", "season": "WET", "max_depth": 3})
+    data = response.json()
+    
+    def show(steps, indent="  "):
+        for step in steps:
+            print(f"{indent}{step['type']} -> {step['canonical_name']} (path score: {step['path_score']:.2f})")
+            show(step['next'], indent + "  ")
+    
+    print(f"Pathway for {data['diagnosis']['indonesian_name']}:")
+    show(data['pathway'])
+    print(f"Tests: {[t['concept']['indonesian_name'] for t in data['diagnostic_tests']]}")
+    print(f"Treatments: {[t['concept']['indonesian_name'] for t in data['treatments']]}")
+    print(f"Insights: {data['contextual_insights']}")
+    print()
+
+def test_treatment_validation():
+    """Test treatment plan validation (single and batch)"""
+    print("🩺 Testing Treatment Plan Validation...")
+    
+    plans = [
+        {"diagnosis_concept_id": 1, "procedures": [2, 4], "medications": [3]},  # Complete dengue plan
+        {"diagnosis_concept_id": 1, "procedures": [2], "medications": [5]},     # NSAID for dengue
+    ]
+    
+    for plan, expected_valid in zip(plans, (True, False)):
+        data = requests.post(f"{BASE_URL}/api/v1/cds/validate", json=plan).json()
+        assert data['is_valid'] == expected_valid, data
+        print(f"Plan {plan['procedures'] + plan['medications']}: valid={data['is_valid']} "
+              f"(confidence: {data['confidence']})")
+        for issue in data['issues']:
+            print(f"  {issue['severity']}: {issue['message']}")
+        for suggestion in data['suggestions']:
+            print(f"  Suggest: {suggestion['concept']['canonical_name']} ({suggestion['reason']})")
+    
+    data = requests.post(f"{BASE_URL}/api/v1/cds/validate/batch", json={"plans": plans * 500}).json()
+    assert (data['total'], data['invalid']) == (1000, 500), data
+    print(f"Batch: {data['total']} plans, {data['invalid']} invalid")
+    print()
+
+def test_graphql_pathway():
+    """Test the GraphQL clinical pathway query (as sent by the TPA integration)"""
+    print("🕸️  Testing GraphQL Clinical Pathway...")
+    
+    query = """
+    query getClinicalPathway($diagnosisId: Int!, $context: ClinicalContextInput) {
+        getClinicalPathway(diagnosisId: $diagnosisId, context: $context) {
+            diagnosis { canonical_name }
+            treatments { concept { canonical_name } priority_score }
+            diagnosticTests { concept { canonical_name } priority_score }
+        }
+    }
+    """
+    response = requests.post(f"{BASE_URL}/api/v1/graphql", json={
+        "query": query,
+        "variables": {"diagnosisId": 1, "context": {"location": "Manado", "season": "WET"}}
+    })
+    pathway = response.json()['data']['getClinicalPathway']
+    
+    print(f"Diagnosis: {pathway['diagnosis']['canonical_name']}")
+    for item in pathway['diagnosticTests'] + pathway['treatments']:
+        print(f"  {item['concept']['canonical_name']} (priority: {item['priority_score']:.2f})")
+    
+    # Over the depth limit: rejected before it runs
+    deep = "{ getClinicalPathway(diagnosisId: 1) { pathway { " + "next { " * 10 + "concept_id" + " }" * 11 + " } }"
+    response = requests.post(f"{BASE_URL}/api/v1/graphql", json={"query": deep})
+    print(f"Deep query: HTTP {response.status_code} - {response.json()['errors'][0]['message']}")
+    print()
+
 def test_fhir_processing():
     """Test FHIR claim processing"""
     print("📋 Testing FHIR Claim Processing...")
@@ -88,6 +212,101 @@ def test_fhir_processing():
             print(f"  - {rec['concept']['indonesian_name']} (Priority: {rec['priority_score']:.2f})")
     print()
 
+def test_bulk_fhir_processing():
+    """Test bulk FHIR claim processing (NDJSON in, NDJSON out)"""
+    print("🚚 Testing Bulk FHIR Claim Processing...")
+    
+    claims = [
+        {"resourceType": "Claim", "id": f"CLAIM-BULK-{i:03d}", "patient_reference": "Patient/PAT-001",
+         "diagnosis_codes": ["A90"], "procedure_codes": []}
+        for i in range(5)
+    ]
+    body = "\n".join(json.dumps(claim) for claim in claims) + "\n{not json}\n"
+    
+    response = requests.post(
+        f"{BASE_URL}/api/v1/fhir/claims/bulk",
+        params={"batch_size": 2},
+        data=body.encode(),
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    summary = lines[-1]['summary']
+    
+    for result in lines[:-1]:
+        print(f"  - {result.get('claim_id')}: {result['processing_status']}")
+    print(f"Claims: {summary['claims']} (errors: {summary['errors']})")
+    print(f"Throughput: {summary['claims_per_second']} claims/s")
+    print()
+
+def test_result_cache():
+    """Test that repeated searches and recommendations are served from the cache"""
+    print("🗄️ Testing Result Cache...")
+    
+    for _ in range(3):
+        requests.get(f"{BASE_URL}/api/v1/concepts/search", params={"q": "DBD"})
+        requests.post(f"{BASE_URL}/api/v1/cds/recommendations",
+                      json={"diagnosis_id": 1, "context": {"location": "Manado", "season": "WET"}})
+    
+    cache = requests.get(f"{BASE_URL}/api/v1/health").json()['cache']
+    for name, stats in cache.items():
+        print(f"{name}: hits {stats['hits']}, misses {stats['misses']}, "
+              f"evictions {stats['evictions']}, hit rate {stats['hit_rate']}")
+    
+    response = requests.post(f"{BASE_URL}/api/v1/admin/cache/invalidate")
+    print(f"Invalidated: {response.json()['invalidated']}")
+    print()
+
+def test_lexicon_reload():
+    """Test that a relationship reload swaps in a new snapshot without a restart"""
+    print("♻️ Testing Lexicon Reload...")
+    
+    before = requests.get(f"{BASE_URL}/api/v1/health").json()['lexicon']
+    response = requests.post(f"{BASE_URL}/api/v1/admin/lexicon/reload", json={})
+    data = response.json()
+    print(f"Version {before['version']} -> {data['version']} in {data['build_seconds']}s")
+    print(f"Changes: {data['changes']}, rebuilt: {data['rebuilt'] or 'nothing'}")
+    print()
+
+def test_relationship_learning():
+    """Test learning DBD relationship scores from a batch of encounters"""
+    print("🧠 Testing Relationship Learning...")
+    
+    encounters = []
+    for i in range(200):
+        location, season = ["Manado", "Jakarta", "Surabaya"][i % 3], ["WET", "DRY"][i % 2]
+        concepts = [{"concept_id": 1, "role": "DIAGNOSIS"}, {"concept_id": 2, "role": "LAB_TEST"}]
+        if i % 3 == 0 or i % 5 == 0:
+            concepts.append({"concept_id": 4, "role": "LAB_TEST"})
+        if i % 4:
+            concepts.append({"concept_id": 3, "role": "MEDICATION"})
+        encounters.append({"location": location, "season": season, "concepts": concepts})
+    
+    response = requests.post(f"{BASE_URL}/api/v1/admin/relationships/learn", json={"encounters": encounters})
+    data = response.json()
+    print(f"{data['learning']['encounters']} encounters learned, lexicon version {data['lexicon']['version']}")
+    # Ibuprofen (5) is contraindicated for DBD: never recommended, however often it co-occurs
+    recommendations = requests.post(f"{BASE_URL}/api/v1/cds/recommendations",
+                                    json={"diagnosis_id": 1, "context": {"location": "Manado", "season": "WET"}}).json()
+    assert 5 not in [rec['concept']['concept_id'] for rec in recommendations['recommendations']]
+    for rel in data['relationships']['1']:
+        print(f"  DBD -> {rel['target_id']} {rel['type']}: priority {rel['priority']:.2f} "
+              f"(commonality {rel['commonality']:.2f}), boosts {rel['context_boost'] or 'none'}")
+    print()
+
+def test_metrics():
+    """Test that the hot paths exercised above show up in /metrics"""
+    print("📈 Testing Metrics...")
+    
+    response = requests.get(f"{BASE_URL}/metrics")
+    counts = {}
+    for line in response.text.splitlines():
+        if line.startswith('lexicon_stage_seconds_count'):
+            labels, value = line.split('} ')
+            counts[labels.split('{')[1]] = int(value)
+    for labels, count in sorted(counts.items()):
+        print(f"{labels}: {count} observations")
+    print()
+
 def test_ml_predictions():
     """Test ML prediction demo"""
     print("🤖 Testing ML Predictions...")
@@ -110,6 +329,18 @@ def test_ml_predictions():
         print(f"Recommendations: {', '.join(data['recommendations'])}")
         print()
 
+def test_ml_batch_predictions():
+    """Test grid risk scoring (every diagnosis x location x season)"""
+    print("🗺️  Testing Batch ML Predictions...")
+    
+    response = requests.post(f"{BASE_URL}/api/v1/ml/predict/batch", json={"records": True})
+    data = response.json()
+    print(f"{data['total']} combinations ({len(data['diagnoses'])} diagnoses x "
+          f"{len(data['locations'])} locations x {len(data['seasons'])} seasons)")
+    for p in data['predictions'][:4]:
+        print(f"  {p['diagnosis']} {p['location']} {p['season']}: {p['risk_score']:.2f} ({p['risk_category']})")
+    print()
+
 def run_comprehensive_test():
     """Run all tests"""
     print("🚀 Starting Lexicon AI Service POC Tests")
@@ -118,9 +349,21 @@ def run_comprehensive_test():
     try:
         test_health_check()
         test_concept_search()
+        test_batch_search()
+        test_autocomplete()
+        test_code_mapping()
         test_clinical_recommendations()
+        test_clinical_pathway()
+        test_treatment_validation()
+        test_graphql_pathway()
         test_fhir_processing()
+        test_bulk_fhir_processing()
+        test_result_cache()
+        test_lexicon_reload()
+        test_relationship_learning()
+        test_metrics()
         test_ml_predictions()
+        test_ml_batch_predictions()
         
         print("✅ All tests completed successfully!")
         
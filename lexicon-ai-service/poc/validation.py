@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Treatment plan validation against the relationship data
+Per diagnosis, the concepts a plan is expected to contain (high-priority
+tests and treatments), those it may contain (any recommended relationship)
+and those it must not (contraindications) are precomputed as frozensets
+when the lexicon snapshot is built, so validating a plan is a few set
+operations instead of a scan of the diagnosis's relationships per item.
+"""
+
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Sequence, Tuple
+
+from cds_tables import CONTRAINDICATION_TYPES, recommended_relationships
+from concept_store import ConceptStore
+
+# Relationships at or above this priority are expected in a plan for the diagnosis
+EXPECTED_PRIORITY = 0.9
+
+# Confidence in the verdict (simulated, as RECOMMENDATION_CONFIDENCE)
+BASE_CONFIDENCE = 0.95
+NO_RELATIONSHIP_CONFIDENCE = 0.5     # diagnosis without relationship data: nothing to check against
+UNINDICATED_PENALTY = 0.3            # times the share of plan items not indicated for the diagnosis
+MISSING_EXPECTED_PENALTY = 0.05      # per expected concept missing from the plan ...
+MAX_MISSING_EXPECTED_PENALTY = 0.15  # ... up to this much
+
+# Plan item problems, most severe first (ValidationIssue.severity)
+CONTRAINDICATED, UNKNOWN_CONCEPT, NOT_INDICATED = 0, 1, 2
+ISSUE_SEVERITY = {CONTRAINDICATED: "CRITICAL", UNKNOWN_CONCEPT: "HIGH", NOT_INDICATED: "MEDIUM"}
+
+
+class DiagnosisRules(NamedTuple):
+    """What a plan for one diagnosis should, may and must not contain"""
+    expected: Tuple[int, ...]  # best priority first
+    allowed: FrozenSet[int]
+    contraindicated: FrozenSet[int]
+
+
+class _PlanFindings(NamedTuple):
+    problems: List[Tuple[int, int]]  # (plan item concept id, problem), in plan order
+    missing: List[int]               # expected concept ids not in the plan
+    items: int
+
+
+def _plan_items(plan: Dict) -> List[int]:
+    """Procedures then medications, first occurrence only"""
+    return list(dict.fromkeys([*plan.get('procedures', ()), *plan.get('medications', ())]))
+
+
+class TreatmentValidator:
+    """Validates {diagnosis_concept_id, procedures, medications} plans (the TreatmentPlan schema)"""
+
+    def __init__(self, store: ConceptStore, relationships: Dict[int, List[Dict]],
+                 expected_priority: float = EXPECTED_PRIORITY):
+        self.store = store
+        self.relationships = relationships
+        self.expected_priority = expected_priority
+        self.concepts: Dict[int, Dict] = {}  # Suggestion payloads, built once per concept and shared
+        self.rules: Dict[int, DiagnosisRules] = {diagnosis_id: self._build_rules(rels)
+                                                 for diagnosis_id, rels in relationships.items()}
+
+    def _build_rules(self, relationships: List[Dict]) -> DiagnosisRules:
+        # Targets missing from the store are skipped, as in the score tables and pathways
+        recommended = [rel for rel in recommended_relationships(relationships) if rel['target_id'] in self.store]
+        expected = sorted((rel for rel in recommended if rel['priority'] >= self.expected_priority),
+                          key=lambda rel: -rel['priority'])
+        return DiagnosisRules(
+            tuple(dict.fromkeys(rel['target_id'] for rel in expected)),
+            frozenset(rel['target_id'] for rel in recommended),
+            frozenset(rel['target_id'] for rel in relationships if rel['type'] in CONTRAINDICATION_TYPES))
+
+    def updated(self, store: ConceptStore, relationships: Dict[int, List[Dict]],
+                diagnosis_ids: Iterable[int]) -> 'TreatmentValidator':
+        """Validator for a new lexicon snapshot, rebuilding only the rules of `diagnosis_ids`"""
+        validator = TreatmentValidator(store, {}, self.expected_priority)
+        validator.relationships = relationships
+        validator.rules = dict(self.rules)
+        for diagnosis_id in diagnosis_ids:
+            validator.rebuild_diagnosis(diagnosis_id)
+        return validator
+
+    def rebuild_diagnosis(self, diagnosis_id: int) -> None:
+        """Recompute one diagnosis's rules after its relationships changed"""
+        rels = self.relationships.get(diagnosis_id)
+        if rels is None:
+            self.rules.pop(diagnosis_id, None)
+        else:
+            self.rules[diagnosis_id] = self._build_rules(rels)
+
+    def _findings(self, rules: DiagnosisRules, items: List[int]) -> _PlanFindings:
+        planned = frozenset(items)
+        contraindicated = planned & rules.contraindicated
+        unindicated = planned - rules.allowed - contraindicated
+        problems = []
+        if contraindicated or unindicated:
+            for concept_id in items:
+                if concept_id in contraindicated:
+                    problems.append((concept_id, CONTRAINDICATED))
+                elif concept_id in unindicated:
+                    kind = UNKNOWN_CONCEPT if concept_id not in self.store else NOT_INDICATED
+                    problems.append((concept_id, kind))
+        missing = [concept_id for concept_id in rules.expected if concept_id not in planned]
+        return _PlanFindings(problems, missing, len(items))
+
+    def validate(self, plan: Dict) -> Dict:
+        """ValidationResult for one plan"""
+        diagnosis_id = plan.get('diagnosis_concept_id')
+        if diagnosis_id not in self.store:
+            return self._unknown_diagnosis(diagnosis_id)
+        rules = self.rules.get(diagnosis_id)
+        if rules is None:
+            return self._no_rules(diagnosis_id)
+        return self._result(diagnosis_id, self._findings(rules, _plan_items(plan)))
+
+    def validate_many(self, plans: Sequence[Dict]) -> List[Dict]:
+        """ValidationResults for many plans, in order"""
+        return [self.validate(plan) for plan in plans]
+
+    def _result(self, diagnosis_id: int, findings: _PlanFindings) -> Dict:
+        diagnosis = self.store.get(diagnosis_id).canonical_name
+        issues = []
+        for concept_id, kind in findings.problems:
+            concept = self.store.get(concept_id)
+            name = concept.canonical_name if concept else f"Concept {concept_id}"
+            message = {
+                CONTRAINDICATED: f"{name} is contraindicated for {diagnosis}",
+                UNKNOWN_CONCEPT: f"{name} is not in the lexicon",
+                NOT_INDICATED: f"{name} is not indicated for {diagnosis}",
+            }[kind]
+            issues.append({"severity": ISSUE_SEVERITY[kind], "message": message, "concept_id": concept_id})
+
+        suggestions = [{
+            "type": "MISSING_EXPECTED",
+            "concept": self._concept(concept_id),
+            "reason": f"Usually part of the plan for {diagnosis}",
+        } for concept_id in findings.missing]
+
+        kinds = {kind for _, kind in findings.problems}
+        is_valid = CONTRAINDICATED not in kinds and UNKNOWN_CONCEPT not in kinds
+        confidence = BASE_CONFIDENCE
+        if is_valid:
+            unindicated = sum(kind == NOT_INDICATED for _, kind in findings.problems)
+            confidence -= UNINDICATED_PENALTY * unindicated / max(findings.items, 1)
+            confidence -= min(MISSING_EXPECTED_PENALTY * len(findings.missing), MAX_MISSING_EXPECTED_PENALTY)
+        return {"is_valid": is_valid, "confidence": round(confidence, 4), "issues": issues,
+                "suggestions": suggestions}
+
+    def _concept(self, concept_id: int) -> Dict:
+        concept = self.concepts.get(concept_id)
+        if concept is None:
+            concept = self.concepts[concept_id] = self.store.get(concept_id).to_dict()
+        return concept
+
+    @staticmethod
+    def _unknown_diagnosis(diagnosis_id) -> Dict:
+        return {"is_valid": False, "confidence": BASE_CONFIDENCE,
+                "issues": [{"severity": "CRITICAL", "message": "Diagnosis is not in the lexicon",
+                            "concept_id": diagnosis_id}],
+                "suggestions": []}
+
+    @staticmethod
+    def _no_rules(diagnosis_id: int) -> Dict:
+        return {"is_valid": True, "confidence": NO_RELATIONSHIP_CONFIDENCE,
+                "issues": [{"severity": "LOW", "message": "No relationship data for the diagnosis",
+                            "concept_id": diagnosis_id}],
+                "suggestions": []}
+
+    def stats(self) -> Dict:
+        return {"diagnoses": len(self.rules),
+                "allowed_pairs": sum(len(rules.allowed) for rules in self.rules.values()),
+                "contraindicated_pairs": sum(len(rules.contraindicated) for rules in self.rules.values()),
+                "expected_pairs": sum(len(rules.expected) for rules in self.rules.values())}